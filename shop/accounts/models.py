@@ -2,11 +2,13 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.db.models.signals import post_save
 from django.dispatch import receiver
+from main.images import schedule_variants
 
 class Profile(models.Model):
 	user = models.OneToOneField(User, on_delete=models.CASCADE)
 	bio = models.TextField(max_length=500, blank=True, verbose_name='Про себе')
 	avatar = models.ImageField(upload_to='avatars/%Y/%m/%d/', blank=True, null=True, verbose_name='Аватарка')
+	avatar_variants = models.JSONField(default=dict, blank=True, editable=False)
 	birth_date = models.DateField(null=True, blank=True, verbose_name="Дата народження")
 	location = models.CharField(max_length=50, blank=True, verbose_name='Місто')
 	website = models.URLField(blank=True, verbose_name='Веб сайт')
@@ -28,4 +30,9 @@ class Profile(models.Model):
 	@receiver(post_save, sender=User)
 	def save_user_profile(sender, instance, **kwargs):
 		if hasattr(instance, 'profile'):
-			instance.profile.save()
\ No newline at end of file
+			instance.profile.save()
+
+@receiver(post_save, sender=Profile)
+def generate_avatar_variants(sender, instance, raw=False, **kwargs):
+	if not raw:
+		schedule_variants(instance, 'avatar', 'avatar_variants')
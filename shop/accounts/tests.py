@@ -1,3 +1,28 @@
-from django.test import TestCase
+import re
+from django.template import engines
+from django.template.backends.django import Template as DjangoTemplate
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from .views import ProfiledTemplate, ProfilingDjangoTemplates
 
-# Create your tests here.
+SERVER_TIMING = re.compile(r'sql;dur=[\d.]+;desc="(\d+) queries", tpl;dur=([\d.]+), total;dur=[\d.]+')
+
+
+@override_settings(REQUEST_PROFILING={'SAMPLE_RATE': 1.0, 'HEADER': True})
+class RequestProfilingTests(TestCase):
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('accounts:login'))
+        match = SERVER_TIMING.fullmatch(response['Server-Timing'])
+        self.assertIsNotNone(match)
+        # Бекенд з профілюванням увімкнено в settings разом з SAMPLE_RATE
+        self.assertIsInstance(engines['django'], ProfilingDjangoTemplates)
+        self.assertGreater(float(match.group(2)), 0)
+
+    def test_plain_templates_are_not_patched(self):
+        self.assertFalse(hasattr(DjangoTemplate.render, '_profiled'))
+        backend = ProfilingDjangoTemplates({
+            'NAME': 'profiling', 'DIRS': [], 'APP_DIRS': False, 'OPTIONS': {},
+        })
+        template = backend.from_string('{{ value }}')
+        self.assertIsInstance(template, ProfiledTemplate)
+        self.assertEqual(template.render({'value': 'ok'}), 'ok')
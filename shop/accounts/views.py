@@ -1,4 +1,15 @@
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
 from django.shortcuts import render, redirect
+from django.template.backends.django import DjangoTemplates, Template as DjangoTemplate
 from django.contrib.auth import login, logout
 from django.contrib.auth.forms import AuthenticationForm
 from django.contrib.auth.decorators import login_required
@@ -6,6 +17,8 @@ from main.models import Category
 from accounts.forms import UserRegistrationForm
 from django.contrib import messages
 
+logger = logging.getLogger(__name__)
+
 def register_view(request):
 	if request.user.is_authenticated:
 		return redirect("main:product_list")
@@ -58,4 +71,147 @@ class AdminAccessRedirectMiddleware:
 			if not user.is_authenticated or not user.is_staff:
 				return redirect('main:product_list')
 			
-		return self.get_response(request)
\ No newline at end of file
+		return self.get_response(request)
+
+
+# Профілювання запитів (RequestProfilingMiddleware)
+PROFILING_DEFAULTS = {
+	'SAMPLE_RATE': 0.0,
+	'DUPLICATE_THRESHOLD': 10,
+	'HEADER': True,
+}
+
+FINGERPRINT_PATTERNS = (
+	(re.compile(r"'(?:[^']|'')*'"), '?'),
+	(re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+	(re.compile(r'%s(?:\s*,\s*%s)+'), '%s, ...'),
+	(re.compile(r'\?(?:\s*,\s*\?)+'), '?, ...'),
+	(re.compile(r'\s+'), ' '),
+)
+
+_profile = threading.local()
+
+
+def get_profiling_config():
+	return {**PROFILING_DEFAULTS, **getattr(settings, 'REQUEST_PROFILING', {})}
+
+
+def sql_fingerprint(sql):
+	"""Запит без значень: однакові запити з різними параметрами збігаються."""
+	for pattern, replacement in FINGERPRINT_PATTERNS:
+		sql = pattern.sub(replacement, sql)
+	return sql.strip()
+
+
+class RequestProfile:
+	def __init__(self):
+		self.queries = Counter()
+		self.sql_time = 0.0
+		self.template_time = 0.0
+		self.template_depth = 0
+
+	def __call__(self, execute, sql, params, many, context):
+		started = time.perf_counter()
+		try:
+			return execute(sql, params, many, context)
+		finally:
+			self.sql_time += time.perf_counter() - started
+			self.queries[sql_fingerprint(sql)] += 1
+
+
+class ProfiledTemplate(DjangoTemplate):
+	def render(self, context=None, request=None):
+		profile = getattr(_profile, 'current', None)
+		# Вкладені render_to_string (теги, дірки кешу) вже враховані зовнішнім
+		if profile is None or profile.template_depth:
+			return super().render(context, request)
+		profile.template_depth += 1
+		started = time.perf_counter()
+		try:
+			return super().render(context, request)
+		finally:
+			profile.template_time += time.perf_counter() - started
+			profile.template_depth -= 1
+
+
+class ProfilingDjangoTemplates(DjangoTemplates):
+	"""
+	Бекенд шаблонів Django, що рахує час рендеру для
+	RequestProfilingMiddleware. Підключається в TEMPLATES лише разом із
+	профілюванням, тож без нього шаблони рендеряться без обгорток.
+	"""
+
+	def from_string(self, template_code):
+		return ProfiledTemplate(self.engine.from_string(template_code), self)
+
+	def get_template(self, template_name):
+		return ProfiledTemplate(super().get_template(template_name).template, self)
+
+
+class RequestProfilingMiddleware:
+	"""
+	Для частки запитів (SAMPLE_RATE) рахує SQL-запити, їх сумарний час,
+	повтори однакових запитів і час рендеру шаблонів (з бекендом
+	ProfilingDjangoTemplates). Результат іде в заголовок Server-Timing
+	і в лог; запит, повторений більше DUPLICATE_THRESHOLD разів, логується
+	як ймовірне N+1. З нульовою часткою middleware вимикається повністю.
+	"""
+
+	def __init__(self, get_response):
+		config = get_profiling_config()
+		if not config['SAMPLE_RATE']:
+			raise MiddlewareNotUsed
+		self.get_response = get_response
+		self.sample_rate = config['SAMPLE_RATE']
+		self.threshold = config['DUPLICATE_THRESHOLD']
+		self.header = config['HEADER']
+
+	def __call__(self, request):
+		if self.sample_rate < 1 and random.random() >= self.sample_rate:
+			return self.get_response(request)
+
+		profile = _profile.current = RequestProfile()
+		started = time.perf_counter()
+		try:
+			with ExitStack() as stack:
+				for connection in connections.all():
+					stack.enter_context(connection.execute_wrapper(profile))
+				response = self.get_response(request)
+		finally:
+			_profile.current = None
+		total = time.perf_counter() - started
+
+		self.report(request, response, profile, total)
+		return response
+
+	def report(self, request, response, profile, total):
+		count = sum(profile.queries.values())
+		duplicates = count - len(profile.queries)
+		if self.header:
+			response['Server-Timing'] = ', '.join((
+				f'sql;dur={profile.sql_time * 1000:.1f};desc="{count} queries"',
+				f'tpl;dur={profile.template_time * 1000:.1f}',
+				f'total;dur={total * 1000:.1f}',
+			))
+
+		data = {
+			'method': request.method,
+			'path': request.path,
+			'status': response.status_code,
+			'total_ms': round(total * 1000, 1),
+			'sql_ms': round(profile.sql_time * 1000, 1),
+			'queries': count,
+			'duplicates': duplicates,
+			'template_ms': round(profile.template_time * 1000, 1),
+		}
+		logger.info(
+			"request: method=%s path=%s status=%s total_ms=%s sql_ms=%s queries=%s duplicates=%s template_ms=%s",
+			*data.values(), extra={'profile': data},
+		)
+		for fingerprint, repeats in profile.queries.most_common():
+			if repeats <= self.threshold:
+				break
+			logger.warning(
+				"request: path=%s — запит повторено %s разів (можливе N+1): %s",
+				request.path, repeats, fingerprint, extra={'profile': data},
+			)
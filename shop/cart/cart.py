@@ -1,9 +1,11 @@
-from decimal import Decimal, ROUND_HALF_UP
 from django.conf import settings
+from discounts.promo_resolver import get_promo_resolver
 from main.models import Product
+from main.money import ZERO, Money
 
 class Cart:
     def __init__(self, request):
+        self.request = request
         self.session = request.session
         cart = self.session.get(settings.CART_SESSION_ID)
         
@@ -15,54 +17,13 @@ class Cart:
     def add(self, product, quantity=1, override_quantity=False):
         product_id = str(product.id)
 
-        price_decimal = Decimal('0')
-        try:
-            if hasattr(product, 'get_discounted_price'):
-                dp = product.get_discounted_price()
-                if dp is not None:
-                    price_decimal = Decimal(str(dp))
-        except Exception:
-            price_decimal = Decimal('0')
-        if price_decimal == Decimal('0'):
-            price_decimal = Decimal(str(getattr(product, 'price', Decimal('0'))))
+        price = product.get_discounted_price() or Money.of(product.price)
 
-        product_promo_codes = self.session.get('product_promo_codes', {}) or {}
-        promo_identifier = None
-        promo_data = product_promo_codes.get(str(product.id)) or product_promo_codes.get(product.id)
-        if isinstance(promo_data, dict):
-            promo_identifier = promo_data.get('promo_id') or promo_data.get('code') or promo_data.get('id')
-        else:
-            if promo_data:
-                promo_identifier = promo_data
-        if not promo_identifier:
-            promo_identifier = self.session.get('applied_promo_id') or self.session.get('applied_promo_code')
-
-        if promo_identifier:
-            try:
-                from discounts.models import PromoCode 
-                promo = None
-                try:
-                    promo = PromoCode.objects.get(id=int(promo_identifier))
-                except Exception:
-                    try:
-                        promo = PromoCode.objects.get(code=str(promo_identifier))
-                    except Exception:
-                        promo = None
-
-                if promo and getattr(promo, 'is_valid', lambda: True)():
-                    min_amount = getattr(promo, 'min_order_amount', Decimal('0'))
-                    if price_decimal >= Decimal(str(min_amount)):
-                        if hasattr(promo, 'apply_to_price') and callable(promo.apply_to_price):
-                            price_decimal = Decimal(str(promo.apply_to_price(price_decimal)))
-                        else:
-                            if getattr(promo, 'discount_type', None) == 'percentage':
-                                price_decimal = price_decimal * (Decimal('1') - Decimal(str(promo.value)) / Decimal('100'))
-                            elif getattr(promo, 'discount_type', None) == 'fixed':
-                                price_decimal = max(Decimal('0'), price_decimal - Decimal(str(promo.value)))
-            except Exception:
-                pass
+        promo = get_promo_resolver(self.request).for_product(product, fallback_to_applied=True)
+        if promo is not None and promo.is_valid() and price >= Money.of(promo.min_order_amount):
+            price = promo.apply_to_price(price)
 
-        price_str = str(Decimal(price_decimal).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP))
+        price_str = str(price)
 
         if product_id not in self.cart:
             self.cart[product_id] = {'quantity': 0, 'price': price_str}
@@ -87,43 +48,39 @@ class Cart:
     
     def __iter__(self):
         product_ids = [int(pid) for pid in self.cart.keys()]
-        products = Product.objects.filter(id__in=product_ids).select_related('category')
+        products = {
+            str(product.id): product
+            for product in Product.objects.filter(id__in=product_ids).select_related('category')
+        }
 
-        cart_copy = self.cart.copy()
-        
-        for product in products:
-            pid = str(product.id)
-            if pid in cart_copy:
-                cart_copy[pid]['product'] = product
-        
-        for item in cart_copy.values():
-            if 'product' not in item:
+        for pid, stored in self.cart.items():
+            product = products.get(pid)
+            if product is None:
                 continue
-                
+
+            # Копія, щоб у сесію не потрапили товар і Money
+            item = dict(stored)
+            item['product'] = product
             item['quantity'] = int(item.get('quantity', 0))
-            
-            price_dec = Decimal(str(item.get('price', '0')))
-            price_rounded = price_dec.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-            
-            item['price_decimal'] = price_rounded
-            item['price'] = float(price_rounded)
-            
-            total_dec = (price_rounded * item['quantity']).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-            
-            item['total_price_decimal'] = total_dec
-            item['total_price'] = float(total_dec)
-            
+
+            price = Money.of(item.get('price'))
+            item['price'] = price
+            item['price_decimal'] = price.to_decimal()
+
+            total = price * item['quantity']
+            item['total_price'] = total
+            item['total_price_decimal'] = total.to_decimal()
+
             yield item
 
     def __len__(self):
         return sum(int(item.get('quantity', 0)) for item in self.cart.values())
 
     def get_total_price(self):
-        total = sum(
-            (Decimal(item.get('price', '0')) * int(item.get('quantity', 0)))
-            for item in self.cart.values()
+        return sum(
+            (Money.of(item.get('price')) * int(item.get('quantity', 0)) for item in self.cart.values()),
+            ZERO,
         )
-        return total.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
     
     def clear(self):
         if settings.CART_SESSION_ID in self.session:
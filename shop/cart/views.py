@@ -3,6 +3,7 @@ from django.views.decorators.http import require_POST
 from django.conf import settings
 import logging
 from main.models import Product, Category
+from main.recommendations import record_co_cart
 from .cart import Cart
 from .forms import CartAddProductForm
 from django.contrib import messages
@@ -21,6 +22,8 @@ def cart_add(request, product_id):
         product_promo_codes = request.session.get('product_promo_codes', {})
         logger.debug("cart_add: product_id=%s, session.product_promo_codes=%s", product_id, product_promo_codes)
         try:
+            if str(product.id) not in cart.cart:
+                record_co_cart(product.id, cart.cart.keys())
             cart.add(product=product, quantity=cd['quantity'], override_quantity=cd['override'])
             messages.success(request, "Товар додано до кошика.")
         except Exception as e:
@@ -0,0 +1,245 @@
+import atexit
+import logging
+import secrets
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, connections, transaction
+from django.utils import timezone
+from main.exports import iter_csv
+from .models import PromoCode, normalize_code
+
+logger = logging.getLogger(__name__)
+
+# Без символів, які легко сплутати: 0/O, 1/I/L
+DEFAULT_ALPHABET = 'ABCDEFGHJKMNPQRSTUVWXYZ23456789'
+DEFAULT_LENGTH = 10
+CHUNK_SIZE = 10000
+CSV_HEADER = ['code', 'discount_type', 'value', 'usage_limit', 'start_date', 'end_date']
+
+# Простір кодів має бути набагато більшим за партію, інакше повторні
+# спроби через збіги з уже існуючими кодами стануть нескінченними
+MIN_SPACE_RATIO = 100
+MAX_ATTEMPTS = 20
+
+# Готові партії зі сторінки генерації: CSV і, якщо генерація впала, текст помилки
+BATCHES_DIR = 'promo_batches'
+
+
+class BatchCodeError(ValueError):
+    pass
+
+
+class CodeGenerator:
+    """
+    Випадкові коди prefix + length символів з alphabet. Байти з
+    secrets.token_bytes переводяться в символи через bytes.translate:
+    байти, що дали б нерівномірний розподіл, відкидаються.
+    """
+
+    def __init__(self, prefix='', length=DEFAULT_LENGTH, alphabet=DEFAULT_ALPHABET):
+        alphabet = ''.join(dict.fromkeys(normalize_code(alphabet)))
+        if not 2 <= len(alphabet) <= 256 or not alphabet.isascii():
+            raise BatchCodeError('Алфавіт має містити від 2 до 256 різних ASCII-символів')
+        if length < 4:
+            raise BatchCodeError('Довжина випадкової частини — щонайменше 4 символи')
+        self.prefix = normalize_code(prefix)
+        self.length = length
+        self.alphabet = alphabet
+        usable = 256 - 256 % len(alphabet)
+        self._table = bytes(alphabet[i % len(alphabet)].encode()[0] for i in range(256))
+        self._rejected = bytes(range(usable, 256))
+
+    @property
+    def space(self):
+        return len(self.alphabet) ** self.length
+
+    def generate(self, count):
+        """count різних кодів (set)."""
+        codes = set()
+        length, prefix = self.length, self.prefix
+        while len(codes) < count:
+            needed = count - len(codes)
+            # Запас на відкинуті байти і збіги всередині партії
+            raw = secrets.token_bytes(needed * length * 5 // 4 + length)
+            chars = raw.translate(self._table, self._rejected).decode()
+            codes.update(prefix + chars[i:i + length] for i in range(0, len(chars) - length + 1, length))
+        while len(codes) > count:
+            codes.pop()
+        return codes
+
+
+def _existing_codes(codes):
+    codes = list(codes)
+    if connection.vendor == 'postgresql':
+        # Масив — один параметр замість тисяч у IN (...)
+        table = connection.ops.quote_name(PromoCode._meta.db_table)
+        code_column = connection.ops.quote_name(PromoCode._meta.get_field('code').column)
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT {code_column} FROM {table} WHERE {code_column} = ANY(%s::varchar[])', [codes])
+            return {code for code, in cursor.fetchall()}
+
+    # Перевірка частинами: стільки параметрів, скільки дозволяє СУБД
+    step = min(connection.features.max_query_params or CHUNK_SIZE, CHUNK_SIZE)
+    existing = set()
+    for start in range(0, len(codes), step):
+        existing.update(
+            PromoCode.objects.filter(code__in=codes[start:start + step]).values_list('code', flat=True)
+        )
+    return existing
+
+
+def _insert_codes(codes, fields):
+    """
+    Вставляє коди з однаковими рештою полів. bulk_create готує кожне поле
+    кожного об'єкта окремо, що для мільйона кодів займає хвилини, тому
+    значення спільних полів готуються один раз, а змінюється лише code.
+    """
+    template = PromoCode(code='', **fields)
+    columns, shared = [], []
+    for field in PromoCode._meta.concrete_fields:
+        if field.primary_key or field.name == 'code':
+            continue
+        columns.append(connection.ops.quote_name(field.column))
+        shared.append(field.get_db_prep_save(field.pre_save(template, add=True), connection))
+
+    table = connection.ops.quote_name(PromoCode._meta.db_table)
+    code_column = connection.ops.quote_name(PromoCode._meta.get_field('code').column)
+    placeholders = ', '.join(['%s'] * len(shared))
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            # Один запит на частину: коди передаються масивом
+            cursor.execute(
+                f'INSERT INTO {table} ({code_column}, {", ".join(columns)}) '
+                f'SELECT code, {placeholders} FROM unnest(%s::varchar[]) AS code',
+                [*shared, list(codes)],
+            )
+        else:
+            cursor.executemany(
+                f'INSERT INTO {table} ({code_column}, {", ".join(columns)}) VALUES (%s, {placeholders})',
+                [(code, *shared) for code in codes],
+            )
+
+
+def check_batch(count, generator):
+    if count <= 0:
+        raise BatchCodeError('Кількість кодів має бути більше 0')
+    if generator.space < count * MIN_SPACE_RATIO:
+        raise BatchCodeError(
+            f'Замало можливих кодів ({generator.space}) для партії з {count}: збільште довжину або алфавіт'
+        )
+    max_length = PromoCode._meta.get_field('code').max_length
+    if len(generator.prefix) + generator.length > max_length:
+        raise BatchCodeError(f'Код довший за {max_length} символів')
+
+
+def generate_promo_codes(count, generator, chunk_size=CHUNK_SIZE, **fields):
+    """
+    Створює count нових промокодів зі спільними параметрами fields
+    (discount_type, value, start_date, ...). Працює частинами по
+    chunk_size: генерує коди в пам'яті, відкидає вже існуючі й вставляє
+    їх одним пакетом в окремій транзакції. Віддає списки створених кодів по
+    частинах, тож результат можна писати в CSV одразу.
+    """
+    check_batch(count, generator)
+    created = 0
+    while created < count:
+        size = min(chunk_size, count - created)
+        codes = set()
+        for _ in range(MAX_ATTEMPTS):
+            codes.update(generator.generate(size - len(codes)))
+            codes -= _existing_codes(codes)
+            if len(codes) == size:
+                break
+        else:
+            raise BatchCodeError('Не вдалося згенерувати унікальні коди: забагато збігів з існуючими')
+
+        codes = sorted(codes)
+        with transaction.atomic():
+            _insert_codes(codes, fields)
+        created += size
+        yield codes
+
+
+def iter_csv_rows(chunks, fields):
+    """Рядки для main.exports.iter_csv: код і спільні параметри партії."""
+    shared = [fields.get(name) for name in CSV_HEADER[1:]]
+    for codes in chunks:
+        for code in codes:
+            yield [code, *shared]
+
+
+def batch_csv_name(name):
+    return f'{BATCHES_DIR}/{name}.csv'
+
+
+def batch_error_name(name):
+    return f'{BATCHES_DIR}/{name}.error.txt'
+
+
+def write_batch(name, count, generator, fields, chunk_size=CHUNK_SIZE):
+    """
+    Генерує партію повністю і зберігає CSV у default_storage під
+    batch_csv_name(name). Якщо генерація обірвалася, у файл потрапляють
+    усі вже створені коди, а причина — у batch_error_name(name).
+    """
+    error = None
+    with tempfile.TemporaryFile('w+b') as output:
+        output.write('\ufeff'.encode())
+        try:
+            chunks = generate_promo_codes(count, generator, chunk_size, **fields)
+            for line in iter_csv(CSV_HEADER, iter_csv_rows(chunks, fields)):
+                output.write(line.encode())
+        except Exception as e:
+            logger.exception("Не вдалося згенерувати партію промокодів %s", name)
+            error = str(e) if isinstance(e, BatchCodeError) else 'Внутрішня помилка генерації'
+        output.seek(0)
+        default_storage.save(batch_csv_name(name), File(output))
+    if error:
+        default_storage.save(batch_error_name(name), ContentFile(error.encode()))
+
+
+def get_batch_status(name):
+    """(готовий CSV чи ні, текст помилки або None)."""
+    error = None
+    if default_storage.exists(batch_error_name(name)):
+        with default_storage.open(batch_error_name(name)) as file:
+            error = file.read().decode()
+    return default_storage.exists(batch_csv_name(name)), error
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                # Один потік: великі партії не конкурують між собою за БД
+                _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='promo-batch')
+                atexit.register(_executor.shutdown, wait=False)
+    return _executor
+
+
+def _run_batch(*args, **kwargs):
+    try:
+        write_batch(*args, **kwargs)
+    finally:
+        connections.close_all()
+
+
+def start_batch(count, generator, fields):
+    """
+    Запускає генерацію у фоні після коміту й повертає ім'я партії для
+    get_batch_status. Коди не залежать від з'єднання з клієнтом: файл
+    з'явиться, навіть якщо сторінку закрили.
+    """
+    check_batch(count, generator)
+    name = f'promo-codes-{timezone.localtime():%Y%m%d-%H%M%S}-{secrets.token_hex(4)}'
+    transaction.on_commit(lambda: get_executor().submit(_run_batch, name, count, generator, fields))
+    return name
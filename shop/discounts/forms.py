@@ -1,6 +1,7 @@
 from django import forms
 from django.core.exceptions import ValidationError
-from .models import Discount, PromoCode
+from .batch_codes import DEFAULT_ALPHABET, DEFAULT_LENGTH, BatchCodeError, CodeGenerator
+from .models import Discount, PromoCode, normalize_code
 
 _BASE_INPUT_CLASS = (
     "w-full px-4 py-2 border border-gray-200 rounded-lg "
@@ -177,7 +178,7 @@ class PromoCodeForm(forms.ModelForm):
 
     def clean_code(self):
         code = self.cleaned_data.get('code', '') or ''
-        cleaned = code.upper().replace(' ', '')
+        cleaned = normalize_code(code)
         if len(cleaned) < 4:
             raise ValidationError('Код повинен містити щонайменше 4 символи')
         return cleaned
@@ -222,11 +223,72 @@ class PromoCodeForm(forms.ModelForm):
 
         # Нормалізація коду
         if 'code' in cleaned and cleaned['code']:
-            cleaned['code'] = cleaned['code'].upper().replace(' ', '')
+            cleaned['code'] = normalize_code(cleaned['code'])
             
         return cleaned
 
 
+
+class PromoCodeBatchForm(PromoCodeForm):
+    """Параметри партії одноразових промокодів; спільні поля — як у PromoCodeForm."""
+    code = None
+
+    count = forms.IntegerField(
+        min_value=1,
+        max_value=1_000_000,
+        widget=forms.NumberInput(attrs={"class": _BASE_INPUT_CLASS, "placeholder": "10000"}),
+        label='Кількість кодів'
+    )
+
+    prefix = forms.CharField(
+        required=False,
+        max_length=20,
+        widget=forms.TextInput(attrs={"class": _BASE_INPUT_CLASS, "placeholder": "Наприклад: SUMMER-"}),
+        label='Префікс'
+    )
+
+    length = forms.IntegerField(
+        min_value=4,
+        max_value=30,
+        initial=DEFAULT_LENGTH,
+        widget=forms.NumberInput(attrs={"class": _BASE_INPUT_CLASS}),
+        label='Довжина випадкової частини'
+    )
+
+    alphabet = forms.CharField(
+        max_length=256,
+        initial=DEFAULT_ALPHABET,
+        strip=False,
+        widget=forms.TextInput(attrs={"class": _BASE_INPUT_CLASS}),
+        label='Алфавіт'
+    )
+
+    field_order = ['count', 'prefix', 'length', 'alphabet']
+
+    class Meta(PromoCodeForm.Meta):
+        fields = [
+            'discount_type', 'value', 'start_date', 'end_date',
+            'usage_limit', 'min_order_amount', 'description'
+        ]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['usage_limit'].initial = 1
+
+    def clean(self):
+        cleaned = super().clean()
+        if not self.errors:
+            try:
+                self.generator = CodeGenerator(cleaned['prefix'], cleaned['length'], cleaned['alphabet'])
+            except BatchCodeError as e:
+                raise ValidationError(str(e))
+        return cleaned
+
+    def promo_fields(self):
+        """Спільні параметри для всіх кодів партії."""
+        return {name: self.cleaned_data[name] for name in self._meta.fields}
+
+
 class ApplyPromoCodeForm(forms.Form):
 	promo_code = forms.CharField(
 		max_length=50,
@@ -236,7 +298,7 @@ class ApplyPromoCodeForm(forms.Form):
 
 	def clean_promo_code(self):
 		code = self.cleaned_data.get('promo_code', '') or ''
-		cleaned = code.upper().replace(' ', '')
+		cleaned = normalize_code(code)
 		if not cleaned:
 			raise ValidationError('Введіть код промокоду')
 
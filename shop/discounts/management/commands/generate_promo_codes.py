@@ -0,0 +1,80 @@
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from discounts.batch_codes import (
+    CHUNK_SIZE, CSV_HEADER, DEFAULT_ALPHABET, DEFAULT_LENGTH, BatchCodeError, generate_promo_codes, iter_csv_rows,
+)
+from discounts.forms import PromoCodeBatchForm
+from discounts.models import PromoCode
+from main.exports import iter_csv
+
+DATE_FORMAT = '%Y-%m-%dT%H:%M'
+
+class Command(BaseCommand):
+    help = (
+        'Створює партію одноразових промокодів з однаковими параметрами знижки '
+        'і записує список у CSV. Параметри перевіряються так само, як у формі на сайті'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('count', type=int)
+        parser.add_argument('--prefix', default='')
+        parser.add_argument('--length', type=int, default=DEFAULT_LENGTH, help='Довжина випадкової частини')
+        parser.add_argument('--alphabet', default=DEFAULT_ALPHABET)
+        parser.add_argument(
+            '--type', dest='discount_type', default='percentage',
+            choices=[value for value, _ in PromoCode.DISCOUNT_TYPE_CHOICES],
+        )
+        parser.add_argument('--value', required=True)
+        parser.add_argument('--start', help='Початок дії, YYYY-MM-DDTHH:MM (за замовчуванням зараз)')
+        parser.add_argument('--end', help='Кінець дії, YYYY-MM-DDTHH:MM (за замовчуванням через --days днів)')
+        parser.add_argument('--days', type=int, default=30)
+        parser.add_argument('--usage-limit', default='1', help='Використань на код; порожнє значення — без ліміту')
+        parser.add_argument('--min-order-amount', default='0')
+        parser.add_argument('--description', default='')
+        parser.add_argument('--output', '-o', help='Файл для запису (за замовчуванням stdout)')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        start = timezone.localtime()
+        form = PromoCodeBatchForm({
+            'count': options['count'],
+            'prefix': options['prefix'],
+            'length': options['length'],
+            'alphabet': options['alphabet'],
+            'discount_type': options['discount_type'],
+            'value': options['value'],
+            'start_date': options['start'] or f'{start:{DATE_FORMAT}}',
+            'end_date': options['end'] or f'{start + timedelta(days=options["days"]):{DATE_FORMAT}}',
+            'usage_limit': options['usage_limit'],
+            'min_order_amount': options['min_order_amount'],
+            'description': options['description'],
+        })
+        if not form.is_valid():
+            errors = '; '.join(f'{field}: {" ".join(messages)}' for field, messages in form.errors.items())
+            raise CommandError(f'Некоректні параметри: {errors}')
+
+        fields = form.promo_fields()
+        chunks = generate_promo_codes(
+            form.cleaned_data['count'], form.generator, chunk_size=options['chunk_size'], **fields,
+        )
+        lines = iter_csv(CSV_HEADER, iter_csv_rows(chunks, fields))
+
+        started = time.perf_counter()
+        try:
+            if options['output']:
+                with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+                    output.writelines(lines)
+            else:
+                for line in lines:
+                    self.stdout.write(line, ending='')
+        except BatchCodeError as e:
+            raise CommandError(e)
+
+        # Коди можуть іти в stdout, тому підсумок — у stderr
+        count = form.cleaned_data['count']
+        seconds = time.perf_counter() - started
+        self.stderr.write(self.style.SUCCESS(
+            f'Створено {count} промокодів за {seconds:.1f} с ({count / max(seconds, 1e-6):.0f} кодів/с)'
+        ))
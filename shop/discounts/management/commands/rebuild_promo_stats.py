@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from discounts.models import PromoCode, normalize_code
+from discounts.services import rebuild_daily_stats
+
+class Command(BaseCommand):
+    help = (
+        'Перераховує денну статистику промокодів з таблиці використань. Потрібно після використань, '
+        'записаних в обхід сигналів (bulk_create, update, імпорт)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('codes', nargs='*', metavar='КОД', help='Лише ці промокоди (за замовчуванням — усі)')
+
+    def handle(self, *args, **options):
+        promos = None
+        if options['codes']:
+            codes = {normalize_code(code) for code in options['codes']}
+            promos = list(PromoCode.objects.filter(code__in=codes))
+            missing = codes - {promo.code for promo in promos}
+            if missing:
+                raise CommandError(f'Промокоди не знайдено: {", ".join(sorted(missing))}')
+
+        rows = rebuild_daily_stats(promos)
+        self.stdout.write(self.style.SUCCESS(f'Перераховано денних підсумків: {rows}'))
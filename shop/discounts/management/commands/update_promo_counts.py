@@ -1,28 +1,39 @@
-from django.core.management.base import BaseCommand
-from discounts.models import PromoCode
+from datetime import datetime, time
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from discounts.services import RECONCILE_CHUNK_SIZE, reconcile_promo_counts
 
 class Command(BaseCommand):
-    help = 'Оновлює лічильники використання промокодів'
+    help = (
+        'Звіряє лічильники використання промокодів з таблицею використань і виправляє розбіжності. '
+        'Виводить лише промокоди, лічильник яких розійшовся'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Лише показати розбіжності, нічого не змінювати')
+        parser.add_argument(
+            '--since', metavar='ДАТА',
+            help='Перевірити лише промокоди, створені або використані з цієї дати (YYYY-MM-DD або з часом)',
+        )
+        parser.add_argument('--chunk-size', type=int, default=RECONCILE_CHUNK_SIZE)
 
     def handle(self, *args, **options):
-        promos = PromoCode.objects.all()
-        updated = 0
-        
-        for promo in promos:
-            old_count = promo.used_count
-            promo.update_usage_count()
-            new_count = promo.used_count
-            
-            if old_count != new_count:
-                self.stdout.write(
-                    self.style.SUCCESS(
-                        f'Промокод {promo.code}: {old_count} -> {new_count}'
-                    )
-                )
-                updated += 1
-        
-        self.stdout.write(
-            self.style.SUCCESS(
-                f'Оновлено {updated} промокодів з {promos.count()}'
-            )
-        )
\ No newline at end of file
+        since = None
+        if options['since']:
+            since = parse_datetime(options['since'])
+            if since is None and (day := parse_date(options['since'])) is not None:
+                since = datetime.combine(day, time.min)
+            if since is None:
+                raise CommandError(f'Некоректна дата: {options["since"]}')
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+
+        checked, drifted = reconcile_promo_counts(
+            since=since, dry_run=options['dry_run'], chunk_size=options['chunk_size'],
+        )
+        for drift in drifted:
+            self.stdout.write(f'Промокод {drift.code}: {drift.used_count} -> {drift.actual}')
+
+        action = 'Знайдено розбіжностей' if options['dry_run'] else 'Оновлено'
+        self.stdout.write(self.style.SUCCESS(f'{action}: {len(drifted)} промокодів з {checked}'))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('discounts', '0002_promocodeusage_product_and_more'),
+        ('main', '0009_product_facet_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='discount',
+            index=models.Index(fields=['product', 'is_active', 'end_date'], name='discounts_d_product_ad477e_idx'),
+        ),
+    ]
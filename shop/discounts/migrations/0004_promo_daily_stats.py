@@ -0,0 +1,58 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:39
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import TruncDate
+
+
+def fill_daily_stats(apps, schema_editor):
+    PromoCodeUsage = apps.get_model('discounts', 'PromoCodeUsage')
+    PromoCodeDailyStat = apps.get_model('discounts', 'PromoCodeDailyStat')
+
+    rows = (
+        PromoCodeUsage.objects.annotate(date=TruncDate('used_at')).order_by()
+        .values('promo_code_id', 'date')
+        .annotate(uses=models.Count('id'), discount_total=models.Sum('discount_amount'))
+    )
+    PromoCodeDailyStat.objects.bulk_create((PromoCodeDailyStat(**row) for row in rows.iterator()), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('discounts', '0003_discount_product_index'),
+        ('main', '0012_product_effective_price'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PromoCodeDailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('uses', models.PositiveIntegerField(default=0)),
+                ('discount_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'verbose_name': 'Денна статистика промокоду',
+                'verbose_name_plural': 'Денна статистика промокодів',
+                'ordering': ['date'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='promocodeusage',
+            index=models.Index(fields=['promo_code', 'used_at', 'id'], name='discounts_p_promo_c_3df86c_idx'),
+        ),
+        migrations.AddField(
+            model_name='promocodedailystat',
+            name='promo_code',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='discounts.promocode'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='promocodedailystat',
+            unique_together={('promo_code', 'date')},
+        ),
+        migrations.RunPython(fill_daily_stats, migrations.RunPython.noop),
+    ]
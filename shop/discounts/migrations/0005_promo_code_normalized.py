@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:48
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Replace, Upper
+
+
+def normalize_codes(apps, schema_editor):
+    PromoCode = apps.get_model('discounts', 'PromoCode')
+
+    normalized = Upper(Replace('code', models.Value(' '), models.Value('')))
+    for promo in PromoCode.objects.exclude(code=normalized).order_by('pk').iterator():
+        code = promo.code.upper().replace(' ', '')
+        # Якщо після нормалізації код збігся з іншим, лишаємо обидва з суфіксом id;
+        # зайнятий суфікс доповнюється номером, доки код не стане вільним
+        base, suffix, attempt = code, f'-{promo.pk}', 1
+        while PromoCode.objects.filter(code=code).exclude(pk=promo.pk).exists():
+            code = f'{base[:50 - len(suffix)]}{suffix}'
+            attempt += 1
+            suffix = f'-{promo.pk}-{attempt}'
+        PromoCode.objects.filter(pk=promo.pk).update(code=code)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('discounts', '0004_promo_daily_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_codes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='promocode',
+            constraint=models.CheckConstraint(condition=models.Q(('code', django.db.models.functions.text.Upper(django.db.models.functions.text.Replace('code', models.Value(' '), models.Value(''))))), name='promo_code_normalized'),
+        ),
+    ]
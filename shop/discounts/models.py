@@ -1,7 +1,10 @@
+from decimal import ROUND_HALF_EVEN
 from django.db import models
+from django.db.models.functions import Replace, Upper
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from main.models import Product
+from main.money import ZERO, Money
 from django.contrib.auth.models import User
 
 class Discount(models.Model):
@@ -20,10 +23,10 @@ class Discount(models.Model):
 	description = models.TextField(blank=True)
 	created_at = models.DateTimeField(auto_now_add=True)
 
-	def is_valid(self):
+	def is_valid(self, now=None):
 		if not self.is_active:
 			return False
-		now = timezone.now()
+		now = now or timezone.now()
 		return self.start_date <= now <= self.end_date
 
 	def calculate_discount(self, price, quantity):
@@ -40,6 +43,17 @@ class Discount(models.Model):
 		
 		return 0
 
+	def get_discount_money(self, total, quantity=1, now=None):
+		"""Знижка на суму total (Money за quantity одиниць) у копійках."""
+		if not self.is_valid(now) or (self.min_quantity and quantity < self.min_quantity):
+			return ZERO
+		if self.discount_type == 'percentage':
+			# Каталог завжди округлював ціну до парної копійки (Decimal.quantize)
+			return total - total.percent_off(self.value, ROUND_HALF_EVEN)
+		if self.discount_type == 'fixed':
+			return Money.of(self.value) * quantity
+		return ZERO
+
 	def get_discounted_price(self, price, quantity):
 		discount_amount = self.calculate_discount(price, quantity)
 		total_price = price * quantity
@@ -64,6 +78,14 @@ class Discount(models.Model):
 		verbose_name = 'Знижка'
 		verbose_name_plural = 'Знижки'
 		ordering = ['-created_at']
+		indexes = [
+			models.Index(fields=['product', 'is_active', 'end_date']),
+		]
+
+
+def normalize_code(code):
+	"""Промокоди зберігаються і шукаються у верхньому регістрі без пробілів."""
+	return (code or '').upper().replace(' ', '')
 
 
 class PromoCode(models.Model):
@@ -120,6 +142,14 @@ class PromoCode(models.Model):
 		
 		return 0
 
+	def apply_to_price(self, price):
+		"""Ціна (Money) після промокоду; умови дії перевіряє викликач."""
+		if self.discount_type == 'percentage':
+			return price.percent_off(self.value)
+		if self.discount_type == 'fixed':
+			return max(price - Money.of(self.value), ZERO)
+		return price
+
 	def increment_usage(self):
 		self.used_count += 1
 		self.save(update_fields=['used_count'])
@@ -131,26 +161,21 @@ class PromoCode(models.Model):
 		return self.used_count
 
 	def get_usage_stats(self):
-		from decimal import Decimal
-		usages = self.usages.all()
-		
-		total_discount = sum(usage.discount_amount for usage in usages if usage.discount_amount)
-		count = usages.count()
-		avg_discount = total_discount / count if count > 0 else Decimal('0.00')
-		
+		from .services import get_promo_stats
+		stats = get_promo_stats(self)
 		return {
-			'total_uses': count,
-			'total_discount': total_discount,
-			'average_discount': avg_discount,
+			'total_uses': stats['total_uses'],
+			'total_discount': stats['total_discount'],
+			'average_discount': stats['average_discount'],
 		}
 
 	def clean(self):
 		super().clean()
 		
 		if self.code:
-			self.code = self.code.upper().replace(' ', '')
+			self.code = normalize_code(self.code)
 		
-		if self.discount_type in ['percentage', 'fixed']:
+		if self.discount_type in ['percentage', 'fixed'] and self.value is not None:
 			if self.discount_type == 'percentage':
 				if self.value < 0 or self.value > 100:
 					raise ValidationError({'value': 'Відсоток знижки повинен бути від 0 до 100'})
@@ -166,6 +191,13 @@ class PromoCode(models.Model):
 		if self.min_order_amount is not None and self.min_order_amount < 0:
 			raise ValidationError({'min_order_amount': 'Мінімальна сума замовлення не може бути від\'ємною'})
 
+	def save(self, *args, **kwargs):
+		# Нормалізація для будь-якого збереження, не лише через форму;
+		# bulk-шляхи нормалізують самі, а обхід ловить обмеження в БД
+		if self.code:
+			self.code = normalize_code(self.code)
+		super().save(*args, **kwargs)
+
 	def get_edit_url(self):
 		from django.urls import reverse
 		return reverse('discounts:edit_promo_code', kwargs={'code_id': self.pk})
@@ -178,6 +210,14 @@ class PromoCode(models.Model):
 		verbose_name = 'Промокод'
 		verbose_name_plural = 'Промокоди'
 		ordering = ['-created_at']
+		constraints = [
+			# Пошук іде точним збігом по унікальному індексу code, тому
+			# в таблиці не може бути коду, відмінного від нормалізованого
+			models.CheckConstraint(
+				condition=models.Q(code=Upper(Replace('code', models.Value(' '), models.Value('')))),
+				name='promo_code_normalized',
+			),
+		]
 
 
 class PromoCodeUsage(models.Model):
@@ -199,4 +239,25 @@ class PromoCodeUsage(models.Model):
         verbose_name = 'Використання промокоду'
         verbose_name_plural = 'Використання промокодів'
         ordering = ['-used_at']
-        unique_together = ('promo_code', 'user', 'product')
\ No newline at end of file
+        unique_together = ('promo_code', 'user', 'product')
+        indexes = [
+            models.Index(fields=['promo_code', 'used_at', 'id']),
+        ]
+
+
+class PromoCodeDailyStat(models.Model):
+    """
+    Підсумок використань промокоду за день (за місцевим часом). Оновлюється
+    сигналами PromoCodeUsage; статистика читається звідси, а не з усіх
+    використань.
+    """
+    promo_code = models.ForeignKey(PromoCode, on_delete=models.CASCADE, related_name='daily_stats')
+    date = models.DateField()
+    uses = models.PositiveIntegerField(default=0)
+    discount_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = 'Денна статистика промокоду'
+        verbose_name_plural = 'Денна статистика промокодів'
+        ordering = ['date']
+        unique_together = ('promo_code', 'date')
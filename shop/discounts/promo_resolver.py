@@ -0,0 +1,154 @@
+import copy
+import time
+from django.conf import settings
+from django.db.models import Q
+
+DEFAULTS = {
+    # Скільки секунд процес тримає завантажені промокоди; 0 — без кешу.
+    # Збереження промокоду очищає кеш одразу, але лише у своєму процесі;
+    # used_count промокодів з лімітом щоразу читається з БД
+    'TIMEOUT': 30,
+}
+
+# (тип ключа, значення) -> (момент застарівання, промокод)
+_process_cache = {}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'PROMO_CACHE', {})}
+
+
+def invalidate_promo_cache():
+    _process_cache.clear()
+
+
+def _code_key(code):
+    from .models import normalize_code
+
+    if code in (None, ''):
+        return None
+    code = normalize_code(str(code))
+    return ('code', code) if code else None
+
+
+def _id_key(value):
+    try:
+        return ('id', int(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def _identifier(value):
+    # Записи сесії бувають {'promo_id': .., 'code': ..}, id (int) або код (str).
+    # Рядок завжди код: числовий код "2024" — не промокод з id 2024
+    if isinstance(value, dict):
+        if value.get('promo_id') or value.get('id'):
+            return _id_key(value.get('promo_id') or value.get('id'))
+        return _code_key(value.get('code'))
+    if isinstance(value, int) and not isinstance(value, bool):
+        return ('id', value)
+    return _code_key(value)
+
+
+class PromoResolver:
+    """
+    Промокоди, згадані в сесії: застосований (applied_promo_*) і прив'язані
+    до товарів (product_promo_codes). Усі завантажуються одним запитом при
+    першому зверненні; спільний для контекст-процесора, фільтрів і кошика
+    в межах запиту (get_promo_resolver). Повернені об'єкти — лише для читання.
+    """
+
+    def __init__(self, session):
+        self.session = session
+        self._promos = {}
+        self._session_loaded = False
+
+    def _load(self, keys):
+        if not self._session_loaded:
+            # Перше звернення підтягує все із сесії, далі — лише нові ключі
+            self._session_loaded = True
+            keys = self._session_keys() + keys
+        missing = [key for key in keys if key not in self._promos]
+        if not missing:
+            return
+
+        timeout = get_config()['TIMEOUT']
+        now = time.monotonic()
+        if timeout:
+            for key in missing:
+                cached = _process_cache.get(key)
+                if cached and cached[0] > now:
+                    self._promos[key] = copy.copy(cached[1])
+            self._refresh_used_counts([self._promos[key] for key in missing if self._promos.get(key)])
+            missing = [key for key in missing if key not in self._promos]
+            if not missing:
+                return
+
+        from .models import PromoCode
+
+        ids = [value for kind, value in missing if kind == 'id']
+        codes = [value for kind, value in missing if kind == 'code']
+        for key in missing:
+            self._promos[key] = None
+        for promo in PromoCode.objects.filter(Q(id__in=ids) | Q(code__in=codes)):
+            for key in (('id', promo.pk), ('code', promo.code)):
+                self._promos[key] = promo
+                if timeout:
+                    _process_cache[key] = (now + timeout, copy.copy(promo))
+
+    def _refresh_used_counts(self, promos):
+        # Лічильник змінюють інші процеси при кожному використанні, тож для
+        # промокодів з лімітом is_valid() не може покладатися на копію з кешу
+        limited = [promo for promo in promos if promo.usage_limit is not None]
+        if not limited:
+            return
+        from .models import PromoCode
+
+        used_counts = dict(
+            PromoCode.objects.filter(pk__in={promo.pk for promo in limited}).values_list('pk', 'used_count')
+        )
+        for promo in limited:
+            promo.used_count = used_counts.get(promo.pk, promo.used_count)
+
+    def _session_keys(self):
+        keys = [_id_key(self.session.get('applied_promo_id')), _code_key(self.session.get('applied_promo_code'))]
+        product_promo_codes = self.session.get('product_promo_codes') or {}
+        if isinstance(product_promo_codes, dict):
+            keys.extend(map(_identifier, product_promo_codes.values()))
+        return [key for key in keys if key]
+
+    def _get(self, key):
+        if key is None:
+            return None
+        self._load([key])
+        return self._promos.get(key)
+
+    def get(self, value):
+        """Промокод за id (int), кодом (str) або записом сесії; None, якщо такого немає."""
+        return self._get(_identifier(value))
+
+    def get_by_code(self, code):
+        return self._get(_code_key(code))
+
+    def applied(self):
+        """Застосований до замовлення промокод: applied_promo_id — це id, applied_promo_code — код."""
+        if self.session.get('applied_promo_id'):
+            return self._get(_id_key(self.session.get('applied_promo_id')))
+        return self.get_by_code(self.session.get('applied_promo_code'))
+
+    def for_product(self, product, fallback_to_applied=False):
+        product_promo_codes = self.session.get('product_promo_codes') or {}
+        promo_data = None
+        if isinstance(product_promo_codes, dict):
+            promo_data = product_promo_codes.get(str(product.id)) or product_promo_codes.get(product.id)
+        promo = self.get(promo_data) if promo_data else None
+        if promo is None and fallback_to_applied:
+            promo = self.applied()
+        return promo
+
+
+def get_promo_resolver(request):
+    resolver = getattr(request, '_promo_resolver', None)
+    if resolver is None or resolver.session is not request.session:
+        resolver = request._promo_resolver = PromoResolver(request.session)
+    return resolver
@@ -0,0 +1,187 @@
+from collections import namedtuple
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+from main.money import ZERO, Money
+from .models import PromoCode, PromoCodeDailyStat, PromoCodeUsage
+from .promo_resolver import invalidate_promo_cache
+
+REDEEMED = 'redeemed'
+ALREADY_USED = 'already_used'
+LIMIT_REACHED = 'limit_reached'
+NOT_VALID = 'not_valid'
+MIN_AMOUNT = 'min_amount'
+
+
+RECONCILE_CHUNK_SIZE = 5000
+
+PromoCountDrift = namedtuple('PromoCountDrift', ['pk', 'code', 'used_count', 'actual'])
+
+
+class RedemptionResult(namedtuple('RedemptionResult', ['status', 'promo', 'usage', 'discount_amount'])):
+    __slots__ = ()
+
+    @property
+    def ok(self):
+        return self.status == REDEEMED
+
+
+def _claim_slot(promo, now):
+    """
+    Займає одне використання умовним UPDATE: рядок змінюється, лише якщо
+    код чинний і ліміт не вичерпано. Перевірка і збільшення лічильника —
+    одна операція в БД, тому паралельні запити не перевищать ліміт і не
+    загублять інкремент.
+    """
+    return PromoCode.objects.filter(
+        Q(usage_limit__isnull=True) | Q(used_count__lt=F('usage_limit')),
+        pk=promo.pk,
+        is_active=True,
+        start_date__lte=now,
+        end_date__gte=now,
+    ).update(used_count=F('used_count') + 1) == 1
+
+
+def redeem_promo_code(promo, user, product, order_amount):
+    """
+    Застосовує промокод до товару: займає слот ліміту і записує
+    PromoCodeUsage в одній транзакції. Якщо запис не вдався (повторне
+    застосування — unique_together), слот повертається разом з відкатом.
+    Повертає RedemptionResult зі статусом і сумою знижки (Money).
+    """
+    order_amount = Money.of(order_amount)
+    if order_amount < Money.of(promo.min_order_amount):
+        return RedemptionResult(MIN_AMOUNT, promo, None, ZERO)
+
+    discount_amount = order_amount - promo.apply_to_price(order_amount)
+    now = timezone.now()
+    try:
+        with transaction.atomic():
+            if not _claim_slot(promo, now):
+                promo.refresh_from_db(fields=['is_active', 'start_date', 'end_date', 'usage_limit', 'used_count'])
+                in_period = promo.is_active and promo.start_date <= now <= promo.end_date
+                status = LIMIT_REACHED if in_period and not promo.can_be_used() else NOT_VALID
+                return RedemptionResult(status, promo, None, ZERO)
+            usage = PromoCodeUsage.objects.create(
+                promo_code=promo,
+                user=user,
+                product=product,
+                order_amount=order_amount.to_decimal(),
+                discount_amount=discount_amount.to_decimal(),
+            )
+    except IntegrityError:
+        return RedemptionResult(ALREADY_USED, promo, None, ZERO)
+
+    # UPDATE не надсилає post_save, а used_count впливає на is_valid()
+    invalidate_promo_cache()
+    promo.refresh_from_db(fields=['used_count'])
+    return RedemptionResult(REDEEMED, promo, usage, discount_amount)
+
+
+def _usage_count():
+    usages = PromoCodeUsage.objects.filter(promo_code=OuterRef('pk')).order_by().values('promo_code')
+    return Coalesce(Subquery(usages.annotate(count=Count('*')).values('count')), 0)
+
+
+def reconcile_promo_counts(since=None, dry_run=False, chunk_size=RECONCILE_CHUNK_SIZE):
+    """
+    Звіряє used_count з кількістю PromoCodeUsage. Промокоди обходяться
+    частинами за pk; на частину — один SELECT розбіжностей і один
+    UPDATE ... SET used_count = (SELECT COUNT(*) ...) лише для них.
+    З since перевіряються тільки коди, створені або використані після цієї
+    миті. Повертає (кількість перевірених, список PromoCountDrift).
+    """
+    promos = PromoCode.objects.order_by('pk')
+    if since is not None:
+        used_since = PromoCodeUsage.objects.filter(used_at__gte=since).values('promo_code')
+        promos = promos.filter(Q(created_at__gte=since) | Q(pk__in=used_since))
+
+    checked, drifted = 0, []
+    last_pk = 0
+    while True:
+        pks = list(promos.filter(pk__gt=last_pk).values_list('pk', flat=True)[:chunk_size])
+        if not pks:
+            break
+        last_pk = pks[-1]
+        checked += len(pks)
+
+        chunk = PromoCode.objects.filter(pk__gte=pks[0], pk__lte=last_pk)
+        if since is not None:
+            chunk = chunk.filter(pk__in=pks)
+        found = [
+            PromoCountDrift(*row)
+            for row in chunk.annotate(actual=_usage_count()).exclude(used_count=F('actual'))
+            .values_list('pk', 'code', 'used_count', 'actual')
+        ]
+        if found and not dry_run:
+            # Кількість рахується заново в самому UPDATE, тож паралельні
+            # використання між SELECT і UPDATE не загубляться
+            PromoCode.objects.filter(pk__in=[drift.pk for drift in found]).update(used_count=_usage_count())
+        drifted.extend(found)
+
+    if drifted and not dry_run:
+        invalidate_promo_cache()
+    return checked, drifted
+
+
+def record_daily_usage(promo_code_id, used_at, discount_amount, uses=1):
+    """
+    Додає використання (або з uses=-1 віднімає) до денного підсумку
+    промокоду. Рядок дня змінюється через F(), тож паралельні записи не
+    перетирають один одного.
+    """
+    day = timezone.localdate(used_at)
+    discount_amount = discount_amount or 0
+    changes = {'uses': F('uses') + uses, 'discount_total': F('discount_total') + discount_amount * uses}
+    stats = PromoCodeDailyStat.objects.filter(promo_code_id=promo_code_id, date=day)
+    if stats.update(**changes) or uses < 0:
+        return
+    try:
+        with transaction.atomic():
+            PromoCodeDailyStat.objects.create(
+                promo_code_id=promo_code_id, date=day, uses=uses, discount_total=discount_amount,
+            )
+    except IntegrityError:
+        # Рядок дня щойно створив паралельний запит
+        stats.update(**changes)
+
+
+def rebuild_daily_stats(promos=None):
+    """
+    Перераховує денні підсумки з PromoCodeUsage одним GROUP BY — для
+    використань, записаних в обхід сигналів (bulk_create, update).
+    """
+    usages = PromoCodeUsage.objects.order_by()
+    stats = PromoCodeDailyStat.objects.all()
+    if promos is not None:
+        usages = usages.filter(promo_code__in=promos)
+        stats = stats.filter(promo_code__in=promos)
+
+    rows = (
+        usages.annotate(date=TruncDate('used_at')).values('promo_code_id', 'date')
+        .annotate(uses=Count('id'), discount_total=Sum('discount_amount'))
+    )
+    with transaction.atomic():
+        stats.delete()
+        return len(PromoCodeDailyStat.objects.bulk_create(
+            (PromoCodeDailyStat(**row) for row in rows.iterator()), batch_size=1000,
+        ))
+
+
+def get_promo_stats(promo):
+    """
+    Статистика промокоду з денних підсумків: кількість і сума знижок
+    агрегуються в БД, час не залежить від кількості використань.
+    """
+    daily = promo.daily_stats.filter(uses__gt=0)
+    totals = daily.aggregate(uses=Sum('uses'), discount=Sum('discount_total'))
+    total_uses = totals['uses'] or 0
+    total_discount = totals['discount'] or Decimal('0.00')
+    return {
+        'total_uses': total_uses,
+        'total_discount': total_discount,
+        'average_discount': (total_discount / total_uses).quantize(Decimal('0.01')) if total_uses else Decimal('0.00'),
+        'usages_by_date': {day.isoformat(): uses for day, uses in daily.order_by('date').values_list('date', 'uses')},
+    }
@@ -0,0 +1,52 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from main.models import Product
+from main.page_cache import invalidate_product_pages
+from main.pricing import refresh_effective_prices
+from .models import Discount, PromoCode, PromoCodeUsage
+from .promo_resolver import invalidate_promo_cache
+from .services import record_daily_usage
+
+
+def _discount_product_ids(instance):
+    # Знижку могли перенести на інший товар: попередній теж втрачає її
+    return {instance.product_id, getattr(instance, '_previous_product_id', None)} - {None}
+
+
+@receiver(pre_save, sender=Discount)
+def remember_discount_product(sender, instance, raw=False, **kwargs):
+    instance._previous_product_id = None
+    if instance.pk and not raw:
+        instance._previous_product_id = (
+            Discount.objects.filter(pk=instance.pk).values_list('product_id', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Discount)
+@receiver(post_delete, sender=Discount)
+def invalidate_discounted_product_pages(sender, instance, **kwargs):
+    invalidate_product_pages(*_discount_product_ids(instance))
+
+
+@receiver(post_save, sender=Discount)
+@receiver(post_delete, sender=Discount)
+def refresh_discounted_product_price(sender, instance, raw=False, **kwargs):
+    if not raw:
+        refresh_effective_prices(Product.objects.filter(pk__in=_discount_product_ids(instance)))
+
+
+@receiver(post_save, sender=PromoCode)
+@receiver(post_delete, sender=PromoCode)
+def invalidate_promo_codes(sender, **kwargs):
+    invalidate_promo_cache()
+
+
+@receiver(post_save, sender=PromoCodeUsage)
+def add_usage_to_daily_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        record_daily_usage(instance.promo_code_id, instance.used_at, instance.discount_amount)
+
+
+@receiver(post_delete, sender=PromoCodeUsage)
+def remove_usage_from_daily_stats(sender, instance, **kwargs):
+    record_daily_usage(instance.promo_code_id, instance.used_at, instance.discount_amount, uses=-1)
@@ -1,3 +1,472 @@
-from django.test import TestCase
+import logging
+import os
+import time
+import unittest
+from io import StringIO
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.core.management import CommandError, call_command
+from django.urls import reverse
+from django.db import IntegrityError, connection, connections, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from main.models import Category, Product
+from main.money import Money
+from .batch_codes import (
+    MAX_ATTEMPTS, BatchCodeError, CodeGenerator, batch_csv_name, generate_promo_codes, get_batch_status, write_batch,
+)
+from .models import PromoCode, PromoCodeDailyStat, PromoCodeUsage, normalize_code
+from .promo_resolver import PromoResolver, invalidate_promo_cache
+from .services import (
+    ALREADY_USED, LIMIT_REACHED, NOT_VALID, REDEEMED, get_promo_stats, rebuild_daily_stats, reconcile_promo_counts,
+    redeem_promo_code,
+)
 
-# Create your tests here.
+RUN_BENCHMARKS = os.environ.get('SHOP_BENCHMARKS') == '1'
+# Результати бенчмарків (INFO); у тексті помилки, якщо бенчмарк не пройшов
+benchmark_logger = logging.getLogger('benchmarks')
+MEMORY_STORAGES = {**settings.STORAGES, 'default': {'BACKEND': 'django.core.files.storage.InMemoryStorage'}}
+
+
+def make_promo(**kwargs):
+    now = timezone.now()
+    defaults = dict(
+        code='RACE', discount_type='percentage', value=Decimal('10'), min_order_amount=Decimal('0'),
+        is_active=True, start_date=now - timedelta(days=1), end_date=now + timedelta(days=1),
+    )
+    defaults.update(kwargs)
+    return PromoCode.objects.create(**defaults)
+
+
+def make_product(slug='tovar', name='Товар', **kwargs):
+    category, _ = Category.objects.get_or_create(slug='test', defaults={'name': 'Тест'})
+    return Product.objects.create(category=category, name=name, slug=slug, price=Decimal('100.00'), **kwargs)
+
+
+class RedeemPromoCodeTests(TransactionTestCase):
+    def setUp(self):
+        self.product = make_product()
+        self.user = User.objects.create_user('buyer')
+
+    def test_statuses(self):
+        promo = make_promo(usage_limit=1)
+        result = redeem_promo_code(promo, self.user, self.product, Money.of('100'))
+        self.assertEqual(result.status, REDEEMED)
+        self.assertEqual(result.discount_amount, Money.of('10'))
+        self.assertEqual(result.usage.discount_amount, Decimal('10.00'))
+
+        other = User.objects.create_user('other')
+        self.assertEqual(redeem_promo_code(promo, other, self.product, Money.of('100')).status, LIMIT_REACHED)
+
+        unlimited = make_promo(code='AGAIN')
+        redeem_promo_code(unlimited, self.user, self.product, Money.of('100'))
+        self.assertEqual(redeem_promo_code(unlimited, self.user, self.product, Money.of('100')).status, ALREADY_USED)
+        unlimited.refresh_from_db()
+        self.assertEqual(unlimited.used_count, 1)
+
+        expired = make_promo(code='OLD', end_date=timezone.now() - timedelta(hours=1))
+        self.assertEqual(redeem_promo_code(expired, self.user, self.product, Money.of('100')).status, NOT_VALID)
+
+    @unittest.skipUnless(connection.vendor == 'postgresql', 'SQLite не дає паралельних записів')
+    def test_parallel_redemptions_do_not_exceed_limit(self):
+        limit, attempts = 25, 300
+        promo = make_promo(usage_limit=limit)
+        users = User.objects.bulk_create([User(username=f'user{i}') for i in range(attempts)])
+
+        def redeem(user):
+            try:
+                promo_copy = PromoCode.objects.get(pk=promo.pk)
+                return redeem_promo_code(promo_copy, user, self.product, Money.of('100')).status
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=32) as pool:
+            statuses = list(pool.map(redeem, users))
+
+        promo.refresh_from_db()
+        self.assertEqual(statuses.count(REDEEMED), limit)
+        self.assertEqual(statuses.count(LIMIT_REACHED), attempts - limit)
+        self.assertEqual(promo.used_count, limit)
+        self.assertEqual(PromoCodeUsage.objects.filter(promo_code=promo).count(), limit)
+
+
+class PromoResolverTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.products = [make_product(slug=f'tovar-{i}', name=f'Товар {i}') for i in range(3)]
+        cls.promos = [make_promo(code=f'CODE{i}') for i in range(3)]
+        cls.session = {
+            'applied_promo_code': 'CODE2',
+            'product_promo_codes': {
+                str(cls.products[0].id): {'code': 'CODE0', 'promo_id': cls.promos[0].id},
+                str(cls.products[1].id): {'code': 'CODE1', 'promo_id': cls.promos[1].id},
+            },
+        }
+
+    def setUp(self):
+        invalidate_promo_cache()
+
+    def test_session_promos_loaded_with_one_query(self):
+        resolver = PromoResolver(self.session)
+        with self.assertNumQueries(1):
+            self.assertEqual(resolver.get_by_code('CODE2'), self.promos[2])
+            self.assertEqual([resolver.for_product(product) for product in self.products], [*self.promos[:2], None])
+            self.assertEqual(resolver.for_product(self.products[2], fallback_to_applied=True), self.promos[2])
+
+    def test_process_cache_invalidated_on_save(self):
+        PromoResolver(self.session).applied()
+        with self.assertNumQueries(0):
+            self.assertEqual(PromoResolver(self.session).applied(), self.promos[2])
+
+        self.promos[2].is_active = False
+        self.promos[2].save()
+        with self.assertNumQueries(1):
+            self.assertFalse(PromoResolver(self.session).applied().is_active)
+
+    def test_numeric_code_is_not_an_id(self):
+        promo = self.promos[0]
+        numeric = make_promo(code=str(promo.pk))
+        padded = make_promo(code=f'00{promo.pk}')
+        resolver = PromoResolver({'applied_promo_code': str(promo.pk)})
+        self.assertEqual(resolver.applied(), numeric)
+        self.assertEqual(resolver.get_by_code(f'00{promo.pk}'), padded)
+        self.assertEqual(PromoResolver({'applied_promo_id': promo.pk}).applied(), promo)
+        self.assertIsNone(PromoResolver({'applied_promo_code': '987654'}).applied())
+
+    def test_cached_copy_reads_current_used_count(self):
+        limited = make_promo(code='ONCE', usage_limit=1)
+        session = {'applied_promo_code': 'ONCE'}
+        self.assertTrue(PromoResolver(session).applied().is_valid())
+        # Інший процес використав промокод: його кеш тут не очищено
+        PromoCode.objects.filter(pk=limited.pk).update(used_count=1)
+        with self.assertNumQueries(1):
+            self.assertFalse(PromoResolver(session).applied().is_valid())
+
+    @override_settings(PROMO_CACHE={'TIMEOUT': 0})
+    def test_process_cache_disabled(self):
+        PromoResolver(self.session).applied()
+        with self.assertNumQueries(1):
+            PromoResolver(self.session).applied()
+
+
+def seed_promo_usages(promos_count, users_count, product):
+    """Промокоди з використаннями; у кожного десятого лічильник розійшовся."""
+    now = timezone.now()
+    promos = PromoCode.objects.bulk_create([
+        PromoCode(
+            code=f'SEED{i}', discount_type='percentage', value=Decimal('5'),
+            start_date=now - timedelta(days=1), end_date=now + timedelta(days=1),
+            used_count=(i % users_count) + (1 if i % 10 == 0 else 0),
+        )
+        for i in range(promos_count)
+    ])
+    users = User.objects.bulk_create([User(username=f'seed{i}') for i in range(users_count)])
+    PromoCodeUsage.objects.bulk_create([
+        PromoCodeUsage(
+            promo_code=promo, user=user, product=product,
+            order_amount=Decimal('100.00'), discount_amount=Decimal('5.00'),
+        )
+        for i, promo in enumerate(promos)
+        for user in users[:i % users_count]
+    ], batch_size=2000)
+    return promos
+
+
+class ReconcilePromoCountsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed_promo_usages(30, 4, make_product())
+
+    def test_reports_and_fixes_only_drifted(self):
+        checked, drifted = reconcile_promo_counts(dry_run=True, chunk_size=7)
+        self.assertEqual(checked, 30)
+        self.assertEqual(sorted(drift.code for drift in drifted), ['SEED0', 'SEED10', 'SEED20'])
+        self.assertEqual(PromoCode.objects.get(code='SEED10').used_count, 3)
+
+        _, drifted = reconcile_promo_counts(chunk_size=7)
+        self.assertEqual(len(drifted), 3)
+        self.assertEqual(PromoCode.objects.get(code='SEED10').used_count, 2)
+        self.assertEqual(reconcile_promo_counts()[1], [])
+
+    def test_since_checks_recently_used_codes(self):
+        PromoCode.objects.update(created_at=timezone.now() - timedelta(days=10))
+        PromoCodeUsage.objects.update(used_at=timezone.now() - timedelta(days=10))
+        PromoCodeUsage.objects.filter(promo_code__code='SEED10').update(used_at=timezone.now())
+
+        checked, drifted = reconcile_promo_counts(since=timezone.now() - timedelta(days=1))
+        self.assertEqual(checked, 1)
+        self.assertEqual([drift.code for drift in drifted], ['SEED10'])
+
+
+class PromoStatsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.product = make_product()
+        cls.promo = make_promo()
+        cls.users = [User.objects.create_user(f'user{i}') for i in range(3)]
+
+    def use(self, user, discount, days_ago=0):
+        usage = PromoCodeUsage.objects.create(
+            promo_code=self.promo, user=user, product=self.product,
+            order_amount=Decimal('100.00'), discount_amount=Decimal(discount),
+        )
+        if days_ago:
+            used_at = usage.used_at - timedelta(days=days_ago)
+            PromoCodeUsage.objects.filter(pk=usage.pk).update(used_at=used_at)
+            usage.used_at = used_at
+        return usage
+
+    def test_daily_stats_follow_usages(self):
+        self.use(self.users[0], '10.00')
+        self.use(self.users[1], '5.50')
+        usage = self.use(self.users[2], '2.00')
+        stats = get_promo_stats(self.promo)
+        self.assertEqual((stats['total_uses'], stats['total_discount']), (3, Decimal('17.50')))
+        self.assertEqual(stats['average_discount'], Decimal('5.83'))
+        self.assertEqual(list(stats['usages_by_date'].values()), [3])
+
+        usage.delete()
+        self.assertEqual(self.promo.get_usage_stats()['total_discount'], Decimal('15.50'))
+
+    def test_rebuild_matches_usages(self):
+        self.use(self.users[0], '10.00', days_ago=2)
+        self.use(self.users[1], '5.00')
+        PromoCodeDailyStat.objects.all().delete()
+
+        self.assertEqual(rebuild_daily_stats([self.promo]), 2)
+        stats = get_promo_stats(self.promo)
+        self.assertEqual(stats['total_uses'], 2)
+        self.assertEqual(len(stats['usages_by_date']), 2)
+
+    def test_rebuild_command(self):
+        other = make_promo(code='OTHER')
+        self.use(self.users[0], '10.00', days_ago=2)
+        PromoCodeUsage.objects.create(
+            promo_code=other, user=self.users[1], product=self.product,
+            order_amount=Decimal('100.00'), discount_amount=Decimal('1.00'),
+        )
+        PromoCodeDailyStat.objects.all().delete()
+
+        out = StringIO()
+        call_command('rebuild_promo_stats', 'race', stdout=out)
+        self.assertIn('Перераховано денних підсумків: 1', out.getvalue())
+        self.assertEqual(get_promo_stats(other)['total_uses'], 0)
+
+        call_command('rebuild_promo_stats', stdout=StringIO())
+        self.assertEqual(get_promo_stats(other)['total_uses'], 1)
+        with self.assertRaisesMessage(CommandError, 'MISSING'):
+            call_command('rebuild_promo_stats', 'missing', stdout=StringIO())
+
+    def test_stats_page_paginates_and_does_not_write(self):
+        for user in self.users:
+            self.use(user, '1.00')
+        PromoCode.objects.filter(pk=self.promo.pk).update(used_count=99)
+        self.client.force_login(User.objects.create_user('staff', is_staff=True))
+
+        url = reverse('discounts:promo_code_stats', args=[self.promo.pk])
+        response = self.client.get(url)
+        self.assertEqual(response.context['usages_count'], 3)
+        self.assertEqual(PromoCode.objects.get(pk=self.promo.pk).used_count, 99)
+
+        with mock.patch('discounts.views.USAGES_PER_PAGE', 2):
+            first = self.client.get(url).context['usages']
+            second = self.client.get(url, {'cursor': first.next_cursor}).context['usages']
+        self.assertEqual(len(first) + len(second), 3)
+        self.assertFalse(second.has_next())
+
+
+@unittest.skipUnless(RUN_BENCHMARKS, 'SHOP_BENCHMARKS=1 для запуску бенчмарків')
+class ReconcilePromoCountsBenchmark(TestCase):
+    def test_set_based_vs_per_code(self):
+        seed_promo_usages(5000, 8, make_product())
+
+        started = time.perf_counter()
+        with transaction.atomic():
+            for promo in PromoCode.objects.all():
+                promo.update_usage_count()
+            transaction.set_rollback(True)
+        per_code = time.perf_counter() - started
+
+        started = time.perf_counter()
+        checked, drifted = reconcile_promo_counts()
+        set_based = time.perf_counter() - started
+
+        summary = (
+            f'звірка {checked} промокодів ({len(drifted)} розбіжностей): по одному {per_code:.2f} с, '
+            f'частинами {set_based:.2f} с ({per_code / set_based:.0f}x)'
+        )
+        benchmark_logger.info(summary)
+        self.assertEqual(len(drifted), 500, summary)
+        self.assertLess(set_based, per_code, summary)
+
+
+class FixedGenerator(CodeGenerator):
+    """Віддає наперед задані коди, щоб перевірити обробку збігів."""
+
+    def __init__(self, batches):
+        super().__init__(length=8)
+        self.batches = iter(batches)
+
+    def generate(self, count):
+        return set(next(self.batches)[:count])
+
+
+class ImmediateExecutor:
+    def submit(self, fn, *args, **kwargs):
+        fn(*args, **kwargs)
+
+
+class GeneratePromoCodesTests(TestCase):
+    def promo_fields(self):
+        now = timezone.now()
+        return dict(
+            discount_type='percentage', value=Decimal('5'), usage_limit=1,
+            start_date=now, end_date=now + timedelta(days=30),
+        )
+
+    def test_generator_codes_are_unique_and_use_alphabet(self):
+        generator = CodeGenerator('spring ', length=6, alphabet='abc')
+        codes = generator.generate(500)
+        self.assertEqual(len(codes), 500)
+        self.assertTrue(all(code.startswith('SPRING') and len(code) == 12 for code in codes))
+        self.assertLessEqual(set(''.join(code[6:] for code in codes)), set('ABC'))
+
+    def test_skips_existing_codes_and_creates_in_chunks(self):
+        make_promo(code='TAKEN')
+        generator = FixedGenerator([['TAKEN', 'NEW1', 'NEW2'], ['NEW3'], ['NEW4', 'NEW5']])
+        chunks = list(generate_promo_codes(4, generator, chunk_size=3, **self.promo_fields()))
+        self.assertEqual(chunks, [['NEW1', 'NEW2', 'NEW3'], ['NEW4']])
+        self.assertEqual(PromoCode.objects.filter(code__startswith='NEW', usage_limit=1).count(), 4)
+
+    def test_rejects_small_code_space(self):
+        with self.assertRaises(BatchCodeError):
+            next(generate_promo_codes(1000, CodeGenerator(length=4, alphabet='AB'), **self.promo_fields()))
+
+    @override_settings(STORAGES=MEMORY_STORAGES)
+    def test_staff_view_generates_batch_file(self):
+        self.client.force_login(User.objects.create_user('staff', is_staff=True))
+        # Фоновий потік має власне з'єднання і не бачить транзакції тесту
+        with mock.patch('discounts.batch_codes.get_executor', return_value=ImmediateExecutor()), \
+                mock.patch('discounts.batch_codes._run_batch', write_batch), \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('discounts:generate_promo_codes'), {
+                'count': 25, 'prefix': 'CSV', 'length': 8, 'alphabet': 'ABCDEFGH23456789',
+                'discount_type': 'fixed', 'value': '50', 'usage_limit': 1, 'min_order_amount': '0',
+                'start_date': '2026-01-01T00:00', 'end_date': '2026-12-31T00:00',
+            })
+        status_url = response['Location']
+        self.assertContains(self.client.get(status_url), 'Завантажити CSV')
+
+        response = self.client.get(f'{status_url}download/')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        lines = b''.join(response.streaming_content).decode('utf-8-sig').splitlines()
+        self.assertEqual(lines[0], 'code,discount_type,value,usage_limit,start_date,end_date')
+        self.assertEqual(len(lines), 26)
+        self.assertEqual(PromoCode.objects.filter(code__startswith='CSV').count(), 25)
+
+    @override_settings(STORAGES=MEMORY_STORAGES)
+    def test_failed_batch_keeps_created_codes(self):
+        generator = FixedGenerator([['GOOD1', 'GOOD2'], *[['TAKEN']] * MAX_ATTEMPTS])
+        make_promo(code='TAKEN')
+        with self.assertLogs('discounts.batch_codes', 'ERROR'):
+            write_batch('failed', 3, generator, self.promo_fields(), chunk_size=2)
+
+        ready, error = get_batch_status('failed')
+        self.assertTrue(ready)
+        self.assertIn('унікальні коди', error)
+        with default_storage.open(batch_csv_name('failed')) as file:
+            lines = file.read().decode('utf-8-sig').splitlines()
+        self.assertEqual([line.split(',')[0] for line in lines[1:]], ['GOOD1', 'GOOD2'])
+        self.assertEqual(get_batch_status('missing'), (False, None))
+
+
+
+class PromoCodeNormalizationTests(TestCase):
+    def test_save_normalizes_code(self):
+        promo = make_promo(code='spring sale')
+        self.assertEqual(PromoCode.objects.get(pk=promo.pk).code, 'SPRINGSALE')
+        self.assertEqual(PromoCode.objects.get(code=normalize_code(' Spring Sale')), promo)
+
+    def test_database_rejects_unnormalized_bulk_insert(self):
+        now = timezone.now()
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            PromoCode.objects.bulk_create([PromoCode(
+                code='lower', discount_type='fixed', value=Decimal('1'), start_date=now, end_date=now,
+            )])
+
+    def test_exact_lookup_uses_index(self):
+        PromoCode.objects.bulk_create([
+            PromoCode(
+                code=f'CODE{i}', discount_type='fixed', value=Decimal('1'),
+                start_date=timezone.now(), end_date=timezone.now(),
+            )
+            for i in range(200)
+        ])
+        if connection.vendor == 'postgresql':
+            # На маленькій таблиці планувальник обрав би послідовне читання
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+            index_marker = 'Index'
+        else:
+            index_marker = 'USING INDEX'
+
+        plan = PromoCode.objects.filter(code=normalize_code('code42')).explain()
+        self.assertIn(index_marker, plan)
+        self.assertNotIn(index_marker, PromoCode.objects.filter(code__iexact='code42').explain())
+
+
+class NormalizeCodesMigrationTests(TransactionTestCase):
+    before = [('discounts', '0004_promo_daily_stats')]
+    after = [('discounts', '0005_promo_code_normalized')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_suffix_skips_taken_codes(self):
+        OldPromoCode = self.migrate(self.before).get_model('discounts', 'PromoCode')
+        now = timezone.now()
+
+        def create(code):
+            return OldPromoCode.objects.create(
+                code=code, discount_type='percentage', value=Decimal('10'), start_date=now, end_date=now,
+            ).pk
+
+        create('SALE')
+        pk = create('sale')
+        create(f'SALE-{pk}')
+        other = create('spring sale')
+
+        self.migrate(self.after)
+        codes = dict(PromoCode.objects.values_list('pk', 'code'))
+        self.assertEqual(codes[pk], f'SALE-{pk}-2')
+        self.assertEqual(codes[other], 'SPRINGSALE')
+        self.assertEqual(len(set(codes.values())), 4)
+
+
+@unittest.skipUnless(RUN_BENCHMARKS, 'SHOP_BENCHMARKS=1 для запуску бенчмарків')
+class GeneratePromoCodesBenchmark(TestCase):
+    def test_million_codes(self):
+        count = int(os.environ.get('SHOP_BENCHMARK_PROMO_CODES', 1_000_000))
+        now = timezone.now()
+        started = time.perf_counter()
+        created = sum(len(chunk) for chunk in generate_promo_codes(
+            count, CodeGenerator('BENCH'), discount_type='percentage', value=Decimal('5'), usage_limit=1,
+            start_date=now, end_date=now + timedelta(days=30),
+        ))
+        seconds = time.perf_counter() - started
+        summary = f'генерація {created} промокодів: {seconds:.1f} с ({created / seconds:.0f} кодів/с)'
+        benchmark_logger.info(summary)
+        self.assertEqual(PromoCode.objects.count(), count, summary)
+        self.assertLess(seconds, 60, summary)
@@ -11,6 +11,9 @@ urlpatterns = [
 
 	path('promo/', views.promo_code_list, name='promo_code_list'),
 	path('promo/create/', views.create_promo_code, name='promo_code_form'),
+	path('promo/generate/', views.generate_promo_codes_view, name='generate_promo_codes'),
+	path('promo/generate/<slug:name>/', views.promo_code_batch, name='promo_code_batch'),
+	path('promo/generate/<slug:name>/download/', views.download_promo_code_batch, name='download_promo_code_batch'),
 	path('promo/edit/<int:code_id>/', views.edit_promo_code, name='edit_promo_code'),
 	path('promo/apply/', views.apply_promo_code, name='apply_promo_code'),
 	path('promo/remove/', views.delete_promo_code, name='delete_promo_code'),
@@ -1,17 +1,24 @@
-from django.db import IntegrityError
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.admin.views.decorators import staff_member_required
 from django.urls import reverse
 from decimal import Decimal
 from main.models import Category, Product
+from main.money import Money
+from main.pagination import KeysetPaginator
+from main.pricing import calculate_pricing
 from .models import Discount, PromoCode, PromoCodeUsage
-from .forms import DiscountForm, PromoCodeForm, ApplyPromoCodeForm
+from .batch_codes import BatchCodeError, batch_csv_name, get_batch_status, start_batch
+from .forms import DiscountForm, PromoCodeForm, PromoCodeBatchForm, ApplyPromoCodeForm
+from .services import ALREADY_USED, LIMIT_REACHED, MIN_AMOUNT, get_promo_stats, redeem_promo_code
 from django.views.decorators.http import require_POST
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, JsonResponse
 from django.db.models import Q
 
+USAGES_PER_PAGE = 50
+
 def product_discounts(request, product_id):
     product = get_object_or_404(Product, id=product_id)
 
@@ -21,36 +28,19 @@ def product_discounts(request, product_id):
     except (ValueError, TypeError):
         quantity = 1
 
-    original_unit_price = getattr(product, 'price', Decimal('0.00'))
-    total_original = (original_unit_price or Decimal('0.00')) * quantity
-
     related = product.discounts.filter(is_active=True)
     valid_discounts = [d for d in related if d.is_valid()]
-
-    best_discount = None
-    best_amount = Decimal('0.00')
-    for d in valid_discounts:
-        try:
-            amt = Decimal(d.calculate_discount(original_unit_price, quantity))
-        except Exception:
-            amt = Decimal('0.00')
-        if amt > best_amount:
-            best_amount = amt
-            best_discount = d
-
-    discounted_total = total_original - best_amount
-    if discounted_total < 0:
-        discounted_total = Decimal('0.00')
+    pricing = calculate_pricing(product.price, valid_discounts, quantity)
 
     context = {
         'product': product,
         'quantity': quantity,
-        'original_unit_price': original_unit_price,
-        'total_original': total_original,
+        'original_unit_price': Money.of(product.price),
+        'total_original': Money.of(product.price) * quantity,
         'discounts': valid_discounts,
-        'best_discount': best_discount,
-        'best_discount_amount': best_amount,
-        'discounted_total': discounted_total,
+        'best_discount': pricing.discount,
+        'best_discount_amount': pricing.discount_amount,
+        'discounted_total': pricing.price,
     }
     return render(request, 'discounts/product_discounts.html', context)
 
@@ -132,6 +122,39 @@ def create_promo_code(request):
 	return render(request, 'discounts/promo_code_form.html', {'form': form})
 
 
+
+@staff_member_required
+def generate_promo_codes_view(request):
+    form = PromoCodeBatchForm(request.POST or None)
+    if request.method == 'POST' and form.is_valid():
+        fields = {**form.promo_fields(), 'created_by': request.user}
+        try:
+            # Генерація йде у фоні й пише CSV у сховище: обрив з'єднання
+            # не лишає в БД кодів, яких ніхто не отримав
+            name = start_batch(form.cleaned_data['count'], form.generator, fields)
+        except BatchCodeError as e:
+            form.add_error(None, str(e))
+        else:
+            return redirect('discounts:promo_code_batch', name=name)
+
+    return render(request, 'discounts/promo_code_batch.html', {'form': form})
+
+
+@staff_member_required
+def promo_code_batch(request, name):
+    ready, error = get_batch_status(name)
+    return render(request, 'discounts/promo_code_batch_status.html', {'name': name, 'ready': ready, 'error': error})
+
+
+@staff_member_required
+def download_promo_code_batch(request, name):
+    path = batch_csv_name(name)
+    if not default_storage.exists(path):
+        raise Http404('Партію ще не згенеровано')
+    return FileResponse(
+        default_storage.open(path), as_attachment=True, filename=f'{name}.csv', content_type='text/csv; charset=utf-8',
+    )
+
 @staff_member_required
 def promo_code_list(request):
 	categories = Category.objects.all()
@@ -164,14 +187,10 @@ def apply_promo_code(request):
     if not form.is_valid():
         return JsonResponse({'success': False, 'errors': form.errors}, status=400)
 
-    code = form.cleaned_data.get('code')
+    # Форма вже завантажила промокод під час перевірки
+    promo = form.promo
     subtotal = form.cleaned_data.get('subtotal') or Decimal('0.00')
 
-    try:
-        promo = PromoCode.objects.get(code__iexact=code)
-    except PromoCode.DoesNotExist:
-        return JsonResponse({'success': False, 'error': 'Промокод не знайдений'}, status=404)
-
     if request.user.is_authenticated:
         already_used = PromoCodeUsage.objects.filter(promo_code=promo, user=request.user).exists()
         if already_used:
@@ -246,32 +265,20 @@ def delete_promo_code(request, code_id=None):
 @staff_member_required
 def promo_code_stats(request, code_id):
     promo = get_object_or_404(PromoCode, id=code_id)
+    stats = get_promo_stats(promo)
 
-    usages = PromoCodeUsage.objects.filter(promo_code=promo).select_related('user').order_by('-used_at')
-
-    total_discount = Decimal('0.00')
-    usages_count = usages.count()
-    
-    for usage in usages:
-        if usage.discount_amount:
-            total_discount += usage.discount_amount
-
-    usages_by_date = {}
-    for usage in usages:
-        date_key = usage.used_at.strftime('%Y-%m-%d')
-        usages_by_date[date_key] = usages_by_date.get(date_key, 0) + 1
-
-    promo.used_count = usages_count
-    promo.save(update_fields=['used_count'])
+    usages = PromoCodeUsage.objects.filter(promo_code=promo).select_related('user')
+    usages = KeysetPaginator(usages, '-used_at', USAGES_PER_PAGE).page(request.GET.get('cursor'))
 
     context = {
         'promo': promo,
         'usages': usages,
-        'total_discount': total_discount,
-        'total_used_count': usages_count,
-        'total_discount_amount': total_discount,
-        'usages_count': usages_count,
-        'usages_by_date': usages_by_date,
+        'total_discount': stats['total_discount'],
+        'total_used_count': stats['total_uses'],
+        'total_discount_amount': stats['total_discount'],
+        'usages_count': stats['total_uses'],
+        'average_discount': stats['average_discount'],
+        'usages_by_date': stats['usages_by_date'],
     }
     return render(request, 'discounts/promo_code_stats.html', context)
 
@@ -323,52 +330,37 @@ def apply_promo_code_view(request):
                 # }
                 # return render(request, 'discounts/apply_promo_code.html', context)
             
-            if promo.usage_limit and promo.usage_limit > 0:
-                current_usage_count = PromoCodeUsage.objects.filter(promo_code=promo).count()
-                if current_usage_count >= promo.usage_limit:
-                    messages.error(
-                        request,
-                        f'Промокод "{promo_code}" вичерпав ліміт використань.'
-                    )
-                    return redirect(product_obj.get_absolute_url())
-
-            if hasattr(product_obj, 'get_discounted_price'):
-                product_price = product_obj.get_discounted_price()
-            else:
-                product_price = product_obj.price
-            
-            if promo.min_order_amount and product_price < promo.min_order_amount:
+            product_price = product_obj.get_discounted_price()
+            result = redeem_promo_code(promo, request.user, product_obj, product_price)
+
+            if result.status == LIMIT_REACHED:
                 messages.error(
                     request,
-                    f'❌ Промокод "{promo_code}" можна застосувати тільки до товарів вартістю від {promo.min_order_amount:.2f} грн. '
-                    f'Ціна цього товару: {product_price:.2f} грн.'
+                    f'Промокод "{promo_code}" вичерпав ліміт використань.'
                 )
                 return redirect(product_obj.get_absolute_url())
 
-            discount_amount = Decimal('0.00')
-            if promo.discount_type == 'percentage':
-                discount_amount = product_price * (Decimal(str(promo.value)) / Decimal('100'))
-            elif promo.discount_type == 'fixed':
-                discount_amount = min(Decimal(str(promo.value)), product_price)
-            
-            try:
-                PromoCodeUsage.objects.create(
-                    promo_code=promo,
-                    user=request.user,
-                    product=product_obj,
-                    order_amount=product_price,
-                    discount_amount=discount_amount
+            if result.status == MIN_AMOUNT:
+                messages.error(
+                    request,
+                    f'❌ Промокод "{promo_code}" можна застосувати тільки до товарів вартістю від {promo.min_order_amount:.2f} грн. '
+                    f'Ціна цього товару: {product_price:.2f} грн.'
                 )
-                
-                promo.increment_usage()
+                return redirect(product_obj.get_absolute_url())
 
-            except IntegrityError:
+            if result.status == ALREADY_USED:
                 messages.warning(
                     request,
                     f'Ви вже застосували промокод "{promo_code}" до цього товару.'
                 )
                 return redirect(product_obj.get_absolute_url())
 
+            if not result.ok:
+                messages.error(request, 'Промокод недійсний або не може бути використаний')
+                return redirect(product_obj.get_absolute_url())
+
+            discount_amount = result.discount_amount
+
             current_promos = request.session.get('product_promo_codes', {})
             current_promos[product_id_post] = {
                 'code': promo_code,
@@ -0,0 +1,293 @@
+import heapq
+import logging
+import sys
+import threading
+import time
+from bisect import bisect_left
+from django.core.cache import cache
+from django.db import connections
+from django.urls import reverse
+from .search import tokenize
+
+logger = logging.getLogger(__name__)
+
+MIN_QUERY_LENGTH = 2
+DEFAULT_LIMIT = 8
+# Перегляди змінюються без сигналів (F-оновлення), тому індекс
+# періодично перебудовується, щоб ранжування не застарівало
+MAX_AGE = 60 * 10
+
+# Власна версія індексу: змінюється лише з назвами, slug і наявністю
+# товарів та категорій, а не з кожною зміною каталогу
+INDEX_VERSION_KEY = 'autocomplete:version'
+INDEX_FIELDS = {'name', 'slug', 'is_available'}
+
+# Для коротких префіксів (2–3 символи) діапазон охоплює майже весь каталог,
+# тому найкращі TOP_PER_PREFIX записів зберігаються заздалегідь
+SHORT_PREFIX_LENGTH = 3
+TOP_PER_PREFIX = 64
+# Довші префікси переглядають щонайбільше стільки записів діапазону
+MAX_SCAN = 5000
+
+PRODUCT = 'product'
+CATEGORY = 'category'
+
+
+class PrefixIndex:
+    """
+    Префіксний індекс назв товарів і категорій у пам'яті процесу.
+    Кожне слово назви зберігається у відсортованому списку, тому пошук
+    префікса — це два bisect і вибір найпопулярніших з діапазону. Для
+    коротких префіксів найпопулярніші записи зберігаються окремо (_top),
+    щоб час пошуку не залежав від розміру каталогу.
+    """
+
+    def __init__(self):
+        self._keys = []
+        self._refs = []
+        self._items = {}
+        self._top = {}
+        self._lock = threading.RLock()
+        self.version = None
+        self.built_at = 0
+
+    def _words(self, name):
+        return sorted(set(tokenize(name)))
+
+    @staticmethod
+    def _short_prefixes(word):
+        return {word[:length] for length in range(MIN_QUERY_LENGTH, min(len(word), SHORT_PREFIX_LENGTH) + 1)}
+
+    def _rank(self, ref):
+        # Категорії завжди вище товарів, далі — за переглядами
+        return ref[0] == CATEGORY, self._items[ref]['views'], -ref[1]
+
+    def _forget_top(self, words):
+        # Список перераховується при наступному пошуку цього префікса
+        for word in words:
+            for prefix in self._short_prefixes(word):
+                self._top.pop(prefix, None)
+
+    def _range(self, prefix):
+        start = bisect_left(self._keys, prefix)
+        end = bisect_left(self._keys, prefix + '\U0010ffff', lo=start)
+        return start, end
+
+    def _top_refs(self, prefix):
+        top = self._top.get(prefix)
+        if top is None:
+            start, end = self._range(prefix)
+            top = self._top[prefix] = heapq.nlargest(TOP_PER_PREFIX, set(self._refs[start:end]), key=self._rank)
+        return top
+
+    def add(self, kind, pk, name, slug, views=0):
+        with self._lock:
+            self.remove(kind, pk)
+            words = self._words(name)
+            self._items[(kind, pk)] = {'name': name, 'slug': slug, 'views': views, 'words': words}
+            self._forget_top(words)
+            for word in words:
+                position = bisect_left(self._keys, word)
+                self._keys.insert(position, word)
+                self._refs.insert(position, (kind, pk))
+
+    def remove(self, kind, pk):
+        with self._lock:
+            item = self._items.pop((kind, pk), None)
+            if item is None:
+                return
+            self._forget_top(item['words'])
+            for word in item['words']:
+                position = bisect_left(self._keys, word)
+                while position < len(self._keys) and self._keys[position] == word:
+                    if self._refs[position] == (kind, pk):
+                        del self._keys[position]
+                        del self._refs[position]
+                        break
+                    position += 1
+
+    def load(self, entries):
+        """Повна побудова з ітератора (kind, pk, name, slug, views)."""
+        items = {}
+        pairs = []
+        for kind, pk, name, slug, views in entries:
+            words = self._words(name)
+            items[(kind, pk)] = {'name': name, 'slug': slug, 'views': views, 'words': words}
+            pairs.extend((word, (kind, pk)) for word in words)
+        pairs.sort()
+
+        by_prefix = {}
+        for word, ref in pairs:
+            for prefix in self._short_prefixes(word):
+                by_prefix.setdefault(prefix, set()).add(ref)
+
+        def rank(ref):
+            return ref[0] == CATEGORY, items[ref]['views'], -ref[1]
+
+        top = {prefix: heapq.nlargest(TOP_PER_PREFIX, refs, key=rank) for prefix, refs in by_prefix.items()}
+        with self._lock:
+            self._items = items
+            self._keys = [word for word, _ in pairs]
+            self._refs = [ref for _, ref in pairs]
+            self._top = top
+            self.built_at = time.monotonic()
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        tokens = tokenize(query)
+        if not tokens or len(''.join(tokens)) < MIN_QUERY_LENGTH:
+            return []
+
+        # Діапазон шукаємо за найдовшим словом — він найвужчий
+        prefix = max(tokens, key=len)
+        rest = [token for token in tokens if token != prefix]
+        def matches(item):
+            return all(any(word.startswith(token) for word in item['words']) for token in rest)
+
+        with self._lock:
+            if len(prefix) <= SHORT_PREFIX_LENGTH:
+                # Список уже впорядковано; інші слова запиту можуть відсіяти
+                # частину, тоді результатів буде менше за limit
+                best = [ref for ref in self._top_refs(prefix) if matches(self._items[ref])][:limit]
+            else:
+                start, end = self._range(prefix)
+                refs = set(self._refs[start:min(end, start + MAX_SCAN)])
+                best = heapq.nlargest(limit, (ref for ref in refs if matches(self._items[ref])), key=self._rank)
+            return [(ref[0], ref[1], self._items[ref]['name'], self._items[ref]['slug']) for ref in best]
+
+    def stats(self):
+        with self._lock:
+            size = sys.getsizeof(self._keys) + sys.getsizeof(self._refs) + sys.getsizeof(self._items)
+            size += sum(sys.getsizeof(key) for key in self._keys)
+            size += sum(sys.getsizeof(ref) for ref in self._refs)
+            for item in self._items.values():
+                size += sys.getsizeof(item) + sys.getsizeof(item['name']) + sys.getsizeof(item['words'])
+            return {
+                'items': len(self._items),
+                'keys': len(self._keys),
+                'bytes': size,
+            }
+
+
+_index = PrefixIndex()
+_build_lock = threading.Lock()
+
+
+def get_index_version():
+    version = cache.get(INDEX_VERSION_KEY)
+    if version is None:
+        cache.add(INDEX_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(INDEX_VERSION_KEY)
+    return version
+
+
+def invalidate_index():
+    """Позначає індекси всіх процесів застарілими; повертає нову версію."""
+    try:
+        return cache.incr(INDEX_VERSION_KEY)
+    except ValueError:
+        cache.add(INDEX_VERSION_KEY, time.time_ns(), None)
+        return None
+
+
+def _iter_entries():
+    from .models import Category, Product
+
+    for pk, name, slug in Category.objects.filter(is_active=True).values_list('id', 'name', 'slug'):
+        yield CATEGORY, pk, name, slug, 0
+    products = Product.objects.filter(is_available=True).values_list('id', 'name', 'slug', 'views')
+    for pk, name, slug, views in products.iterator(chunk_size=5000):
+        yield PRODUCT, pk, name, slug, views
+
+
+def build_index():
+    # Версія береться до читання: зміни під час побудови зроблять індекс застарілим
+    version = get_index_version()
+    started = time.perf_counter()
+    _index.load(_iter_entries())
+    _index.version = version
+    stats = _index.stats()
+    logger.info(
+        "Індекс автодоповнення побудовано за %.0f мс: %s записів, %s ключів, ~%.1f КБ",
+        (time.perf_counter() - started) * 1000, stats['items'], stats['keys'], stats['bytes'] / 1024,
+    )
+    return stats
+
+
+def _is_stale():
+    return _index.version != get_index_version() or time.monotonic() - _index.built_at > MAX_AGE
+
+
+def _rebuild_in_background():
+    try:
+        build_index()
+    except Exception:
+        logger.exception("Не вдалося перебудувати індекс автодоповнення")
+    finally:
+        # Потік відкриває власне з'єднання з БД
+        connections.close_all()
+        _build_lock.release()
+
+
+def get_index():
+    """
+    Індекс будується при першому зверненні в процесі. Далі, якщо його
+    змінили в іншому процесі (версія в кеші) або минуло MAX_AGE секунд, він
+    перебудовується у фоновому потоці, а запити тим часом отримують
+    попередню версію.
+    """
+    if _index.version is None:
+        with _build_lock:
+            if _index.version is None:
+                build_index()
+    elif _is_stale() and _build_lock.acquire(blocking=False):
+        try:
+            threading.Thread(target=_rebuild_in_background, name='autocomplete-index', daemon=True).start()
+        except Exception:
+            _build_lock.release()
+            raise
+    return _index
+
+
+def _apply_change(change):
+    """
+    Застосовує зміну до індексу процесу і змінює спільну версію. Якщо
+    індекс був актуальним (нова версія — наступна після його), він
+    лишається актуальним; інші процеси перебудують свої.
+    """
+    version = _index.version
+    new_version = invalidate_index()
+    if version is None:
+        return
+    change()
+    if new_version is not None and new_version == version + 1:
+        _index.version = new_version
+
+
+def index_product(product):
+    if product.is_available:
+        _apply_change(lambda: _index.add(PRODUCT, product.pk, product.name, product.slug, product.views))
+    else:
+        _apply_change(lambda: _index.remove(PRODUCT, product.pk))
+
+
+def index_category(category):
+    if category.is_active:
+        _apply_change(lambda: _index.add(CATEGORY, category.pk, category.name, category.slug))
+    else:
+        _apply_change(lambda: _index.remove(CATEGORY, category.pk))
+
+
+def unindex(kind, pk):
+    _apply_change(lambda: _index.remove(kind, pk))
+
+
+def autocomplete(query, limit=DEFAULT_LIMIT):
+    results = {'categories': [], 'products': []}
+    for kind, pk, name, slug in get_index().search(query, limit):
+        if kind == CATEGORY:
+            url = reverse('main:product_list_by_category', kwargs={'category_slug': slug})
+            results['categories'].append({'id': pk, 'name': name, 'url': url})
+        else:
+            url = reverse('main:product_detail', args=[pk, slug])
+            results['products'].append({'id': pk, 'name': name, 'url': url})
+    return results
@@ -0,0 +1,52 @@
+import hashlib
+import json
+from django.utils import timezone
+
+CARD_CACHE_PREFIX = 'product_card'
+# Перегляди і рейтинг оновлюються без зміни updated_at, тому картка
+# живе в кеші не довше за цей час
+CARD_CACHE_TIMEOUT = 60 * 10
+
+
+def _timestamp(value):
+    return value.timestamp() if value else None
+
+
+def card_cache_key(product, promo=None):
+    """
+    Ключ картки товару: все, від чого залежить її HTML. Промокод входить
+    у ключ своїми параметрами і чинністю (активність, термін, ліміт), тож
+    однаковий HTML отримують лише сесії з тим самим промокодом у тому самому
+    стані.
+    """
+    discount = product.get_pricing().discount
+    state = (
+        product.pk,
+        _timestamp(product.updated_at),
+        product.category_id,
+        product.category.name if product.category_id else None,
+        product.rating_count,
+        product.rating_sum,
+        # Варіанти зображення дописуються фоновим .update() без зміни updated_at
+        product.image.name,
+        json.dumps(product.image_variants, sort_keys=True, default=str),
+        (
+            discount.pk, discount.discount_type, str(discount.value),
+            _timestamp(discount.start_date), _timestamp(discount.end_date),
+        ) if discount else None,
+        (
+            promo.pk, promo.discount_type, str(promo.value), str(promo.min_order_amount), promo.is_valid(),
+        ) if promo else None,
+    )
+    digest = hashlib.sha1(repr(state).encode()).hexdigest()
+    return f'{CARD_CACHE_PREFIX}:{product.pk}:{digest}'
+
+
+def card_cache_timeout(product, now=None):
+    """Не довше, ніж до початку або кінця найближчої знижки товару."""
+    product.get_pricing()
+    expires = getattr(product, '_pricing_expires', None)
+    if expires is None:
+        return CARD_CACHE_TIMEOUT
+    seconds = int((expires - (now or timezone.now())).total_seconds()) + 1
+    return max(1, min(CARD_CACHE_TIMEOUT, seconds))
@@ -0,0 +1,72 @@
+import time
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db.models import Count
+
+CATALOG_VERSION_KEY = 'catalog:version'
+CATEGORY_COUNTS_KEY = 'catalog:category_counts'
+CATEGORY_COUNTS_TIMEOUT = 60 * 60
+
+# Поля товару, зміна яких впливає на лічильники категорій
+COUNT_FIELDS = {'is_available', 'category', 'category_id'}
+
+
+def is_shared_cache(backend=None):
+    """
+    Чи бачать записи в кеші інші процеси. LocMem живе в пам'яті процесу:
+    інвалідація в одному воркері не доходить до решти.
+    """
+    backend = backend or caches[DEFAULT_CACHE_ALIAS]
+    return not isinstance(backend, (LocMemCache, DummyCache))
+
+
+def _new_version():
+    # Після витіснення ключа версія не повинна збігтися зі старими записами
+    return time.time_ns()
+
+
+def get_catalog_version():
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOG_VERSION_KEY, _new_version(), None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def invalidate_catalog():
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        cache.add(CATALOG_VERSION_KEY, _new_version(), None)
+
+
+def compute_category_counts():
+    from .models import Product
+
+    rows = (
+        Product.objects.filter(is_available=True)
+        .values('category_id').annotate(n=Count('id')).order_by()
+    )
+    by_category = {row['category_id']: row['n'] for row in rows}
+    return {'by_category': by_category, 'total': sum(by_category.values())}
+
+
+def get_category_counts():
+    """
+    Кількість доступних товарів по категоріях одним згрупованим запитом.
+    Результат кешується разом з версією каталогу, тому будь-яка зміна
+    товарів чи категорій (invalidate_catalog) робить його неактуальним.
+    """
+    cached = cache.get_many([CATALOG_VERSION_KEY, CATEGORY_COUNTS_KEY])
+    version = cached.get(CATALOG_VERSION_KEY)
+    if version is None:
+        version = get_catalog_version()
+
+    data = cached.get(CATEGORY_COUNTS_KEY)
+    if data is not None and data.get('version') == version:
+        return data
+
+    data = {'version': version, **compute_category_counts()}
+    cache.set(CATEGORY_COUNTS_KEY, data, CATEGORY_COUNTS_TIMEOUT)
+    return data
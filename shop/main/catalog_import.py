@@ -0,0 +1,269 @@
+import csv
+import json
+import re
+import sys
+import time
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from django.db import transaction
+from django.db.models import Q
+from django.utils.text import slugify
+from .models import Category, Product
+from .pricing import refresh_effective_prices
+from .search import update_search_vectors
+
+MAX_PRICE = Decimal('100000000')  # Product.price: max_digits=10, decimal_places=2
+SLUG_MAX_LENGTH = 150  # Product.slug
+# Запас довжини під суфікс -N згенерованого slug
+SLUG_BASE_LENGTH = 140
+SLUG_LOOKUP_BATCH = 200
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'так', '+'}
+
+# Транслітерація для slug, як prepopulated_fields в адмінці
+TRANSLIT = str.maketrans({
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'h', 'ґ': 'g', 'д': 'd', 'е': 'e', 'є': 'ie', 'ж': 'zh',
+    'з': 'z', 'и': 'y', 'і': 'i', 'ї': 'i', 'й': 'i', 'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n',
+    'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u', 'ф': 'f', 'х': 'kh', 'ц': 'ts',
+    'ч': 'ch', 'ш': 'sh', 'щ': 'shch', 'ь': '', 'ю': 'iu', 'я': 'ia', 'ы': 'y', 'э': 'e', 'ё': 'io', 'ъ': '',
+})
+
+
+class ImportRowError(ValueError):
+    pass
+
+
+def make_slug(value, max_length):
+    return slugify((value or '').lower().translate(TRANSLIT))[:max_length].strip('-')
+
+
+def iter_rows(path, fmt=None):
+    """
+    Построково читає CSV або JSONL ('-' — stdin) і повертає словники
+    рядків. Файл ніколи не завантажується в пам'ять цілком; замість
+    рядка, який не вдалося розібрати, повертається ImportRowError.
+    """
+    fmt = fmt or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+    source = sys.stdin if path == '-' else open(path, encoding='utf-8-sig', newline='')
+    try:
+        if fmt == 'csv':
+            yield from csv.DictReader(source)
+        else:
+            for line in source:
+                if not line.strip():
+                    continue
+                try:
+                    data = json.loads(line)
+                except ValueError as e:
+                    data = ImportRowError(f"Некоректний JSON: {e}")
+                if not isinstance(data, (dict, ImportRowError)):
+                    data = ImportRowError("Рядок JSONL має бути об'єктом")
+                yield data
+    finally:
+        if source is not sys.stdin:
+            source.close()
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in TRUE_VALUES
+
+
+def parse_row(data):
+    name = (data.get('name') or '').strip()
+    if not name:
+        raise ImportRowError("Порожня назва товару")
+    category_name = (data.get('category') or '').strip()
+    category_slug = (data.get('category_slug') or '').strip() or make_slug(category_name, 100)
+    if not category_slug:
+        raise ImportRowError("Не вказано категорію")
+    try:
+        price = Decimal(str(data.get('price', '')).replace(',', '.').strip())
+    except InvalidOperation:
+        raise ImportRowError(f"Некоректна ціна: {data.get('price')!r}")
+    if not price.is_finite() or price < 0 or price >= MAX_PRICE:
+        raise ImportRowError(f"Некоректна ціна: {data.get('price')!r}")
+
+    row = {
+        'name': name[:100],
+        'slug': (data.get('slug') or '').strip()[:SLUG_MAX_LENGTH],
+        'category_slug': category_slug,
+        'category_name': category_name or category_slug,
+        'price': price.quantize(Decimal('0.01')),
+    }
+    for field in ('description', 'detailed_description'):
+        if field in data:
+            row[field] = data[field] or ''
+    for field in ('is_available', 'featured'):
+        if field in data and data[field] not in (None, ''):
+            row[field] = _parse_bool(data[field])
+    return row
+
+
+class ProductImporter:
+    """
+    Імпорт товарів пакетами: кожен пакет — одна транзакція з upsert
+    категорій і товарів через bulk_create(update_conflicts=True) за slug.
+    Оновлюються лише товари з явним slug; рядки без нього завжди створюють
+    нові товари. У пам'яті тримається лише поточний пакет і словник категорій.
+    """
+
+    def __init__(self, chunk_size=1000, dry_run=False, max_errors=20):
+        self.chunk_size = chunk_size
+        self.dry_run = dry_run
+        self.max_errors = max_errors
+        self.categories = dict(Category.objects.values_list('slug', 'id'))
+        self.new_categories = set()
+        self.stats = {'rows': 0, 'imported': 0, 'skipped': 0, 'categories': 0, 'seconds': 0.0}
+        self.errors = []
+
+    def run(self, rows, progress=None):
+        started = time.perf_counter()
+        for chunk in chunked(rows, self.chunk_size):
+            parsed = []
+            for data in chunk:
+                self.stats['rows'] += 1
+                try:
+                    if isinstance(data, ImportRowError):
+                        raise data
+                    row = parse_row(data)
+                except ImportRowError as e:
+                    self._error(self.stats['rows'], e)
+                else:
+                    row['line'] = self.stats['rows']
+                    parsed.append(row)
+            if parsed:
+                self.stats['imported'] += self.import_chunk(parsed)
+            self.stats['seconds'] = time.perf_counter() - started
+            if progress:
+                progress(self.stats)
+        return self.stats
+
+    def _error(self, line, error):
+        self.stats['skipped'] += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append(f'Рядок {line}: {error}')
+
+    def import_chunk(self, rows):
+        with transaction.atomic():
+            new_categories = self._upsert_categories(rows)
+            self._resolve_slugs(rows)
+            count = self._upsert_products(rows)
+            if self.dry_run:
+                transaction.set_rollback(True)
+        if self.dry_run:
+            # Нові категорії відкотились разом з транзакцією
+            for slug in new_categories:
+                self.categories.pop(slug, None)
+        return count
+
+    def _upsert_categories(self, rows):
+        missing = {}
+        for row in rows:
+            if row['category_slug'] not in self.categories:
+                missing.setdefault(row['category_slug'], row['category_name'][:100])
+        if not missing:
+            return ()
+        Category.objects.bulk_create(
+            [Category(slug=slug, name=name) for slug, name in missing.items()],
+            update_conflicts=True, unique_fields=['slug'], update_fields=['name'],
+        )
+        self.categories.update(Category.objects.filter(slug__in=missing).values_list('slug', 'id'))
+        # У режимі dry-run ті самі категорії "створюються" в кожному пакеті
+        self.stats['categories'] += len(missing.keys() - self.new_categories)
+        self.new_categories.update(missing)
+        return missing
+
+    def _resolve_slugs(self, rows):
+        """
+        Явний slug — ключ upsert; з кількох рядків пакета з тим самим slug
+        береться останній, решта потрапляє в помилки. Рядки без slug
+        отримують його з назви з першим вільним номером (-2, -3, ...):
+        вільним і в БД, і серед slug цього пакета, тож такий рядок ніколи
+        не перезапише наявний товар.
+        """
+        by_slug = {}
+        for row in rows:
+            if not row['slug']:
+                continue
+            previous = by_slug.get(row['slug'])
+            if previous is not None:
+                self._error(
+                    previous['line'], f"slug {row['slug']!r} повторюється в рядку {row['line']}, рядок пропущено",
+                )
+            by_slug[row['slug']] = row
+
+        generated = [row for row in rows if not row['slug']]
+        bases = {row['name']: make_slug(row['name'], SLUG_BASE_LENGTH) or 'product' for row in generated}
+        taken = self._taken_slugs(set(bases.values())) | by_slug.keys()
+        for row in generated:
+            base = bases[row['name']]
+            slug, n = base, 1
+            while slug in taken:
+                n += 1
+                slug = f'{base}-{n}'
+            taken.add(slug)
+            row['slug'] = slug
+            row['generated'] = True
+        rows[:] = [*by_slug.values(), *generated]
+
+    def _taken_slugs(self, bases):
+        """Наявні в БД slug вигляду base або base-N для кожної з bases."""
+        taken = set()
+        bases = sorted(bases)
+        for start in range(0, len(bases), SLUG_LOOKUP_BATCH):
+            batch = bases[start:start + SLUG_LOOKUP_BATCH]
+            query = Q(slug__in=batch)
+            for base in batch:
+                query |= Q(slug__startswith=f'{base}-')
+            patterns = re.compile('|'.join(rf'{re.escape(base)}(-\d+)?' for base in batch))
+            taken.update(
+                slug for slug in Product.objects.filter(query).values_list('slug', flat=True).iterator()
+                if patterns.fullmatch(slug)
+            )
+        return taken
+
+    def _upsert_products(self, rows):
+        update_fields = {'name', 'category', 'price', 'effective_price', 'updated_at'}
+        explicit, generated = [], []
+        for row in rows:
+            product = Product(
+                slug=row['slug'],
+                name=row['name'],
+                category_id=self.categories[row['category_slug']],
+                price=row['price'],
+                effective_price=row['price'],
+                description=row.get('description', ''),
+                detailed_description=row.get('detailed_description', ''),
+                is_available=row.get('is_available', True),
+                featured=row.get('featured', False),
+            )
+            product.render_detailed_description()
+            if row.get('generated'):
+                generated.append(product)
+                continue
+            for field in ('description', 'is_available', 'featured'):
+                if field in row:
+                    update_fields.add(field)
+            if 'detailed_description' in row:
+                update_fields.update(('detailed_description', 'detailed_description_html', 'detailed_description_hash'))
+            explicit.append(product)
+
+        if explicit:
+            Product.objects.bulk_create(
+                explicit, update_conflicts=True, unique_fields=['slug'], update_fields=sorted(update_fields),
+            )
+        if generated:
+            # Вільні slug перевірено в цій самій транзакції — лише вставка
+            Product.objects.bulk_create(generated)
+        imported = Product.objects.filter(slug__in=[row['slug'] for row in rows])
+        update_search_vectors(imported)
+        # Ціна записана без знижок — перераховуємо лише товари, де вони є
+        refresh_effective_prices(imported.filter(discounts__isnull=False).distinct())
+        return len(rows)
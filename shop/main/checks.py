@@ -0,0 +1,67 @@
+from django.core.checks import Error, Tags, Warning, register
+from django.db import connections
+from .catalog_cache import is_shared_cache
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """Буфер переглядів у режимі 'cache' читає команда з іншого процесу."""
+    from .view_counter import get_config
+
+    if is_shared_cache() or get_config()['BACKEND'] != 'cache':
+        return []
+    return [Error(
+        "PRODUCT_VIEWS_BUFFER['BACKEND'] = 'cache' потребує спільного кешу",
+        hint="Задайте REDIS_URL або використовуйте BACKEND = 'local'.",
+        id='main.E001',
+    )]
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache_deploy(app_configs, **kwargs):
+    """Інвалідація каталогу і кеш сторінок розраховані на кеш, спільний для всіх воркерів."""
+    if is_shared_cache():
+        return []
+    return [Warning(
+        'Кеш за замовчуванням локальний для процесу: зміни каталогу не будуть '
+        'видні іншим воркерам до закінчення TIMEOUT',
+        hint='Задайте REDIS_URL (див. CACHES у settings.py).',
+        id='main.W001',
+    )]
+
+
+@register(Tags.database)
+def check_search_config(app_configs, databases=None, **kwargs):
+    """
+    Збережені search_vector мають бути побудовані з PRODUCT_SEARCH_CONFIG:
+    запити main.search використовують цю конфігурацію, і з іншою вектори
+    не збігаються. Перевіряється один товар.
+    """
+    from .models import Product
+    from .search import build_search_vector, get_search_config
+
+    errors = []
+    config = get_search_config()
+    for alias in databases or []:
+        if connections[alias].vendor != 'postgresql':
+            continue
+        with connections[alias].cursor() as cursor:
+            cursor.execute('SELECT 1 FROM pg_ts_config WHERE cfgname = %s', [config.rsplit('.', 1)[-1]])
+            exists = cursor.fetchone() is not None
+        if not exists:
+            errors.append(Error(
+                f"PRODUCT_SEARCH_CONFIG = '{config}': такої конфігурації пошуку немає в базі '{alias}'",
+                id='main.E002',
+            ))
+            continue
+        sample = (
+            Product.objects.using(alias).filter(search_vector__isnull=False).order_by('pk')
+            .annotate(expected=build_search_vector()).values_list('search_vector', 'expected').first()
+        )
+        if sample is not None and sample[0] != sample[1]:
+            errors.append(Warning(
+                f"Пошуковий індекс у базі '{alias}' побудовано не з PRODUCT_SEARCH_CONFIG = '{config}'",
+                hint='Запустіть manage.py rebuild_search_index.',
+                id='main.W002',
+            ))
+    return errors
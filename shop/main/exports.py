@@ -0,0 +1,193 @@
+import csv
+import json
+from datetime import datetime, time
+from decimal import Decimal
+from django.apps import apps
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+CHUNK_SIZE = 2000
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+
+BOOL = 'bool'
+INT = 'int'
+DATE = 'date'
+
+# Колонки (заголовок, поле для values_list) і фільтри з тими самими
+# параметрами, що й list_filter/date_hierarchy в адмінці, тож рядок
+# запиту зі сторінки списку адмінки можна передати в експорт як є.
+# Колонки товарів збігаються з колонками import_products.
+EXPORTS = {
+    'products': {
+        'model': 'main.Product',
+        'columns': [
+            ('id', 'id'),
+            ('name', 'name'),
+            ('slug', 'slug'),
+            ('category', 'category__name'),
+            ('category_slug', 'category__slug'),
+            ('price', 'price'),
+            ('description', 'description'),
+            ('detailed_description', 'detailed_description'),
+            ('is_available', 'is_available'),
+            ('featured', 'featured'),
+            ('views', 'views'),
+            ('rating_avg', 'rating_avg'),
+            ('rating_count', 'rating_count'),
+            ('created_at', 'created_at'),
+            ('updated_at', 'updated_at'),
+        ],
+        'filters': {
+            'category__id__exact': INT,
+            'is_available__exact': BOOL,
+            'featured__exact': BOOL,
+            'created_at__gte': DATE,
+            'created_at__lt': DATE,
+        },
+    },
+    'reviews': {
+        'model': 'reviews.Review',
+        'columns': [
+            ('id', 'id'),
+            ('product_id', 'product_id'),
+            ('product', 'product__name'),
+            ('author', 'author__username'),
+            ('rating', 'rating'),
+            ('title', 'title'),
+            ('content', 'content'),
+            ('advantages', 'advantages'),
+            ('disadvantages', 'disadvantages'),
+            ('is_active', 'is_active'),
+            ('helpful_count', 'helpful_count'),
+            ('created_at', 'created_at'),
+        ],
+        'filters': {
+            'rating__exact': INT,
+            'is_active__exact': BOOL,
+            'created_at__gte': DATE,
+            'created_at__lt': DATE,
+        },
+    },
+    'promo-usages': {
+        'model': 'discounts.PromoCodeUsage',
+        'columns': [
+            ('id', 'id'),
+            ('promo_code', 'promo_code__code'),
+            ('user', 'user__username'),
+            ('product_id', 'product_id'),
+            ('order_amount', 'order_amount'),
+            ('discount_amount', 'discount_amount'),
+            ('used_at', 'used_at'),
+        ],
+        'filters': {
+            'promo_code__id__exact': INT,
+            'used_at__gte': DATE,
+            'used_at__lt': DATE,
+            'used_at__year': INT,
+            'used_at__month': INT,
+            'used_at__day': INT,
+        },
+    },
+}
+
+
+class ExportError(ValueError):
+    pass
+
+
+def _parse_filter_value(kind, value):
+    value = str(value).strip()
+    if kind == BOOL:
+        if value.lower() in ('1', 'true'):
+            return True
+        if value.lower() in ('0', 'false'):
+            return False
+    elif kind == INT:
+        if value.isdigit():
+            return int(value)
+    elif kind == DATE:
+        # Адмінка передає дату з часом і зоною, вручну зручніше лише дату
+        moment = parse_datetime(value)
+        if moment is None and (day := parse_date(value)) is not None:
+            moment = datetime.combine(day, time.min)
+        if moment is not None:
+            return moment if timezone.is_aware(moment) else timezone.make_aware(moment)
+    raise ValueError
+
+
+def build_queryset(dataset, filters=None):
+    if dataset not in EXPORTS:
+        raise ExportError(f"Невідомий набір даних: {dataset}")
+    spec = EXPORTS[dataset]
+    lookups = {}
+    for name, value in (filters or {}).items():
+        if name not in spec['filters']:
+            raise ExportError(f"Невідомий фільтр: {name}")
+        try:
+            lookups[name] = _parse_filter_value(spec['filters'][name], value)
+        except ValueError:
+            raise ExportError(f"Некоректне значення фільтра {name}: {value!r}")
+    model = apps.get_model(spec['model'])
+    return (
+        model._default_manager.filter(**lookups)
+        .order_by('pk')
+        .values_list(*(field for _, field in spec['columns']))
+    )
+
+
+def export_rows(dataset, filters=None, chunk_size=CHUNK_SIZE):
+    """
+    Повертає заголовок і ітератор кортежів. iterator(chunk_size) на
+    PostgreSQL читає через серверний курсор, тому в пам'яті лише один
+    пакет рядків незалежно від розміру таблиці.
+    """
+    queryset = build_queryset(dataset, filters)
+    header = [name for name, _ in EXPORTS[dataset]['columns']]
+    return header, queryset.iterator(chunk_size=chunk_size)
+
+
+class _Echo:
+    # csv.writer пише в "файл", який просто повертає рядок
+    def write(self, value):
+        return value
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _json_value(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def iter_csv(header, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow([_csv_value(value) for value in row])
+
+
+def iter_jsonl(header, rows):
+    for row in rows:
+        data = {name: _json_value(value) for name, value in zip(header, row)}
+        yield json.dumps(data, ensure_ascii=False) + '\n'
+
+
+def stream_export(dataset, filters=None, fmt='csv', chunk_size=CHUNK_SIZE):
+    if fmt not in FORMATS:
+        raise ExportError(f"Невідомий формат: {fmt}")
+    header, rows = export_rows(dataset, filters, chunk_size)
+    return iter_csv(header, rows) if fmt == 'csv' else iter_jsonl(header, rows)
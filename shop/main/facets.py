@@ -0,0 +1,127 @@
+import hashlib
+from decimal import Decimal
+from django.core.cache import cache
+from django.db.models import Count, Q
+from .catalog_cache import get_catalog_version
+
+# Діапазони цін: ключ у запиті -> (від, до), межа "до" не включається
+PRICE_RANGES = {
+    '0-500': (None, Decimal('500')),
+    '500-1000': (Decimal('500'), Decimal('1000')),
+    '1000-5000': (Decimal('1000'), Decimal('5000')),
+    '5000-': (Decimal('5000'), None),
+}
+PRICE_LABELS = {
+    '0-500': 'До 500 грн',
+    '500-1000': '500 – 1 000 грн',
+    '1000-5000': '1 000 – 5 000 грн',
+    '5000-': 'Від 5 000 грн',
+}
+MIN_RATINGS = (4, 3, 2, 1)
+FLAG_FACETS = ('available', 'discount', 'featured')
+FACET_PARAMS = ('price', 'rating', *FLAG_FACETS)
+
+# Рейтинги і ціни зі знижками оновлюються без зміни версії каталогу,
+# тому лічильники живуть недовго
+FACET_CACHE_TIMEOUT = 60 * 5
+
+
+def parse_facet_filters(params):
+    """
+    Вибирає з GET-параметрів лише коректні значення фасетів, тому
+    однакові фільтри завжди дають однаковий ключ кешу.
+    """
+    filters = {}
+    price = params.get('price')
+    if price in PRICE_RANGES:
+        filters['price'] = price
+    try:
+        rating = int(params.get('rating', ''))
+    except ValueError:
+        rating = None
+    if rating in MIN_RATINGS:
+        filters['rating'] = rating
+    for flag in FLAG_FACETS:
+        if params.get(flag) == '1':
+            filters[flag] = True
+    return filters
+
+
+def price_q(key):
+    low, high = PRICE_RANGES[key]
+    q = Q()
+    if low is not None:
+        q &= Q(effective_price__gte=low)
+    if high is not None:
+        q &= Q(effective_price__lt=high)
+    return q
+
+
+def _facet_q(name, value):
+    if name == 'price':
+        return price_q(value)
+    if name == 'rating':
+        return Q(rating_avg__gte=value)
+    if name == 'available':
+        return Q(is_available=True)
+    if name == 'discount':
+        return Q(discount_percent__gt=0)
+    return Q(featured=True)
+
+
+def _filters_q(filters, exclude=None):
+    q = Q()
+    for name, value in filters.items():
+        if name != exclude:
+            q &= _facet_q(name, value)
+    return q
+
+
+def apply_facet_filters(queryset, filters):
+    if not filters:
+        return queryset
+    return queryset.filter(_filters_q(filters))
+
+
+def compute_facet_counts(queryset, filters):
+    """
+    Кількість товарів для кожного значення фасетів одним запитом з умовними
+    агрегатами. Кожен фасет рахується з урахуванням усіх інших вибраних
+    фільтрів, але без власного, щоб було видно, скільки дасть інший вибір.
+    """
+    aggregates = {'total': Count('pk', filter=_filters_q(filters))}
+
+    other = _filters_q(filters, exclude='price')
+    for key in PRICE_RANGES:
+        aggregates[f'price_{key}'] = Count('pk', filter=other & price_q(key))
+
+    other = _filters_q(filters, exclude='rating')
+    for rating in MIN_RATINGS:
+        aggregates[f'rating_{rating}'] = Count('pk', filter=other & _facet_q('rating', rating))
+
+    for flag in FLAG_FACETS:
+        other = _filters_q(filters, exclude=flag)
+        aggregates[flag] = Count('pk', filter=other & _facet_q(flag, True))
+
+    counts = queryset.order_by().aggregate(**aggregates)
+    return {
+        'total': counts['total'],
+        'price': [(key, PRICE_LABELS[key], counts[f'price_{key}']) for key in PRICE_RANGES],
+        'rating': [(rating, counts[f'rating_{rating}']) for rating in MIN_RATINGS],
+        **{flag: counts[flag] for flag in FLAG_FACETS},
+    }
+
+
+def get_facet_counts(queryset, filters, scope):
+    """
+    Лічильники фасетів з кешу. scope описує базову вибірку (категорія,
+    пошуковий запит) і разом з нормалізованими фільтрами та версією
+    каталогу утворює ключ.
+    """
+    raw_key = repr((get_catalog_version(), scope, sorted(filters.items())))
+    key = f'facets:{hashlib.sha256(raw_key.encode()).hexdigest()}'
+    counts = cache.get(key)
+    if counts is None:
+        counts = compute_facet_counts(queryset, filters)
+        cache.set(key, counts, FACET_CACHE_TIMEOUT)
+    return counts
@@ -0,0 +1,187 @@
+import atexit
+import base64
+import io
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'WIDTHS': [320, 640, 1024],
+    'QUALITY': 80,
+    'PLACEHOLDER_WIDTH': 16,
+    'WORKERS': 2,
+}
+
+VARIANTS_DIR = 'variants'
+FORMATS = (('webp', 'WEBP'), ('jpeg', 'JPEG'))
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'IMAGE_VARIANTS', {})}
+
+
+def _variant_name(name, width, extension):
+    stem, _ = os.path.splitext(name)
+    return f'{VARIANTS_DIR}/{stem}-{width}w.{extension}'
+
+
+def build_variants(name, widths, quality, placeholder_width):
+    """
+    Створює зменшені копії зображення у WebP і JPEG та розмитий
+    плейсхолдер (data URI). Виконується в окремому процесі, тому
+    повертає лише прості дані для JSON-поля.
+    """
+    from PIL import Image, ImageFilter, ImageOps
+
+    with default_storage.open(name, 'rb') as source:
+        image = ImageOps.exif_transpose(Image.open(source))
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+    flat = image
+    if image.mode == 'RGBA':
+        flat = Image.new('RGB', image.size, (255, 255, 255))
+        flat.paste(image, mask=image.getchannel('A'))
+
+    variants = {'source': name, 'width': image.width, 'height': image.height}
+    for extension, pil_format in FORMATS:
+        variants[extension] = {}
+        source_image = image if extension == 'webp' else flat
+        # Не збільшуємо: ширини, більші за оригінал, замінюються ним самим
+        for width in sorted({min(width, image.width) for width in widths}):
+            resized = source_image if width == image.width else source_image.resize(
+                (width, max(1, round(image.height * width / image.width))), Image.LANCZOS,
+            )
+            buffer = io.BytesIO()
+            resized.save(buffer, pil_format, quality=quality, optimize=True)
+            variant_name = _variant_name(name, width, extension)
+            if default_storage.exists(variant_name):
+                default_storage.delete(variant_name)
+            variants[extension][str(width)] = default_storage.save(variant_name, ContentFile(buffer.getvalue()))
+
+    height = max(1, round(image.height * placeholder_width / image.width))
+    tiny = flat.resize((placeholder_width, height), Image.BILINEAR).filter(ImageFilter.GaussianBlur(1))
+    buffer = io.BytesIO()
+    tiny.save(buffer, 'JPEG', quality=50)
+    variants['placeholder'] = 'data:image/jpeg;base64,' + base64.b64encode(buffer.getvalue()).decode()
+    return variants
+
+
+def _init_worker():
+    import django
+
+    django.setup()
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor(workers=None):
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ProcessPoolExecutor(
+                    max_workers=workers or get_config()['WORKERS'],
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                )
+                atexit.register(_executor.shutdown, wait=False, cancel_futures=True)
+    return _executor
+
+
+def submit_variants(name):
+    config = get_config()
+    return get_executor().submit(
+        build_variants, name, config['WIDTHS'], config['QUALITY'], config['PLACEHOLDER_WIDTH'],
+    )
+
+
+def variant_files(variants):
+    variants = variants or {}
+    return {name for extension, _ in FORMATS for name in (variants.get(extension) or {}).values()}
+
+
+def delete_variant_files(variants, keep=()):
+    for name in variant_files(variants) - set(keep):
+        try:
+            default_storage.delete(name)
+        except Exception:
+            logger.exception("Не вдалося видалити варіант зображення %s", name)
+
+
+def _invalidate_pages(model, pk):
+    # Аватари бачать лише авторизовані користувачі, чиї сторінки не кешуються
+    from .models import Category, Product
+    from .page_cache import LIST_TAG, invalidate_product_pages, invalidate_tags
+
+    if issubclass(model, Product):
+        invalidate_product_pages(pk)
+    elif issubclass(model, Category):
+        invalidate_tags('categories', LIST_TAG)
+
+
+def store_variants(model, pk, image_field, variants_field, name, variants):
+    """
+    Записує варіанти, якщо зображення за цей час не замінили, видаляє
+    файли попередніх варіантів і скидає кеш сторінок з цим зображенням.
+    Повертає 1, якщо варіанти записано, і 0, якщо вони вже не потрібні.
+    """
+    rows = model._default_manager.filter(pk=pk, **{image_field: name})
+    previous = rows.values_list(variants_field, flat=True).first()
+    if not rows.update(**{variants_field: variants}):
+        delete_variant_files(variants)
+        return 0
+    delete_variant_files(previous, keep=variant_files(variants))
+    _invalidate_pages(model, pk)
+    return 1
+
+
+def schedule_variants(instance, image_field, variants_field):
+    """
+    Ставить генерацію варіантів у пул процесів після коміту, якщо
+    зображення змінилось. Результат записується з потоку пулу.
+    """
+    name = getattr(instance, image_field).name or ''
+    variants = getattr(instance, variants_field) or {}
+    if variants.get('source', '') == name:
+        return
+    model, pk = type(instance), instance.pk
+
+    if not name:
+        model._default_manager.filter(pk=pk).update(**{variants_field: {}})
+        transaction.on_commit(lambda: delete_variant_files(variants))
+        _invalidate_pages(model, pk)
+        return
+
+    def done(future):
+        try:
+            result = future.result()
+        except Exception:
+            logger.exception("Не вдалося створити варіанти зображення %s", name)
+            return
+        try:
+            store_variants(model, pk, image_field, variants_field, name, result)
+        except Exception:
+            logger.exception("Не вдалося зберегти варіанти зображення %s", name)
+        finally:
+            connections.close_all()
+
+    transaction.on_commit(lambda: submit_variants(name).add_done_callback(done))
+
+
+def build_srcset(variants, extension):
+    urls = (variants or {}).get(extension) or {}
+    return ', '.join(
+        f'{default_storage.url(name)} {width}w'
+        for width, name in sorted(urls.items(), key=lambda item: int(item[0]))
+    )
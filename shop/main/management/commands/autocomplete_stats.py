@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from main.autocomplete import build_index
+
+class Command(BaseCommand):
+    help = "Будує індекс автодоповнення і показує, скільки пам'яті він займає"
+
+    def handle(self, *args, **options):
+        stats = build_index()
+        self.stdout.write(self.style.SUCCESS(
+            f"Записів: {stats['items']}, ключів: {stats['keys']}, пам'ять: ~{stats['bytes'] / 1024:.1f} КБ"
+        ))
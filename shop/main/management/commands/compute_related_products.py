@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from main.recommendations import compute_related_products, prune_pair_events
+
+class Command(BaseCommand):
+    help = "Перераховує пов'язані товари за спільними переглядами та додаваннями в кошик. Запускайте за розкладом (cron)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, dest='top_k', help='Кількість сусідів на товар')
+        parser.add_argument('--days', type=int, help='За скільки останніх днів враховувати події')
+        parser.add_argument('--prune', action='store_true', help='Видалити події, старіші за вікно')
+
+    def handle(self, *args, **options):
+        created = compute_related_products(top_k=options['top_k'], window_days=options['days'])
+        self.stdout.write(self.style.SUCCESS(f"Збережено пов'язаних товарів: {created}"))
+
+        if options['prune']:
+            deleted = prune_pair_events(window_days=options['days'])
+            self.stdout.write(self.style.SUCCESS(f'Видалено старих подій: {deleted}'))
@@ -0,0 +1,52 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from main.exports import CHUNK_SIZE, EXPORTS, FORMATS, ExportError, export_rows, iter_csv, iter_jsonl
+
+class Command(BaseCommand):
+    help = (
+        'Потоково експортує товари, відгуки або використання промокодів у CSV/JSONL. '
+        'Фільтри — ті самі параметри, що й у списку адмінки, наприклад --filter is_available__exact=1'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=sorted(EXPORTS))
+        parser.add_argument('--format', choices=sorted(FORMATS), default='csv')
+        parser.add_argument('--output', '-o', help='Файл для запису (за замовчуванням stdout)')
+        parser.add_argument('--filter', action='append', default=[], metavar='ПАРАМЕТР=ЗНАЧЕННЯ')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        filters = {}
+        for item in options['filter']:
+            name, sep, value = item.partition('=')
+            if not sep:
+                raise CommandError(f'Фільтр має бути у вигляді параметр=значення: {item}')
+            filters[name] = value
+
+        try:
+            header, rows = export_rows(options['dataset'], filters, options['chunk_size'])
+        except ExportError as e:
+            raise CommandError(e)
+
+        count = 0
+
+        def counted(rows):
+            nonlocal count
+            for row in rows:
+                count += 1
+                yield row
+
+        lines = (iter_csv if options['format'] == 'csv' else iter_jsonl)(header, counted(rows))
+        started = time.perf_counter()
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+                output.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
+
+        # Дані можуть іти в stdout, тому підсумок — у stderr
+        seconds = time.perf_counter() - started
+        self.stderr.write(self.style.SUCCESS(
+            f'Експортовано {count} рядків за {seconds:.1f} с ({count / max(seconds, 1e-6):.0f} рядків/с)'
+        ))
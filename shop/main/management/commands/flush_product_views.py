@@ -0,0 +1,37 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from main.view_counter import drain_cache, get_view_buffer
+
+class Command(BaseCommand):
+    help = (
+        'Записує накопичені перегляди товарів у базу даних. З --loop працює '
+        'постійно і скидає спільний буфер кожні --interval секунд'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Скидати буфер періодично, доки не зупинять')
+        parser.add_argument('--interval', type=float, default=10, help='Пауза між скиданнями в режимі --loop')
+
+    def handle(self, *args, **options):
+        if not options['loop']:
+            written = self.flush()
+            if written is None:
+                raise CommandError('Не вдалося отримати блокування буфера переглядів, спробуйте пізніше')
+            self.stdout.write(self.style.SUCCESS(f'Записано {written} переглядів'))
+            return
+
+        try:
+            while True:
+                written = self.flush()
+                if written is None:
+                    self.stderr.write('Буфер переглядів заблоковано, повторимо пізніше')
+                elif written:
+                    self.stdout.write(self.style.SUCCESS(f'Записано {written} переглядів'))
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.SUCCESS(f'Зупинено, записано {self.flush() or 0} переглядів'))
+
+    def flush(self):
+        local = get_view_buffer().flush()
+        drained = drain_cache()
+        return None if drained is None else local + drained
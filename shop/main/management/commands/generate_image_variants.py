@@ -0,0 +1,43 @@
+from concurrent.futures import as_completed
+from django.core.management.base import BaseCommand
+from accounts.models import Profile
+from main.images import get_config, get_executor, store_variants, submit_variants
+from main.models import Category, Product
+
+TARGETS = (
+    (Product, 'image', 'image_variants'),
+    (Category, 'image', 'image_variants'),
+    (Profile, 'avatar', 'avatar_variants'),
+)
+
+class Command(BaseCommand):
+    help = 'Створює зменшені копії (WebP/JPEG) і плейсхолдери для вже завантажених зображень'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, help='Кількість процесів (за замовчуванням IMAGE_VARIANTS["WORKERS"])')
+        parser.add_argument('--force', action='store_true', help='Перегенерувати навіть актуальні варіанти')
+
+    def handle(self, *args, **options):
+        get_executor(options['workers'] or get_config()['WORKERS'])
+
+        futures = {}
+        for model, image_field, variants_field in TARGETS:
+            rows = (
+                model._default_manager.exclude(**{image_field: ''}).exclude(**{f'{image_field}__isnull': True})
+                .values_list('pk', image_field, variants_field).iterator()
+            )
+            for pk, name, variants in rows:
+                if options['force'] or (variants or {}).get('source') != name:
+                    futures[submit_variants(name)] = (model, pk, image_field, variants_field, name)
+
+        done = failed = 0
+        for future in as_completed(futures):
+            model, pk, image_field, variants_field, name = futures[future]
+            try:
+                store_variants(model, pk, image_field, variants_field, name, future.result())
+                done += 1
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f'{name}: {e}')
+
+        self.stdout.write(self.style.SUCCESS(f'Оброблено зображень: {done}, з помилками: {failed}'))
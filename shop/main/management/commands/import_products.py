@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from main.catalog_import import ProductImporter, iter_rows
+from main.page_cache import invalidate_tags
+
+class Command(BaseCommand):
+    help = (
+        'Імпортує товари з CSV або JSONL (потоково, пакетами). Колонки: name, slug, category, '
+        'category_slug, price, description, detailed_description, is_available, featured'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Шлях до файлу або '-' для stdin")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='За замовчуванням — за розширенням файлу')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Перевірити файл без збереження змін')
+
+    def handle(self, *args, **options):
+        importer = ProductImporter(chunk_size=options['chunk_size'], dry_run=options['dry_run'])
+
+        def progress(stats):
+            if options['verbosity'] > 1:
+                self.stdout.write(
+                    f"{stats['rows']} рядків, {stats['rows'] / max(stats['seconds'], 1e-6):.0f} рядків/с"
+                )
+
+        stats = importer.run(iter_rows(options['path'], options['format']), progress=progress)
+
+        for error in importer.errors:
+            self.stderr.write(error)
+        if not options['dry_run'] and stats['imported']:
+            # Сторінки товарів залежать від тегу категорій — скидаємо їх разом
+            invalidate_tags('categories')
+
+        prefix = 'Перевірка (без збереження): ' if options['dry_run'] else ''
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}імпортовано {stats['imported']} з {stats['rows']} рядків, пропущено {stats['skipped']}, "
+            f"нових категорій {stats['categories']} за {stats['seconds']:.1f} с "
+            f"({stats['rows'] / max(stats['seconds'], 1e-6):.0f} рядків/с)"
+        ))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from main.models import Product
+from main.search import REBUILD_BATCH_SIZE, is_fulltext_supported, rebuild_search_index
+
+class Command(BaseCommand):
+    help = 'Перебудовує пошуковий індекс (search_vector) товарів'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=REBUILD_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        if not is_fulltext_supported():
+            self.stdout.write(self.style.WARNING('Повнотекстовий пошук доступний лише на PostgreSQL'))
+            return
+
+        updated = rebuild_search_index(Product.objects.all(), batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Оновлено пошуковий індекс для {updated} товарів'))
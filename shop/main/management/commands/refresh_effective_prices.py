@@ -0,0 +1,41 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db.models import Min
+from django.utils import timezone
+from main.models import Product
+from main.pricing import refresh_effective_prices
+
+class Command(BaseCommand):
+    help = (
+        'Перераховує ціни зі знижками для товарів, у яких настала межа знижки (початок або кінець). '
+        'З --loop працює постійно і прокидається до наступної межі'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Перерахувати всі товари')
+        parser.add_argument('--loop', action='store_true', help='Не завершуватись, чекати наступної межі')
+        parser.add_argument(
+            '--max-sleep', type=int, default=300,
+            help='Найдовша пауза в режимі --loop, секунд (нові знижки перераховуються сигналами одразу)',
+        )
+
+    def handle(self, *args, **options):
+        if options['all']:
+            changed = refresh_effective_prices()
+            self.stdout.write(self.style.SUCCESS(f'Перераховано всі товари, змінено цін: {len(changed)}'))
+
+        while True:
+            now = timezone.now()
+            changed = refresh_effective_prices(Product.objects.filter(price_expires_at__lte=now), now=now)
+            next_boundary = Product.objects.aggregate(next=Min('price_expires_at'))['next']
+            if changed or options['verbosity'] > 1:
+                boundary = (
+                    f'{timezone.localtime(next_boundary):%Y-%m-%d %H:%M:%S}' if next_boundary else 'немає'
+                )
+                self.stdout.write(self.style.SUCCESS(f'Змінено цін: {len(changed)}; наступна межа: {boundary}'))
+            if not options['loop']:
+                break
+            delay = options['max_sleep']
+            if next_boundary is not None:
+                delay = min(delay, (next_boundary - timezone.now()).total_seconds())
+            time.sleep(max(delay, 1))
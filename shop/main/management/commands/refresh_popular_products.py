@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from main.popularity import refresh_popular_products
+
+class Command(BaseCommand):
+    help = 'Перераховує рейтинг популярних товарів (загальний і по категоріях). Запускайте за розкладом (cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, help='Кількість товарів у кожному рейтингу')
+        parser.add_argument(
+            '--half-life', type=float, dest='half_life',
+            help='Період напіврозпаду в годинах для оцінки із загасанням замість загальної кількості переглядів',
+        )
+
+    def handle(self, *args, **options):
+        created = refresh_popular_products(size=options['size'], half_life_hours=options['half_life'])
+        self.stdout.write(self.style.SUCCESS(f'Рейтинг популярних товарів оновлено: {created} позицій'))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from main.models import Product
+
+class Command(BaseCommand):
+    help = 'Перерендерює збережений HTML детальних описів товарів (після зміни класів Tailwind чи розширень Markdown)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--all', action='store_true', help='Перерендерити всі описи, а не лише застарілі')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        products = (
+            Product.objects.only('id', 'detailed_description', 'detailed_description_hash')
+            .order_by('id').iterator(chunk_size=batch_size)
+        )
+
+        batch = []
+        updated = 0
+        for product in products:
+            if options['all']:
+                product.detailed_description_hash = ''
+            if product.render_detailed_description():
+                batch.append(product)
+            if len(batch) >= batch_size:
+                updated += self._save(batch)
+                batch = []
+        updated += self._save(batch)
+        self.stdout.write(self.style.SUCCESS(f'Перерендерено описів: {updated}'))
+
+    def _save(self, batch):
+        if not batch:
+            return 0
+        Product.objects.bulk_update(batch, ['detailed_description_html', 'detailed_description_hash'])
+        return len(batch)
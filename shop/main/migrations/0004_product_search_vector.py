@@ -0,0 +1,45 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:01
+
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    # Та сама конфігурація, що й у main.search (перевірка main.W002)
+    config = getattr(settings, 'PRODUCT_SEARCH_CONFIG', 'simple')
+    schema_editor.execute(
+        "UPDATE main_product AS p SET search_vector = "
+        "setweight(to_tsvector(%s::regconfig, coalesce(p.name, '')), 'A') || "
+        "setweight(to_tsvector(%s::regconfig, coalesce(c.name, '')), 'B') || "
+        "setweight(to_tsvector(%s::regconfig, coalesce(p.description, '')), 'C') "
+        "FROM main_category AS c WHERE c.id = p.category_id",
+        [config] * 3,
+    )
+    schema_editor.execute(
+        "CREATE INDEX main_product_search_vector_gin ON main_product USING gin (search_vector)"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS main_product_search_vector_gin")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0003_alter_product_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:06
+
+from django.db import migrations, models
+
+
+def fill_rating_aggregates(apps, schema_editor):
+    Product = apps.get_model('main', 'Product')
+    Review = apps.get_model('reviews', 'Review')
+
+    aggregates = {}
+    rows = (
+        Review.objects.filter(is_active=True)
+        .values('product_id', 'rating').annotate(n=models.Count('id')).order_by()
+    )
+    for row in rows:
+        if row['rating'] not in range(1, 6):
+            continue
+        data = aggregates.setdefault(row['product_id'], {'rating_count': 0, 'rating_sum': 0})
+        data[f"rating_{row['rating']}"] = row['n']
+        data['rating_count'] += row['n']
+        data['rating_sum'] += row['rating'] * row['n']
+
+    for product_id, data in aggregates.items():
+        data['rating_avg'] = round(data['rating_sum'] / data['rating_count'], 2)
+        Product.objects.filter(pk=product_id).update(**data)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0005_product_keyset_indexes'),
+        ('reviews', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='rating_1',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_2',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_3',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_4',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_5',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_avg',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=3),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['rating_avg', 'id'], name='main_produc_rating__89f60c_idx'),
+        ),
+        migrations.RunPython(fill_rating_aggregates, migrations.RunPython.noop),
+    ]
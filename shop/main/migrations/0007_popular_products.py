@@ -0,0 +1,43 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0006_product_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductPopularity',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='popularity', serialize=False, to='main.product')),
+                ('score', models.FloatField(db_index=True, default=0)),
+                ('views_snapshot', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Популярність товару',
+                'verbose_name_plural': 'Популярність товарів',
+            },
+        ),
+        migrations.CreateModel(
+            name='PopularProduct',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField(default=0)),
+                ('computed_at', models.DateTimeField()),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='popular_products', to='main.category')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='main.product')),
+            ],
+            options={
+                'verbose_name': 'Популярний товар',
+                'verbose_name_plural': 'Популярні товари',
+                'ordering': ['category', 'position'],
+                'indexes': [models.Index(fields=['category', 'position'], name='main_popula_categor_5246a9_idx')],
+            },
+        ),
+    ]
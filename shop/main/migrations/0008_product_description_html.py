@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0007_popular_products'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='detailed_description_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='detailed_description_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0009_product_facet_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductPairEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('view', 'Перегляд'), ('cart', 'Кошик')], max_length=10)),
+                ('weight', models.PositiveIntegerField(default=1)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('product_a', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='main.product')),
+                ('product_b', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='main.product')),
+            ],
+            options={
+                'verbose_name': 'Спільна подія товарів',
+                'verbose_name_plural': 'Спільні події товарів',
+            },
+        ),
+        migrations.CreateModel(
+            name='RelatedProduct',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_links', to='main.product')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='main.product')),
+            ],
+            options={
+                'verbose_name': "Пов'язаний товар",
+                'verbose_name_plural': "Пов'язані товари",
+                'ordering': ['product', 'position'],
+                'indexes': [models.Index(fields=['product', 'position'], name='main_relate_product_620eb4_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:27
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fill_effective_prices(apps, schema_editor):
+    Product = apps.get_model('main', 'Product')
+    Discount = apps.get_model('discounts', 'Discount')
+
+    now = timezone.now()
+    Product.objects.update(effective_price=models.F('price'))
+    # Товари з чинними чи запланованими знижками перерахує перший запуск
+    # refresh_effective_prices: межа вже настала
+    discounted = Discount.objects.filter(is_active=True, end_date__gte=now).values('product_id')
+    Product.objects.filter(pk__in=discounted).update(price_expires_at=now)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0011_image_variants'),
+        ('discounts', '0003_discount_product_index'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='product',
+            name='main_produc_price_ad66ec_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='product',
+            name='main_produc_categor_109182_idx',
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='discount_percent',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=5),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='effective_price',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='price_expires_at',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['effective_price', 'id'], name='main_produc_effecti_045557_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', 'effective_price'], name='main_produc_categor_6e8648_idx'),
+        ),
+        migrations.RunPython(fill_effective_prices, migrations.RunPython.noop),
+    ]
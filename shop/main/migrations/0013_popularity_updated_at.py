@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 20:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0012_product_effective_price'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productpopularity',
+            name='updated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
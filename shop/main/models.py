@@ -1,14 +1,19 @@
 from django.db import models
 from django.urls import reverse
-from django.db.models import Avg, Count
+from django.utils.safestring import mark_safe
+from django.contrib.postgres.search import SearchVectorField
+from .autocomplete import INDEX_FIELDS, invalidate_index
+from .catalog_cache import COUNT_FIELDS, invalidate_catalog
+from .pricing import refresh_effective_prices
+from .rendering import compile_markdown, content_hash, render_markdown
 from markdownx.models import MarkdownxField
-from decimal import Decimal
 
 class Category(models.Model):
 	name = models.CharField(max_length=100, db_index=True)
 	slug = models.SlugField(max_length=100, unique=True)
 	description = models.TextField(blank=True)
 	image = models.ImageField(upload_to='categories/', blank=True)
+	image_variants = models.JSONField(default=dict, blank=True, editable=False)
 	is_active = models.BooleanField(default=True)
 
 	class Meta:
@@ -22,120 +27,207 @@ class Category(models.Model):
 	def get_absolute_url(self):
 		return reverse('main:product_list_by_category', kwargs={'category_slug': self.slug})
 
+class ProductQuerySet(models.QuerySet):
+	def update(self, **kwargs):
+		# Після оновлення фільтр може вже не збігатися з тими самими рядками
+		price_ids = list(self.values_list('pk', flat=True)) if 'price' in kwargs else None
+		updated = super().update(**kwargs)
+		if COUNT_FIELDS & kwargs.keys():
+			invalidate_catalog()
+		if INDEX_FIELDS & kwargs.keys():
+			invalidate_index()
+		if price_ids:
+			refresh_effective_prices(Product.objects.filter(pk__in=price_ids))
+		return updated
+
+	def bulk_create(self, objs, *args, **kwargs):
+		created = super().bulk_create(objs, *args, **kwargs)
+		invalidate_catalog()
+		invalidate_index()
+		return created
+
 class Product(models.Model):
 	category = models.ForeignKey(Category, related_name='products', on_delete=models.CASCADE)
 	name = models.CharField(max_length=100)
 	slug = models.SlugField(max_length=150, unique=True)
 	description = models.TextField()
 	detailed_description = MarkdownxField(blank=True, help_text="Детальний опис товару в форматі Markdown")
+	# Скомпільований HTML детального опису, оновлюється при збереженні
+	detailed_description_html = models.TextField(blank=True, editable=False)
+	detailed_description_hash = models.CharField(max_length=64, blank=True, editable=False)
 	image = models.ImageField(upload_to='products/%Y/%m/%d/', blank=True)
+	# Зменшені копії зображення і плейсхолдер (main.images)
+	image_variants = models.JSONField(default=dict, blank=True, editable=False)
 	price = models.DecimalField(max_digits=10, decimal_places=2)
+	# Ціна з найкращою чинною знижкою, підтримується main.pricing.refresh_effective_prices
+	effective_price = models.DecimalField(max_digits=10, decimal_places=2, default=0, editable=False)
+	discount_percent = models.DecimalField(max_digits=5, decimal_places=2, default=0, editable=False)
+	# Найближчий початок або кінець знижки, після якого effective_price треба перерахувати
+	price_expires_at = models.DateTimeField(null=True, blank=True, editable=False, db_index=True)
 	created_at = models.DateTimeField(auto_now_add=True)
 	updated_at = models.DateTimeField(auto_now=True)
 	is_available = models.BooleanField(default=True)
 	views = models.PositiveIntegerField(default=0)
 	featured = models.BooleanField(default=False)
+	# Агрегати активних відгуків, підтримуються reviews.ratings
+	rating_count = models.PositiveIntegerField(default=0, editable=False)
+	rating_sum = models.PositiveIntegerField(default=0, editable=False)
+	rating_avg = models.DecimalField(max_digits=3, decimal_places=2, default=0, editable=False)
+	rating_1 = models.PositiveIntegerField(default=0, editable=False)
+	rating_2 = models.PositiveIntegerField(default=0, editable=False)
+	rating_3 = models.PositiveIntegerField(default=0, editable=False)
+	rating_4 = models.PositiveIntegerField(default=0, editable=False)
+	rating_5 = models.PositiveIntegerField(default=0, editable=False)
+	# Підтримується main.search; GIN-індекс створюється міграцією лише на PostgreSQL
+	search_vector = SearchVectorField(null=True, editable=False)
+
+	objects = ProductQuerySet.as_manager()
 
 	class Meta:
 		verbose_name = "Товар"
 		verbose_name_plural = "Товари"
+		indexes = [
+			models.Index(fields=['created_at', 'id']),
+			models.Index(fields=['effective_price', 'id']),
+			models.Index(fields=['views', 'id']),
+			models.Index(fields=['name', 'id']),
+			models.Index(fields=['rating_avg', 'id']),
+			# Фасети в межах категорії (main.facets)
+			models.Index(fields=['category', 'effective_price']),
+			models.Index(fields=['category', 'rating_avg']),
+			models.Index(fields=['category', 'is_available', 'featured']),
+		]
 
 	def __str__(self):
 		return self.name
 	
 	def get_absolute_url(self):
 		return reverse('main:product_detail', args=[self.id, self.slug])
+
+	def save(self, *args, **kwargs):
+		update_fields = kwargs.get('update_fields')
+		if update_fields is None or 'detailed_description' in update_fields:
+			if self.render_detailed_description() and update_fields is not None:
+				kwargs['update_fields'] = {*update_fields, 'detailed_description_html', 'detailed_description_hash'}
+		super().save(*args, **kwargs)
+
+	def render_detailed_description(self):
+		digest = content_hash(self.detailed_description)
+		if digest == self.detailed_description_hash:
+			return False
+		self.detailed_description_html = compile_markdown(self.detailed_description) if self.detailed_description else ''
+		self.detailed_description_hash = digest
+		return True
+
+	def get_detailed_description_html(self):
+		if self.detailed_description_hash == content_hash(self.detailed_description):
+			return mark_safe(self.detailed_description_html)
+		# HTML ще не перерендерено під поточну версію — беремо з кешу
+		return render_markdown(self.detailed_description)
 	
 	def get_average_rating(self):
-		avg = self.reviews.filter(is_active=True).aggregate(avg=Avg('rating'))['avg']
-		return round(avg, 2) if avg is not None else 0.0
+		if not self.rating_count:
+			return 0.0
+		return round(self.rating_sum / self.rating_count, 2)
 	
 	def get_reviews_count(self):
-		return self.reviews.filter(is_active=True).count()
+		return self.rating_count
 	
 	def get_rating_distribution(self):
-		qs = self.reviews.filter(is_active=True).values('rating').annotate(count=Count('id'))
-		dist = {i: 0 for i in range(1, 6)}
-		total = 0
-		for item in qs:
-			r = int(item['rating'])
-			c = int(item['count'])
-			if 1 <= r <= 5:
-				dist[r] = c
-				total += c
-		
+		dist = {i: getattr(self, f'rating_{i}') for i in range(1, 6)}
+		total = sum(dist.values())
 		percent = {i: (round((dist[i] * 100.0 / total), 1) if total else 0.0) for i in dist}
 		return {'counts': dist, 'total': total, 'percent': percent}
 	
+	def get_pricing(self):
+		pricing = getattr(self, '_pricing', None)
+		if pricing is None:
+			from .pricing import attach_pricing
+			attach_pricing([self])
+			pricing = self._pricing
+		return pricing
+
+	def _get_quantity_pricing(self, quantity):
+		from .pricing import calculate_pricing
+		return calculate_pricing(self.price, self.discounts.filter(is_active=True), quantity)
+
 	def get_active_discount(self, quantity=1):
-		original_unit_price = getattr(self, 'price', Decimal('0.00')) or Decimal('0.00')
-		best = None
-		best_amount = Decimal('0.00')
-		related = getattr(self, 'discounts', None)
-		if related is None:
-			return None
-		for d in related.filter(is_active=True):
-			try:
-				if hasattr(d, 'is_valid') and callable(d.is_valid) and not d.is_valid():
-					continue
-			except Exception:
-				continue
-			try:
-				amt = Decimal(d.calculate_discount(original_unit_price, quantity) or 0)
-			except Exception:
-				try:
-					amt = Decimal(str(d.calculate_discount(original_unit_price, quantity)))
-				except Exception:
-					amt = Decimal('0.00')
-			if amt > best_amount:
-				best_amount = amt
-				best = d
-		return best
+		if quantity == 1:
+			return self.get_pricing().discount
+		return self._get_quantity_pricing(quantity).discount
 
 	def get_discounted_price(self, quantity=1):
-		unit = getattr(self, 'price', Decimal('0.00')) or Decimal('0.00')
 		try:
 			qty = max(1, int(quantity))
 		except Exception:
 			qty = 1
-		total = (unit * qty).quantize(Decimal('0.01'))
-		best = self.get_active_discount(qty)
-		if not best:
-			return total
-		try:
-			discount_amount = Decimal(best.calculate_discount(unit, qty) or 0)
-		except Exception:
-			try:
-				discount_amount = Decimal(str(best.calculate_discount(unit, qty)))
-			except Exception:
-				discount_amount = Decimal('0.00')
-		if discount_amount < 0:
-			discount_amount = Decimal('0.00')
-		if discount_amount > total:
-			discount_amount = total
-		result = (total - discount_amount).quantize(Decimal('0.01'))
-		if result < Decimal('0.00'):
-			return Decimal('0.00')
-		return result
+		if qty == 1:
+			return self.get_pricing().price
+		return self._get_quantity_pricing(qty).price
 
 	def has_active_discount(self):
 		return self.get_active_discount() is not None
 
 	def get_discount_percentage(self):
-		unit = getattr(self, 'price', Decimal('0.00')) or Decimal('0.00')
-		if unit == 0:
-			return Decimal('0.00')
-		best = self.get_active_discount(1)
-		if not best:
-			return Decimal('0.00')
-		try:
-			discount_amount = Decimal(best.calculate_discount(unit, 1) or 0)
-		except Exception:
-			try:
-				discount_amount = Decimal(str(best.calculate_discount(unit, 1)))
-			except Exception:
-				discount_amount = Decimal('0.00')
-		if discount_amount <= 0:
-			return Decimal('0.00')
-		percent = (discount_amount / unit * Decimal('100')).quantize(Decimal('0.01'))
-		return percent
\ No newline at end of file
+		return self.get_pricing().percentage
+
+
+class ProductPopularity(models.Model):
+	product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='popularity')
+	score = models.FloatField(default=0, db_index=True)
+	views_snapshot = models.PositiveIntegerField(default=0)
+	# Момент, до якого score уже загасав; спільний для всіх рядків
+	updated_at = models.DateTimeField(null=True, blank=True)
+
+	class Meta:
+		verbose_name = "Популярність товару"
+		verbose_name_plural = "Популярність товарів"
+
+
+class PopularProduct(models.Model):
+	category = models.ForeignKey(Category, on_delete=models.CASCADE, null=True, blank=True, related_name='popular_products')
+	product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+	position = models.PositiveSmallIntegerField()
+	score = models.FloatField(default=0)
+	computed_at = models.DateTimeField()
+
+	class Meta:
+		verbose_name = "Популярний товар"
+		verbose_name_plural = "Популярні товари"
+		ordering = ['category', 'position']
+		indexes = [
+			models.Index(fields=['category', 'position']),
+		]
+
+
+class ProductPairEvent(models.Model):
+	KIND_CHOICES = [
+		('view', 'Перегляд'),
+		('cart', 'Кошик'),
+	]
+
+	# Пара зберігається один раз: product_a_id < product_b_id
+	product_a = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+	product_b = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+	kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+	weight = models.PositiveIntegerField(default=1)
+	created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+	class Meta:
+		verbose_name = "Спільна подія товарів"
+		verbose_name_plural = "Спільні події товарів"
+
+
+class RelatedProduct(models.Model):
+	product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='related_links')
+	related = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+	position = models.PositiveSmallIntegerField()
+	score = models.FloatField(default=0)
+
+	class Meta:
+		verbose_name = "Пов'язаний товар"
+		verbose_name_plural = "Пов'язані товари"
+		ordering = ['product', 'position']
+		indexes = [
+			models.Index(fields=['product', 'position']),
+		]
@@ -0,0 +1,188 @@
+from decimal import ROUND_HALF_EVEN, ROUND_HALF_UP, Decimal, InvalidOperation
+from functools import lru_cache
+from operator import index
+
+CENTS = 100
+PERCENT_SCALE = 100 * 100  # відсоток з двома знаками після коми, у сотих частках
+
+
+def _div_half_up(numerator, denominator):
+    # Ділення цілих з округленням до найближчого, половина — від нуля
+    if denominator == 1:
+        return numerator
+    quotient, remainder = divmod(abs(numerator), denominator)
+    if remainder * 2 >= denominator:
+        quotient += 1
+    return quotient if numerator >= 0 else -quotient
+
+
+def _div_half_even(numerator, denominator):
+    # Те саме, але половина — до парного (типове округлення Decimal.quantize)
+    if denominator == 1:
+        return numerator
+    quotient, remainder = divmod(abs(numerator), denominator)
+    if remainder * 2 > denominator or (remainder * 2 == denominator and quotient % 2):
+        quotient += 1
+    return quotient if numerator >= 0 else -quotient
+
+
+_DIVIDE = {ROUND_HALF_UP: _div_half_up, ROUND_HALF_EVEN: _div_half_even}
+
+
+@lru_cache(maxsize=4096)
+def _scaled_decimal(value, scale):
+    # Точний дріб замість операцій Decimal: значення з БД мають знаменник 100.
+    # Ціни й відсотки знижок повторюються, тому результат кешується
+    numerator, denominator = value.as_integer_ratio()
+    return _div_half_up(numerator * scale, denominator)
+
+
+def _scaled(value, scale):
+    """Decimal/str/float/int, помножене на scale, як ціле з округленням ROUND_HALF_UP."""
+    if type(value) is Decimal and value.is_finite():
+        return _scaled_decimal(value, scale)
+    if isinstance(value, int):
+        return value * scale
+    if not isinstance(value, Decimal):
+        try:
+            value = Decimal(str(value).strip())
+        except InvalidOperation:
+            raise ValueError(f"Некоректне число: {value!r}")
+    if not value.is_finite():
+        raise ValueError(f"Некоректне число: {value!r}")
+    numerator, denominator = value.as_integer_ratio()
+    return _div_half_up(numerator * scale, denominator)
+
+
+class Money:
+    """
+    Незмінна сума в копійках. Правила округлення явні: перетворення
+    з Decimal/рядка, відсоток від суми і ціна після відсоткової знижки
+    округлюються до копійки за ROUND_HALF_UP (percent_off приймає й
+    ROUND_HALF_EVEN, яким завжди округлював каталог), решта операцій —
+    точна цілочисельна арифметика. Для шаблонів і форматування є
+    str(), float() і format().
+    """
+
+    __slots__ = ('cents',)
+
+    def __init__(self, cents=0):
+        _set_cents(self, index(cents))
+
+    @classmethod
+    def of(cls, value):
+        if type(value) is Decimal and value.is_finite():
+            return _money(_scaled_decimal(value, CENTS))
+        if isinstance(value, Money):
+            return value
+        if value is None or (isinstance(value, str) and not value.strip()):
+            return ZERO
+        return _money(_scaled(value, CENTS))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Money is immutable')
+
+    def __reduce__(self):
+        return (Money, (self.cents,))
+
+    def percent(self, value):
+        """Частина суми: value відсотків з округленням до копійки."""
+        return _money(_div_half_up(self.cents * _scaled(value, 100), PERCENT_SCALE))
+
+    def percent_off(self, value, rounding=ROUND_HALF_UP):
+        """Сума після знижки value відсотків; округлюється ціна, а не знижка."""
+        return _money(_DIVIDE[rounding](self.cents * (PERCENT_SCALE - _scaled(value, 100)), PERCENT_SCALE))
+
+    def percent_of(self, total):
+        """Яку частку від total становить сума, у відсотках до 0.01."""
+        if not total.cents:
+            return Decimal('0.00')
+        return Decimal(_div_half_up(self.cents * PERCENT_SCALE, total.cents)).scaleb(-2)
+
+    def to_decimal(self):
+        return Decimal(self.cents).scaleb(-2)
+
+    def __add__(self, other):
+        if isinstance(other, Money):
+            return _money(self.cents + other.cents)
+        return NotImplemented
+
+    def __radd__(self, other):
+        # sum() починає з 0
+        if other == 0:
+            return self
+        return NotImplemented
+
+    def __sub__(self, other):
+        if isinstance(other, Money):
+            return _money(self.cents - other.cents)
+        return NotImplemented
+
+    def __mul__(self, quantity):
+        if isinstance(quantity, int) and not isinstance(quantity, bool):
+            return _money(self.cents * quantity)
+        return NotImplemented
+
+    __rmul__ = __mul__
+
+    def __neg__(self):
+        return _money(-self.cents)
+
+    def __eq__(self, other):
+        if isinstance(other, Money):
+            return self.cents == other.cents
+        return NotImplemented
+
+    def __lt__(self, other):
+        if isinstance(other, Money):
+            return self.cents < other.cents
+        return NotImplemented
+
+    def __le__(self, other):
+        if isinstance(other, Money):
+            return self.cents <= other.cents
+        return NotImplemented
+
+    def __gt__(self, other):
+        if isinstance(other, Money):
+            return self.cents > other.cents
+        return NotImplemented
+
+    def __ge__(self, other):
+        if isinstance(other, Money):
+            return self.cents >= other.cents
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.cents)
+
+    def __bool__(self):
+        return self.cents != 0
+
+    def __float__(self):
+        return self.cents / CENTS
+
+    def __str__(self):
+        sign = '-' if self.cents < 0 else ''
+        units, cents = divmod(abs(self.cents), CENTS)
+        return f'{sign}{units}.{cents:02d}'
+
+    def __repr__(self):
+        return f'Money({self})'
+
+    def __format__(self, spec):
+        return format(self.to_decimal(), spec) if spec else str(self)
+
+
+# Слот пишеться напряму: __setattr__ заборонений, а object.__setattr__ повільніший
+_set_cents = Money.cents.__set__
+
+
+def _money(cents):
+    # Внутрішній конструктор без перевірки типу: cents — завжди int
+    money = object.__new__(Money)
+    _set_cents(money, cents)
+    return money
+
+
+ZERO = Money(0)
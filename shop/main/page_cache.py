@@ -0,0 +1,202 @@
+import hashlib
+import re
+import time
+from functools import wraps
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.safestring import mark_safe
+from .catalog_cache import CATALOG_VERSION_KEY, get_catalog_version
+
+DEFAULTS = {
+    'ENABLED': True,
+    'TIMEOUT': 60 * 5,
+}
+
+PAGE_KEY_PREFIX = 'page_cache:page'
+TAG_KEY_PREFIX = 'page_cache:tag'
+# Тег сторінок зі списками товарів: ціни, знижки й рейтинги змінюють
+# їхній вміст і порядок, хоча версія каталогу лишається тією самою
+LIST_TAG = 'product_list'
+
+# Параметри, від яких залежить сторінка каталогу; з будь-якими іншими
+# сторінка не кешується, щоб сміттєві запити не засмічували кеш
+CACHE_PARAMS = ('q', 'sort', 'page', 'cursor', 'price', 'rating', 'available', 'discount', 'featured')
+
+# Персональні дані сесії, з якими сторінку не можна брати із загального кешу
+PERSONAL_SESSION_KEYS = ('product_promo_codes', 'applied_promo_code')
+
+HOLE_PATTERN = re.compile(r'<!--page-hole:(\w+)-->')
+CSRF_INPUT_PATTERN = re.compile(r'(name="csrfmiddlewaretoken" value=")[^"]*(")')
+CSRF_MARKER = '__page_cache_csrf__'
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'PAGE_CACHE', {})}
+
+
+# Персональні фрагменти сторінки ("дірки"), які заповнюються для кожного запиту
+def _cart_badge(request):
+    from cart.cart import Cart
+
+    return render_to_string('main/components/cart_badge.html', {'cart': Cart(request)})
+
+
+def _greeting(request):
+    from .templatetags.shop_tags import user_greeting
+
+    return user_greeting(request.user)
+
+
+HOLES = {
+    'cart_badge': _cart_badge,
+    'greeting': _greeting,
+}
+
+
+def render_hole(request, name):
+    if getattr(request, '_page_cache_render', False):
+        return mark_safe(f'<!--page-hole:{name}-->')
+    return mark_safe(HOLES[name](request))
+
+
+def _tag_key(tag):
+    # Тег 'catalog' — це версія каталогу, яку вже змінюють сигнали товарів і категорій
+    return CATALOG_VERSION_KEY if tag == 'catalog' else f'{TAG_KEY_PREFIX}:{tag}'
+
+
+def get_tag_versions(tags):
+    keys = {tag: _tag_key(tag) for tag in tags}
+    stored = cache.get_many(list(keys.values()))
+    versions = {}
+    for tag, key in keys.items():
+        version = stored.get(key)
+        if version is None:
+            if tag == 'catalog':
+                version = get_catalog_version()
+            else:
+                cache.add(key, time.time_ns(), None)
+                version = cache.get(key)
+        versions[tag] = version
+    return versions
+
+
+def invalidate_tags(*tags):
+    for tag in tags:
+        key = _tag_key(tag)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns(), None)
+
+
+def invalidate_product_pages(*product_ids):
+    """
+    Сторінки товарів і списки товарів після зміни ціни, знижки чи рейтингу.
+    Версія каталогу не змінюється: картки, фасети, лічильники категорій
+    і автодоповнення від цих полів або не залежать, або мають свої ключі.
+    """
+    invalidate_tags(*(f'product:{pk}' for pk in product_ids if pk), LIST_TAG)
+
+
+def is_cacheable_request(request):
+    if not get_config()['ENABLED'] or request.method not in ('GET', 'HEAD'):
+        return False
+    if request.user.is_authenticated:
+        return False
+    if any(param not in CACHE_PARAMS for param in request.GET):
+        return False
+    return not any(request.session.get(key) for key in PERSONAL_SESSION_KEYS)
+
+
+def page_cache_key(request):
+    params = sorted((name, request.GET.get(name)) for name in request.GET)
+    raw = repr((request.path, params))
+    return f'{PAGE_KEY_PREFIX}:{hashlib.sha256(raw.encode()).hexdigest()}'
+
+
+def fill_holes(request, html):
+    html = HOLE_PATTERN.sub(lambda match: HOLES[match.group(1)](request), html)
+    if CSRF_MARKER in html:
+        html = html.replace(CSRF_MARKER, get_token(request))
+    return html
+
+
+def add_page_cache_tags(request, *tags):
+    if hasattr(request, '_page_cache_tags'):
+        request._page_cache_tags.update(tags)
+
+
+def limit_page_cache_expiry(request, *moments):
+    """Сторінка в кеші не переживе найближчу з moments (межі знижок на ній)."""
+    if not hasattr(request, '_page_cache_expires'):
+        return
+    moments = [moment for moment in moments if moment is not None]
+    if request._page_cache_expires is not None:
+        moments.append(request._page_cache_expires)
+    if moments:
+        request._page_cache_expires = min(moments)
+
+
+def page_cache_timeout(request, now=None):
+    timeout = get_config()['TIMEOUT']
+    expires = getattr(request, '_page_cache_expires', None)
+    if expires is None:
+        return timeout
+    seconds = int((expires - (now or timezone.now())).total_seconds())
+    return min(timeout, seconds)
+
+
+def anonymous_page_cache(tags, on_hit=None):
+    """
+    Кешує сторінку для анонімних відвідувачів. У кеш потрапляє спільна
+    оболонка з мітками замість персональних фрагментів (кошик, привітання,
+    CSRF-токен), які підставляються для кожного запиту. Запис вважається
+    застарілим, щойно змінюється версія будь-якого з його тегів.
+
+    tags(request, *args, **kwargs) повертає теги, відомі до рендеру;
+    view може додати інші через add_page_cache_tags і обмежити час життя
+    запису через limit_page_cache_expiry. on_hit виконується
+    замість view при влучанні в кеш (наприклад, лічильник переглядів).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not is_cacheable_request(request):
+                return view(request, *args, **kwargs)
+
+            key = page_cache_key(request)
+            entry = cache.get(key)
+            if entry is not None and get_tag_versions(entry['tags']) == entry['tags']:
+                if on_hit is not None:
+                    on_hit(request, *args, **kwargs)
+                return HttpResponse(fill_holes(request, entry['html']), content_type=entry['content_type'])
+
+            versions = get_tag_versions(tags(request, *args, **kwargs))
+            request._page_cache_tags = set()
+            request._page_cache_expires = None
+            request._page_cache_render = True
+            try:
+                response = view(request, *args, **kwargs)
+            finally:
+                request._page_cache_render = False
+
+            if response.status_code != 200 or response.streaming:
+                return response
+
+            html = CSRF_INPUT_PATTERN.sub(rf'\g<1>{CSRF_MARKER}\g<2>', response.content.decode(response.charset))
+            timeout = page_cache_timeout(request)
+            if timeout > 0:
+                versions.update(get_tag_versions(request._page_cache_tags - versions.keys()))
+                cache.set(key, {
+                    'html': html,
+                    'content_type': response['Content-Type'],
+                    'tags': versions,
+                }, timeout)
+            response.content = fill_holes(request, html)
+            return response
+        return wrapper
+    return decorator
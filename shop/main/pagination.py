@@ -0,0 +1,120 @@
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from django.core import signing
+from django.db import connections
+from django.db.models import Q
+
+CURSOR_SALT = 'main.pagination.cursor'
+
+
+class KeysetPage:
+    def __init__(self, object_list, paginator, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Пагінація за курсором: замість OFFSET сторінка вибирається умовою
+    (поле, id) > (значення, id) останнього рядка, тому глибокі сторінки
+    такі ж швидкі, як перша. id використовується для стабільного порядку.
+    """
+
+    def __init__(self, queryset, order_field, per_page):
+        self.queryset = queryset
+        self.order_field = order_field
+        self.per_page = per_page
+        self.descending = order_field.startswith('-')
+        self.field_name = order_field.lstrip('-')
+        self.field = queryset.model._meta.get_field(self.field_name)
+
+    def page(self, cursor=None):
+        position = self.decode_cursor(cursor)
+        backwards = position is not None and position['direction'] == 'prev'
+
+        descending = self.descending != backwards
+        prefix = '-' if descending else ''
+        queryset = self.queryset.order_by(f'{prefix}{self.field_name}', f'{prefix}id')
+        if position is not None:
+            queryset = queryset.filter(self._seek_filter(position['value'], position['id'], descending))
+
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+
+        if backwards:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, position is not None
+
+        next_cursor = self.encode_cursor(rows[-1], 'next') if rows and has_next else None
+        previous_cursor = self.encode_cursor(rows[0], 'prev') if rows and has_previous else None
+        return KeysetPage(rows, self, next_cursor, previous_cursor)
+
+    def _seek_filter(self, value, pk, descending):
+        op = 'lt' if descending else 'gt'
+        return Q(**{f'{self.field_name}__{op}': value}) | Q(**{self.field_name: value, f'id__{op}': pk})
+
+    def encode_cursor(self, obj, direction):
+        value = getattr(obj, self.field_name)
+        if isinstance(value, (datetime, date)):
+            value = value.isoformat()
+        elif isinstance(value, Decimal):
+            value = str(value)
+        return signing.dumps([self.order_field, direction, value, obj.pk], salt=CURSOR_SALT, compress=True)
+
+    def decode_cursor(self, cursor):
+        if not cursor:
+            return None
+        try:
+            order_field, direction, value, pk = signing.loads(cursor, salt=CURSOR_SALT)
+            if order_field != self.order_field or direction not in ('next', 'prev'):
+                return None
+            return {'direction': direction, 'value': self.field.to_python(value), 'id': int(pk)}
+        except Exception:
+            return None
+
+    def estimated_count(self):
+        return estimate_count(self.queryset)
+
+
+def estimate_count(queryset):
+    """
+    Оцінка кількості рядків за планом запиту PostgreSQL (без COUNT(*)).
+    Для інших СУБД повертає None — лічильник просто не показується.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    try:
+        sql, params = queryset.order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+    except Exception:
+        return None
@@ -0,0 +1,148 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Max
+from django.utils import timezone
+from .models import Category, PopularProduct, Product, ProductPopularity
+
+DEFAULTS = {
+    'SIZE': 12,
+    'HALF_LIFE_HOURS': None,
+}
+
+UPSERT_BATCH_SIZE = 1000
+# Перший розрахунок рейтингу, якщо таблиця порожня, виконує лише один процес
+COMPUTE_LOCK_KEY = 'popular_products:compute'
+COMPUTE_LOCK_TIMEOUT = 300
+
+# Процес уже переконався, що рейтинг розраховано
+_computed = False
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'POPULAR_PRODUCTS', {})}
+
+
+def _update_decayed_scores(half_life_hours, now):
+    """
+    Оцінка із загасанням: старий бал множиться на 0.5^(години/період
+    напіврозпаду), і до нього додаються перегляди з попереднього
+    перерахунку. Переписуються лише товари, у яких змінились перегляди.
+    Час загасання рахується від updated_at балів, а не від останнього
+    рейтингу: той міг бути розрахований без загасання.
+    """
+    last_run = ProductPopularity.objects.aggregate(last=Max('updated_at'))['last']
+    if last_run is None:
+        # Бали без позначки часу лишились від версії без updated_at
+        last_run = PopularProduct.objects.aggregate(last=Max('computed_at'))['last']
+    elapsed_hours = max((now - last_run).total_seconds(), 0) / 3600 if last_run else 0
+    decay = 0.5 ** (elapsed_hours / half_life_hours)
+
+    with transaction.atomic():
+        ProductPopularity.objects.update(score=F('score') * decay, updated_at=now)
+
+        changed = (
+            Product.objects.exclude(popularity__views_snapshot=F('views'))
+            .values_list('id', 'views', 'popularity__score', 'popularity__views_snapshot')
+            .iterator(chunk_size=UPSERT_BATCH_SIZE)
+        )
+        batch = []
+        for product_id, views, score, snapshot in changed:
+            batch.append(ProductPopularity(
+                product_id=product_id,
+                views_snapshot=views,
+                score=(score or 0) + max(views - (snapshot or 0), 0),
+                updated_at=now,
+            ))
+            if len(batch) >= UPSERT_BATCH_SIZE:
+                _upsert_popularity(batch)
+                batch = []
+        _upsert_popularity(batch)
+
+
+def _upsert_popularity(rows):
+    if rows:
+        ProductPopularity.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['product'],
+            update_fields=['score', 'views_snapshot', 'updated_at'],
+        )
+
+
+def _ranked(size, category_id=None, decayed=False):
+    if decayed:
+        qs = ProductPopularity.objects.filter(product__is_available=True)
+        if category_id is not None:
+            qs = qs.filter(product__category_id=category_id)
+        return list(qs.order_by('-score', '-product_id').values_list('product_id', 'score')[:size])
+
+    qs = Product.objects.filter(is_available=True)
+    if category_id is not None:
+        qs = qs.filter(category_id=category_id)
+    return list(qs.order_by('-views', '-id').values_list('id', 'views')[:size])
+
+
+def refresh_popular_products(size=None, half_life_hours=None):
+    config = get_config()
+    size = size or config['SIZE']
+    half_life_hours = half_life_hours if half_life_hours is not None else config['HALF_LIFE_HOURS']
+    decayed = bool(half_life_hours)
+    now = timezone.now()
+
+    if decayed:
+        _update_decayed_scores(half_life_hours, now)
+
+    rows = []
+    for category_id in [None] + list(Category.objects.values_list('id', flat=True)):
+        for position, (product_id, score) in enumerate(_ranked(size, category_id, decayed), start=1):
+            rows.append(PopularProduct(
+                category_id=category_id,
+                product_id=product_id,
+                position=position,
+                score=score,
+                computed_at=now,
+            ))
+
+    with transaction.atomic():
+        PopularProduct.objects.all().delete()
+        PopularProduct.objects.bulk_create(rows, batch_size=UPSERT_BATCH_SIZE)
+    return len(rows)
+
+
+def _ensure_computed():
+    """
+    Якщо рейтинг ще жодного разу не рахували, розраховує його один раз
+    замість сортування всього каталогу на кожному рендері. Повертає True,
+    якщо таблицю заповнено саме зараз.
+    """
+    global _computed
+    if _computed:
+        return False
+    if PopularProduct.objects.exists():
+        _computed = True
+        return False
+    if not cache.add(COMPUTE_LOCK_KEY, 1, COMPUTE_LOCK_TIMEOUT):
+        # Рейтинг уже рахує інший процес — поки що порожній список
+        return False
+    try:
+        refresh_popular_products()
+    finally:
+        cache.delete(COMPUTE_LOCK_KEY)
+    _computed = True
+    return True
+
+
+def get_popular_products(count, category=None):
+    """
+    Товари з останнього розрахованого рейтингу. Недоступні товари
+    пропускаються, тож до наступного перерахунку список може бути коротшим.
+    """
+    rows = (
+        PopularProduct.objects.filter(category=category, product__is_available=True)
+        .select_related('product__category').order_by('position')[:count]
+    )
+    products = [row.product for row in rows]
+    if not products and _ensure_computed():
+        products = [row.product for row in rows.all()]
+    return products
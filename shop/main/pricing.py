@@ -0,0 +1,123 @@
+from collections import namedtuple
+from decimal import Decimal
+from django.utils import timezone
+from .money import ZERO, Money
+
+ProductPricing = namedtuple('ProductPricing', ['discount', 'discount_amount', 'price', 'percentage'])
+NO_PERCENTAGE = Decimal('0.00')
+TWO_PLACES = Decimal('0.01')
+
+
+def best_discount(total, discounts, quantity=1, now=None):
+    """Знижка з найбільшою сумою (Money) для total за quantity одиниць."""
+    now = now or timezone.now()
+    best = None
+    best_amount = ZERO
+    for d in discounts:
+        try:
+            amount = d.get_discount_money(total, quantity, now)
+        except Exception:
+            continue
+        if amount > best_amount:
+            best_amount = amount
+            best = d
+    return best, best_amount
+
+
+def calculate_pricing(unit_price, discounts, quantity=1, now=None):
+    """
+    Ціна за quantity одиниць з найкращою знижкою. Суми — Money
+    (копійки), відсоток — Decimal з двома знаками: для відсоткової
+    знижки це її значення, для фіксованої — частка від суми.
+    """
+    total = Money.of(unit_price)
+    if quantity != 1:
+        total = total * quantity
+    discount, amount = best_discount(total, discounts, quantity, now)
+    if discount is None:
+        return ProductPricing(None, ZERO, total, NO_PERCENTAGE)
+
+    amount = min(amount, total)
+    if discount.discount_type == 'percentage' and amount < total:
+        percentage = discount.value.quantize(TWO_PLACES)
+    else:
+        percentage = amount.percent_of(total)
+    return ProductPricing(discount, amount, total - amount, percentage)
+
+
+def attach_pricing(products, now=None):
+    """
+    Розраховує ціни зі знижками для цілої сторінки товарів одним запитом
+    і кешує результат на кожному товарі (див. Product.get_pricing).
+    Разом з цінами запам'ятовує, коли вони зміняться: найближчий кінець
+    чинної знижки або початок запланованої (product._pricing_expires).
+    """
+    from discounts.models import Discount
+
+    products = list(products)
+    if not products:
+        return products
+
+    now = now or timezone.now()
+    discounts_by_product = {}
+    expires_by_product = {}
+    active_discounts = Discount.objects.filter(
+        product_id__in={p.pk for p in products},
+        is_active=True,
+        end_date__gte=now,
+    )
+    for discount in active_discounts:
+        if discount.start_date <= now:
+            discounts_by_product.setdefault(discount.product_id, []).append(discount)
+            change = discount.end_date
+        else:
+            change = discount.start_date
+        current = expires_by_product.get(discount.product_id)
+        if current is None or change < current:
+            expires_by_product[discount.product_id] = change
+
+    for product in products:
+        product._pricing = calculate_pricing(product.price, discounts_by_product.get(product.pk, ()), now=now)
+        product._pricing_expires = expires_by_product.get(product.pk)
+    return products
+
+
+PRICE_FIELDS = ['effective_price', 'discount_percent', 'price_expires_at']
+REFRESH_BATCH_SIZE = 1000
+
+
+def refresh_effective_prices(products=None, now=None, batch_size=REFRESH_BATCH_SIZE):
+    """
+    Перераховує збережені effective_price, discount_percent і
+    price_expires_at (наступна межа знижки) для вибраних товарів
+    пакетами: один запит знижок на пакет через attach_pricing і
+    bulk_update лише змінених рядків. Повертає id змінених товарів.
+    """
+    from .models import Product
+    from .page_cache import invalidate_product_pages
+
+    if products is None:
+        products = Product.objects.all()
+    products = products.only('id', 'price', *PRICE_FIELDS).order_by('pk')
+
+    changed = []
+    last_pk = 0
+    while True:
+        batch = list(products.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            break
+        last_pk = batch[-1].pk
+        updates = []
+        for product in attach_pricing(batch, now=now):
+            pricing = product._pricing
+            values = (pricing.price.to_decimal(), pricing.percentage, product._pricing_expires)
+            if values != tuple(getattr(product, field) for field in PRICE_FIELDS):
+                product.effective_price, product.discount_percent, product.price_expires_at = values
+                updates.append(product)
+        if updates:
+            Product.objects.bulk_update(updates, PRICE_FIELDS)
+            changed.extend(product.pk for product in updates)
+
+    if changed:
+        invalidate_product_pages(*changed)
+    return changed
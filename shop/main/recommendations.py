@@ -0,0 +1,196 @@
+import atexit
+import heapq
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Sum, When
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'RECENT_VIEWS': 10,
+    'TOP_K': 8,
+    'CART_WEIGHT': 3,
+    'WINDOW_DAYS': 90,
+    'THRESHOLD': 200,
+    'INTERVAL': 30,
+}
+
+RECENT_VIEWS_SESSION_KEY = 'recently_viewed'
+WRITE_BATCH_SIZE = 1000
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'RECOMMENDATIONS', {})}
+
+
+def _pair(first_id, second_id):
+    return (first_id, second_id) if first_id < second_id else (second_id, first_id)
+
+
+class PairEventBuffer:
+    """
+    Буфер пар товарів у пам'яті процесу: однакові пари зводяться в одну
+    подію з вагою, а в БД пишуться одним bulk_create за THRESHOLD подій
+    або раз на INTERVAL секунд.
+    """
+
+    def __init__(self, threshold=200, interval=30):
+        self.threshold = threshold
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._pending = Counter()
+        self._last_flush = time.monotonic()
+
+    def record(self, kind, product_id, other_ids):
+        with self._lock:
+            for other_id in other_ids:
+                if other_id != product_id:
+                    self._pending[(kind, *_pair(product_id, other_id))] += 1
+            due = (
+                len(self._pending) >= self.threshold
+                or time.monotonic() - self._last_flush >= self.interval
+            )
+        if due:
+            self.flush()
+
+    def flush(self):
+        from .models import Product, ProductPairEvent
+
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+            self._last_flush = time.monotonic()
+        if not pending:
+            return 0
+        try:
+            # id із сесій і кошиків можуть належати вже видаленим товарам:
+            # такі пари відкидаємо, щоб зовнішній ключ не зірвав увесь пакет
+            ids = {product_id for _, a, b in pending for product_id in (a, b)}
+            existing = set(Product.objects.filter(pk__in=ids).values_list('pk', flat=True))
+            events = [
+                ProductPairEvent(kind=kind, product_a_id=a, product_b_id=b, weight=weight)
+                for (kind, a, b), weight in pending.items()
+                if a in existing and b in existing
+            ]
+            ProductPairEvent.objects.bulk_create(events, batch_size=WRITE_BATCH_SIZE)
+        except Exception:
+            # Рекомендації наближені, тому пакет не повторюємо
+            logger.exception("Не вдалося записати спільні події товарів")
+            return 0
+        return len(events)
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_pair_buffer():
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                config = get_config()
+                _buffer = PairEventBuffer(threshold=config['THRESHOLD'], interval=config['INTERVAL'])
+                atexit.register(_buffer.flush)
+    return _buffer
+
+
+def record_co_view(request, product_id):
+    """
+    Пов'язує товар з останніми переглянутими в цій сесії і додає його
+    на початок списку недавніх переглядів. Повторний перегляд того самого
+    товару (оновлення сторінки) пар не додає.
+    """
+    recent = request.session.get(RECENT_VIEWS_SESSION_KEY, [])
+    if recent[:1] == [product_id]:
+        return
+    recent = [pid for pid in recent if pid != product_id]
+    if recent:
+        get_pair_buffer().record('view', product_id, recent)
+    request.session[RECENT_VIEWS_SESSION_KEY] = [product_id, *recent][:get_config()['RECENT_VIEWS']]
+
+
+def record_co_cart(product_id, other_ids):
+    other_ids = [int(pid) for pid in other_ids if str(pid).isdigit()]
+    if other_ids:
+        get_pair_buffer().record('cart', product_id, other_ids)
+
+
+def compute_related_products(top_k=None, window_days=None, cart_weight=None):
+    """
+    Перераховує таблицю RelatedProduct: для кожного товару зберігає top_k
+    сусідів з найбільшою сумарною вагою спільних переглядів і кошиків
+    за останні window_days днів.
+    """
+    from .models import ProductPairEvent, RelatedProduct
+
+    config = get_config()
+    top_k = top_k or config['TOP_K']
+    window_days = window_days or config['WINDOW_DAYS']
+    cart_weight = cart_weight if cart_weight is not None else config['CART_WEIGHT']
+
+    scores = (
+        ProductPairEvent.objects
+        .filter(created_at__gte=timezone.now() - timedelta(days=window_days))
+        .values('product_a_id', 'product_b_id')
+        .annotate(score=Sum(Case(
+            When(kind='cart', then=F('weight') * cart_weight),
+            default=F('weight'),
+            output_field=IntegerField(),
+        )))
+        .order_by()
+    )
+
+    neighbors = defaultdict(list)
+    for row in scores.iterator(chunk_size=WRITE_BATCH_SIZE):
+        a, b, score = row['product_a_id'], row['product_b_id'], row['score']
+        for product_id, related_id in ((a, b), (b, a)):
+            heap = neighbors[product_id]
+            item = (score, -related_id)
+            if len(heap) < top_k:
+                heapq.heappush(heap, item)
+            elif item > heap[0]:
+                heapq.heapreplace(heap, item)
+
+    rows = [
+        RelatedProduct(product_id=product_id, related_id=-neg_id, position=position, score=score)
+        for product_id, heap in neighbors.items()
+        for position, (score, neg_id) in enumerate(sorted(heap, reverse=True), start=1)
+    ]
+    with transaction.atomic():
+        RelatedProduct.objects.all().delete()
+        RelatedProduct.objects.bulk_create(rows, batch_size=WRITE_BATCH_SIZE)
+    return len(rows)
+
+
+def prune_pair_events(window_days=None):
+    from .models import ProductPairEvent
+
+    window_days = window_days or get_config()['WINDOW_DAYS']
+    deleted, _ = ProductPairEvent.objects.filter(
+        created_at__lt=timezone.now() - timedelta(days=window_days)
+    ).delete()
+    return deleted
+
+
+def get_related_products(product, count=4):
+    from .models import Product
+
+    links = (
+        product.related_links.filter(related__is_available=True)
+        .select_related('related__category').order_by('position')[:count]
+    )
+    related = [link.related for link in links]
+    if len(related) < count:
+        # Сусідів ще немає або замало — доповнюємо товарами з тієї ж категорії
+        related += list(
+            Product.objects.filter(category_id=product.category_id, is_available=True)
+            .exclude(id__in=[product.id, *(p.id for p in related)])
+            .select_related('category').order_by('-created_at')[:count - len(related)]
+        )
+    return related
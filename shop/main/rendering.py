@@ -0,0 +1,100 @@
+import hashlib
+import threading
+import markdown
+from django.core.cache import cache
+from django.utils.safestring import mark_safe
+from markdown.extensions import Extension
+from markdown.treeprocessors import Treeprocessor
+
+# Класи Tailwind для елементів, згенерованих з Markdown
+TAG_CLASSES = {
+    'h1': 'text-3xl font-extrabold bg-gradient-to-r from-teal-600 to-emerald-600 bg-clip-text text-transparent mb-4 mt-6 pb-2 border-b-2 border-teal-200',
+    'h2': 'text-2xl font-bold text-gray-900 mb-4 mt-6 pb-2 border-b-2 border-gray-200',
+    'h3': 'text-xl font-bold text-gray-800 mb-3 mt-5',
+    'h4': 'text-lg font-semibold text-gray-800 mb-2 mt-4',
+    'h5': 'text-base font-semibold text-gray-700 mb-2 mt-3',
+    'h6': 'text-sm font-semibold text-gray-700 mb-2 mt-2',
+    'p': 'text-gray-700 text-base mb-4 leading-relaxed',
+    'ul': 'list-disc list-outside mb-4 space-y-2 pl-6',
+    'ol': 'list-decimal list-outside mb-4 space-y-2 pl-6',
+    'li': 'text-gray-700 text-base leading-relaxed ml-2',
+    'a': 'text-teal-600 hover:text-teal-700 font-medium underline decoration-2 decoration-teal-300 hover:decoration-teal-500 transition-all duration-200',
+    'blockquote': 'border-l-4 border-teal-500 bg-gradient-to-r from-teal-50 to-emerald-50 pl-4 pr-3 py-3 italic text-gray-700 my-4 rounded-r-lg shadow-sm text-base',
+    'code': 'bg-gray-100 text-pink-600 px-2 py-0.5 rounded-md text-sm font-mono border border-gray-200',
+    'pre': 'bg-gray-900 text-gray-100 p-4 rounded-xl overflow-x-auto mb-4 shadow-lg border border-gray-700 text-sm',
+    'table': 'w-full border-collapse bg-white shadow-md rounded-lg overflow-hidden mb-4 text-sm',
+    'thead': 'bg-gradient-to-r from-teal-600 to-emerald-600',
+    'th': 'px-4 py-3 text-left text-xs font-bold text-white uppercase tracking-wider',
+    'tbody': 'divide-y divide-gray-200',
+    'tr': 'hover:bg-gray-50 transition-colors duration-150',
+    'td': 'px-4 py-3 text-sm text-gray-700',
+    'img': 'rounded-2xl shadow-xl my-4 max-w-full h-auto border-4 border-gray-100',
+    'hr': 'my-6 border-t-2 border-gray-200',
+    'strong': 'font-bold text-gray-900',
+    'em': 'italic text-gray-700',
+}
+
+EXTENSIONS = [
+    'markdown.extensions.extra',
+    'markdown.extensions.codehilite',
+    'markdown.extensions.tables',
+    'markdown.extensions.fenced_code',
+]
+
+# Змінюється разом з TAG_CLASSES або EXTENSIONS, тому збережений HTML
+# стає неактуальним і перерендерюється (команда rerender_markdown)
+RENDERER_VERSION = hashlib.sha256(repr((TAG_CLASSES, EXTENSIONS)).encode()).hexdigest()[:12]
+
+CACHE_TIMEOUT = 60 * 60 * 24
+
+
+class TailwindTreeprocessor(Treeprocessor):
+    def run(self, root):
+        for element in root.iter():
+            if element.tag in TAG_CLASSES:
+                existing_class = element.get('class', '')
+                new_class = TAG_CLASSES[element.tag]
+                element.set('class', f'{existing_class} {new_class}'.strip())
+
+        return root
+
+
+class TailwindExtension(Extension):
+    def extendMarkdown(self, md):
+        md.treeprocessors.register(TailwindTreeprocessor(md), 'tailwind', 15)
+
+
+_local = threading.local()
+
+
+def _get_parser():
+    # Markdown не потокобезпечний, тому свій екземпляр на кожен потік
+    parser = getattr(_local, 'parser', None)
+    if parser is None:
+        parser = _local.parser = markdown.Markdown(extensions=[*EXTENSIONS, TailwindExtension()])
+    return parser
+
+
+def content_hash(text):
+    return hashlib.sha256(f'{RENDERER_VERSION}:{text or ""}'.encode()).hexdigest()
+
+
+def compile_markdown(text):
+    parser = _get_parser()
+    try:
+        return parser.convert(str(text or ''))
+    finally:
+        parser.reset()
+
+
+def render_markdown(text):
+    """
+    HTML для Markdown-тексту з кешуванням за хешем вмісту та версії
+    рендерера. Повертає безпечний рядок для шаблону.
+    """
+    key = f'markdown:{content_hash(text)}'
+    html = cache.get(key)
+    if html is None:
+        html = compile_markdown(text)
+        cache.set(key, html, CACHE_TIMEOUT)
+    return mark_safe(html)
@@ -0,0 +1,103 @@
+import re
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connections
+from django.db.models import Case, F, FloatField, OuterRef, Q, Subquery, Value, When
+
+# Ваги полів для запасного пошуку — як у ts_rank для ваг A, B, C
+FALLBACK_WEIGHTS = (
+    ('name', 1.0),
+    ('category__name', 0.4),
+    ('description', 0.2),
+)
+
+REBUILD_BATCH_SIZE = 10000
+
+
+def get_search_config():
+    return getattr(settings, 'PRODUCT_SEARCH_CONFIG', 'simple')
+
+
+def is_fulltext_supported(using='default'):
+    return connections[using].vendor == 'postgresql'
+
+
+def tokenize(query):
+    return re.findall(r'\w+', (query or '').lower())
+
+
+def build_search_vector():
+    from .models import Category
+
+    category_name = Subquery(Category.objects.filter(pk=OuterRef('category_id')).values('name')[:1])
+    config = get_search_config()
+    return (
+        SearchVector('name', weight='A', config=config)
+        + SearchVector(category_name, weight='B', config=config)
+        + SearchVector('description', weight='C', config=config)
+    )
+
+
+def update_search_vectors(queryset):
+    if not is_fulltext_supported(queryset.db):
+        return 0
+    return queryset.update(search_vector=build_search_vector())
+
+
+def rebuild_search_index(queryset, batch_size=REBUILD_BATCH_SIZE):
+    updated = 0
+    if not is_fulltext_supported(queryset.db):
+        return updated
+
+    last_id = 0
+    while True:
+        ids = list(
+            queryset.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        updated += update_search_vectors(queryset.model.objects.filter(id__in=ids))
+        last_id = ids[-1]
+    return updated
+
+
+def search_products(queryset, query):
+    """
+    Фільтрує товари за пошуковим запитом і додає анотацію rank для
+    сортування за релевантністю. На PostgreSQL використовує search_vector
+    (GIN-індекс), на інших СУБД — регулярні вирази з тими ж вагами полів.
+    """
+    tokens = tokenize(query)
+    if not tokens:
+        if (query or '').strip():
+            queryset = queryset.none()
+        return queryset.annotate(rank=Value(0.0, output_field=FloatField()))
+
+    if is_fulltext_supported(queryset.db):
+        search_query = SearchQuery(
+            ' & '.join(f'{token}:*' for token in tokens),
+            config=get_search_config(),
+            search_type='raw',
+        )
+        return queryset.filter(search_vector=search_query).annotate(
+            rank=SearchRank(F('search_vector'), search_query)
+        )
+
+    return _search_products_fallback(queryset, tokens)
+
+
+def _search_products_fallback(queryset, tokens):
+    rank = Value(0.0, output_field=FloatField())
+    for token in tokens:
+        pattern = re.escape(token)
+        token_filter = Q()
+        for field, weight in FALLBACK_WEIGHTS:
+            lookup = {f'{field}__iregex': pattern}
+            token_filter |= Q(**lookup)
+            rank = rank + Case(
+                When(Q(**lookup), then=Value(weight)),
+                default=Value(0.0),
+                output_field=FloatField(),
+            )
+        queryset = queryset.filter(token_filter)
+    return queryset.annotate(rank=rank)
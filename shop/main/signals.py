@@ -0,0 +1,91 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from .autocomplete import CATEGORY, PRODUCT, index_category, index_product, unindex
+from .catalog_cache import invalidate_catalog
+from .images import schedule_variants
+from .page_cache import invalidate_tags
+from .pricing import refresh_effective_prices
+from .models import Category, Product
+from .search import update_search_vectors
+
+
+@receiver(post_save, sender=Product)
+def update_product_search_vector(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    update_search_vectors(Product.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Product)
+def update_product_effective_price(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and 'price' not in update_fields):
+        return
+    refresh_effective_prices(Product.objects.filter(pk=instance.pk))
+
+
+@receiver(pre_save, sender=Category)
+def remember_category_name(sender, instance, raw=False, **kwargs):
+    instance._name_changed = True
+    if instance.pk and not raw:
+        old_name = Category.objects.filter(pk=instance.pk).values_list('name', flat=True).first()
+        instance._name_changed = old_name != instance.name
+
+
+@receiver(post_save, sender=Category)
+def update_category_search_vectors(sender, instance, raw=False, **kwargs):
+    if raw or not getattr(instance, '_name_changed', True):
+        return
+    update_search_vectors(Product.objects.filter(category_id=instance.pk))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_catalog_cache(sender, **kwargs):
+    invalidate_catalog()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_page_cache(sender, instance, **kwargs):
+    invalidate_tags(f'product:{instance.pk}')
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_page_cache(sender, **kwargs):
+    invalidate_tags('categories')
+
+
+# Індекс автодоповнення оновлюється після коміту і змінює свою версію для інших процесів
+@receiver(post_save, sender=Product)
+def update_product_autocomplete(sender, instance, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(lambda: index_product(instance))
+
+
+@receiver(post_save, sender=Category)
+def update_category_autocomplete(sender, instance, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(lambda: index_category(instance))
+
+
+@receiver(post_delete, sender=Product)
+def remove_product_autocomplete(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: unindex(PRODUCT, pk))
+
+
+@receiver(post_delete, sender=Category)
+def remove_category_autocomplete(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: unindex(CATEGORY, pk))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Category)
+def generate_image_variants(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schedule_variants(instance, 'image', 'image_variants')
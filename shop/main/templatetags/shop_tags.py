@@ -1,6 +1,12 @@
 from django import template
 from datetime import datetime
-from main.models import Product
+from django.core.cache import cache
+from main.card_cache import card_cache_key, card_cache_timeout
+from main.catalog_cache import get_category_counts
+from main.images import build_srcset
+from main.page_cache import render_hole
+from main.popularity import get_popular_products
+from main.pricing import attach_pricing
 import json
 from django.utils.safestring import mark_safe
 
@@ -8,9 +14,10 @@ register = template.Library()
 
 @register.simple_tag
 def get_products_count(category=None):
+	counts = get_category_counts()
 	if category:
-		return Product.objects.filter(category=category, is_available=True).count()
-	return Product.objects.filter(is_available=True).count()
+		return counts['by_category'].get(getattr(category, 'pk', category), 0)
+	return counts['total']
 
 
 @register.simple_tag
@@ -33,13 +40,34 @@ def user_greeting(user):
         return f"{greeting}!"
     
 
+@register.inclusion_tag('main/components/responsive_image.html')
+def responsive_image(image, variants, alt='', css_class='', sizes='100vw', lazy=True):
+    variants = variants or {}
+    return {
+        'src': image.url if image else '',
+        'webp_srcset': build_srcset(variants, 'webp'),
+        'jpeg_srcset': build_srcset(variants, 'jpeg'),
+        'placeholder': variants.get('placeholder'),
+        'width': variants.get('width'),
+        'height': variants.get('height'),
+        'alt': alt,
+        'css_class': css_class,
+        'sizes': sizes,
+        'lazy': lazy,
+    }
+
+@register.simple_tag(takes_context=True)
+def page_hole(context, name):
+    return render_hole(context['request'], name)
+
 @register.inclusion_tag('main/components/popular_products.html', takes_context=True)
-def show_popular_products(context, count=4): 
-    products = Product.objects.filter(is_available=True).order_by('-views')[:count]
+def show_popular_products(context, count=4, category=None):
+    products = attach_pricing(get_popular_products(count, category))
     
     return {
         'popular_products': products,
         'product_promo_codes': context.get('product_promo_codes'),
+        'promo_resolver': context.get('promo_resolver'),
         'request': context.get('request'),
     }
 
@@ -64,4 +92,32 @@ def do_json_script(parser, token):
         raise template.TemplateSyntaxError("Usage: {% json_script value as element_id %}")
     value_var = parser.compile_filter(bits[1])
     element_id = bits[3].strip('"\'') 
-    return JsonScriptNode(value_var, element_id)
\ No newline at end of file
+    return JsonScriptNode(value_var, element_id)
+
+class ProductCardCacheNode(template.Node):
+    def __init__(self, nodelist, product_var, promo_var):
+        self.nodelist = nodelist
+        self.product_var = product_var
+        self.promo_var = promo_var
+
+    def render(self, context):
+        product = self.product_var.resolve(context)
+        promo = self.promo_var.resolve(context)
+        if not getattr(product, 'pk', None):
+            return self.nodelist.render(context)
+
+        key = card_cache_key(product, promo)
+        html = cache.get(key)
+        if html is None:
+            html = self.nodelist.render(context)
+            cache.set(key, html, card_cache_timeout(product))
+        return html
+
+@register.tag(name='product_card_cache')
+def do_product_card_cache(parser, token):
+    bits = token.split_contents()
+    if len(bits) != 3:
+        raise template.TemplateSyntaxError("Usage: {% product_card_cache product promo %}")
+    nodelist = parser.parse(('endproduct_card_cache',))
+    parser.delete_first_token()
+    return ProductCardCacheNode(nodelist, parser.compile_filter(bits[1]), parser.compile_filter(bits[2]))
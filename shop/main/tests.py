@@ -1,3 +1,1163 @@
-from django.test import TestCase
+import json
+import logging
+import os
+import time
+import timeit
+import unittest
+from datetime import datetime, timedelta
+from decimal import ROUND_HALF_EVEN, ROUND_HALF_UP, Decimal
+from io import StringIO
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.template import Context, Template
+from django.db import OperationalError, connection
+from django.db.models import F
+from django.http import QueryDict
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from discounts.models import Discount, PromoCode
+from .models import Category, PopularProduct, Product, ProductPairEvent, ProductPopularity, RelatedProduct
+from .money import ZERO, Money
+from .page_cache import LIST_TAG, get_tag_versions, page_cache_key
+from .pagination import KeysetPaginator
+from .pricing import attach_pricing, calculate_pricing, refresh_effective_prices
+from .search import _search_products_fallback, rebuild_search_index, search_products, tokenize
+from . import autocomplete, popularity, recommendations, rendering, view_counter
+from .card_cache import card_cache_key
+from .catalog_import import ProductImporter
+from .images import store_variants
+from .catalog_cache import get_catalog_version, get_category_counts
+from .checks import check_search_config, check_shared_cache, check_shared_cache_deploy
+from .exports import ExportError, build_queryset, stream_export
+from .facets import apply_facet_filters, compute_facet_counts, get_facet_counts, parse_facet_filters
+from .templatetags.shop_filters import currency
+from .templatetags.shop_tags import get_products_count
 
-# Create your tests here.
+RUN_BENCHMARKS = os.environ.get('SHOP_BENCHMARKS') == '1'
+# Результати бенчмарків (INFO); у тексті помилки, якщо бенчмарк не пройшов
+benchmark_logger = logging.getLogger('benchmarks')
+
+
+def make_discount(discount_type, value, min_quantity=1):
+    now = timezone.now()
+    return Discount(
+        discount_type=discount_type, value=Decimal(value), min_quantity=min_quantity, is_active=True,
+        start_date=now - timedelta(days=1), end_date=now + timedelta(days=1),
+    )
+
+
+def make_promo(discount_type, value):
+    return PromoCode(code='TEST', discount_type=discount_type, value=Decimal(value), min_order_amount=0)
+
+
+def make_product(category, name, price='100.00', **kwargs):
+    kwargs.setdefault('slug', f'{category.slug}-{name.lower()}')
+    kwargs.setdefault('description', name)
+    return Product.objects.create(category=category, name=name, price=Decimal(price), **kwargs)
+
+
+# Результати попередньої реалізації на Decimal: (ціна, знижки, кількість) ->
+# (індекс знижки, сума знижки, ціна, відсоток). Ціну, що припадає рівно на
+# половину копійки, каталог округлює до парної, як і раніше (кошик — вгору).
+PRICING_GOLDEN = [
+    ('1.00', [('percentage', '33')], 1, (0, '0.33', '0.67', '33.00')),
+    ('99999.99', [('percentage', '33.33')], 3, (0, '99989.99', '200009.98', '33.33')),
+    ('0.99', [('percentage', '5')], 1, (0, '0.05', '0.94', '5.00')),
+    ('10.05', [('percentage', '12.5')], 3, (0, '3.77', '26.38', '12.50')),
+    ('0.99', [('fixed', '150')], 1, (0, '0.99', '0.00', '100.00')),
+    ('1234.56', [('percentage', '33')], 1, (0, '407.40', '827.16', '33.00')),
+    ('149.50', [('percentage', '100')], 3, (0, '448.50', '0.00', '100.00')),
+    ('149.50', [('fixed', '150')], 1, (0, '149.50', '0.00', '100.00')),
+    ('99.95', [('percentage', '12.5')], 3, (0, '37.48', '262.37', '12.50')),
+    ('9.99', [('percentage', '33.33')], 3, (0, '9.99', '19.98', '33.33')),
+    ('1234.56', [('percentage', '12.5')], 1, (0, '154.32', '1080.24', '12.50')),
+    ('0.01', [('percentage', '33.33')], 3, (0, '0.01', '0.02', '33.33')),
+    ('99.95', [('percentage', '33')], 3, (0, '98.95', '200.90', '33.00')),
+    ('149.50', [('percentage', '12.5')], 1, (0, '18.69', '130.81', '12.50')),
+    ('10.05', [('percentage', '33.33')], 1, (0, '3.35', '6.70', '33.33')),
+    ('9.99', [('fixed', '5.50')], 1, (0, '5.50', '4.49', '55.06')),
+    ('0.99', [('fixed', '0.01')], 1, (0, '0.01', '0.98', '1.01')),
+    ('19.99', [('percentage', '12.5')], 3, (0, '7.50', '52.47', '12.50')),
+    ('99999.99', [('percentage', '12.5')], 3, (0, '37500.00', '262499.97', '12.50')),
+    ('100.00', [('percentage', '10'), ('fixed', '15')], 1, (1, '15.00', '85.00', '15.00')),
+    ('100.00', [('percentage', '20', 2), ('fixed', '15')], 1, (1, '15.00', '85.00', '15.00')),
+    ('100.00', [('percentage', '20', 2), ('fixed', '15')], 2, (0, '40.00', '160.00', '20.00')),
+    ('50.00', [], 1, (None, '0.00', '50.00', '0.00')),
+    ('10.05', [('percentage', '50')], 1, (0, '5.03', '5.02', '50.00')),
+    ('10.15', [('percentage', '50')], 1, (0, '5.07', '5.08', '50.00')),
+    ('0.05', [('percentage', '50')], 1, (0, '0.03', '0.02', '50.00')),
+    ('0.03', [('percentage', '50')], 1, (0, '0.01', '0.02', '50.00')),
+    ('0.60', [('percentage', '12.5')], 1, (0, '0.08', '0.52', '12.50')),
+    ('9.99', [('percentage', '50')], 3, (0, '14.99', '14.98', '50.00')),
+]
+
+# Ціна після промокоду, як її зберігав кошик (ROUND_HALF_UP до копійки)
+PROMO_GOLDEN = [
+    ('99999.99', 'percentage', '5', '94999.99'),
+    ('0.01', 'percentage', '12.5', '0.01'),
+    ('99.95', 'percentage', '12.5', '87.46'),
+    ('9.99', 'percentage', '100', '0.00'),
+    ('99.95', 'fixed', '150', '0.00'),
+    ('0.01', 'percentage', '33.33', '0.01'),
+    ('1234.56', 'fixed', '5.50', '1229.06'),
+    ('9.99', 'fixed', '0.01', '9.98'),
+    ('149.50', 'percentage', '33.33', '99.67'),
+    ('1234.56', 'percentage', '33', '827.16'),
+    ('9.99', 'fixed', '5.50', '4.49'),
+    ('19.99', 'fixed', '0.01', '19.98'),
+]
+
+
+class MoneyTests(SimpleTestCase):
+    def test_parsing_rounds_half_up(self):
+        self.assertEqual(Money.of('10.005').cents, 1001)
+        self.assertEqual(Money.of(Decimal('10.004')).cents, 1000)
+        self.assertEqual(Money.of(3).cents, 300)
+        self.assertEqual(Money.of(None), ZERO)
+        self.assertEqual(Money.of(19.99).cents, 1999)
+
+    def test_percent_rounds_half_up(self):
+        self.assertEqual(Money.of('10.05').percent(50), Money.of('5.03'))
+        self.assertEqual(Money.of('10.15').percent('50'), Money.of('5.08'))
+        self.assertEqual(Money.of('0.33').percent(Decimal('33.33')), Money.of('0.11'))
+
+    def test_percent_off_rounds_price_half_up(self):
+        self.assertEqual(Money.of('10.05').percent_off(50), Money.of('5.03'))
+        self.assertEqual(Money.of('84.95').percent_off('10'), Money.of('76.46'))
+
+    def test_percent_off_half_even(self):
+        self.assertEqual(Money.of('10.05').percent_off(50, ROUND_HALF_EVEN), Money.of('5.02'))
+        self.assertEqual(Money.of('10.15').percent_off(50, ROUND_HALF_EVEN), Money.of('5.08'))
+        self.assertEqual(Money.of('84.95').percent_off('10', ROUND_HALF_EVEN), Money.of('76.46'))
+
+    def test_immutable_and_formatting(self):
+        price = Money.of('1234.5')
+        with self.assertRaises(AttributeError):
+            price.cents = 1
+        self.assertEqual(str(price), '1234.50')
+        self.assertEqual(f'{price:.1f}', '1234.5')
+        self.assertEqual(price.to_decimal(), Decimal('1234.50'))
+        self.assertEqual(sum([price, price]), Money.of('2469.00'))
+
+    def test_invalid_value(self):
+        with self.assertRaises(ValueError):
+            Money.of('abc')
+
+
+class PricingGoldenTests(SimpleTestCase):
+    def test_calculate_pricing_matches_golden_set(self):
+        for price, discounts, quantity, expected in PRICING_GOLDEN:
+            with self.subTest(price=price, discounts=discounts, quantity=quantity):
+                objects = [make_discount(*discount) for discount in discounts]
+                pricing = calculate_pricing(Decimal(price), objects, quantity)
+                index = objects.index(pricing.discount) if pricing.discount is not None else None
+                self.assertEqual(
+                    (index, str(pricing.discount_amount), str(pricing.price), str(pricing.percentage)),
+                    expected,
+                )
+
+    def test_promo_matches_golden_set(self):
+        for price, discount_type, value, expected in PROMO_GOLDEN:
+            with self.subTest(price=price, discount_type=discount_type, value=value):
+                promo = make_promo(discount_type, value)
+                self.assertEqual(str(promo.apply_to_price(Money.of(price))), expected)
+
+    def test_template_filters(self):
+        template = Template(
+            '{% load shop_filters %}{{ price|apply_promo_to_price:promo|currency }}|{{ money|currency }}'
+        )
+        context = Context({'price': Decimal('1234.56'), 'promo': make_promo('fixed', '34.56'), 'money': Money.of('0.5')})
+        self.assertEqual(template.render(context), '1 200 грн|0,50 грн')
+
+
+class ProductImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Телефони', slug='phones')
+        cls.existing = make_product(cls.category, 'Phone', slug='phone', price='500.00')
+
+    def run_import(self, rows, **kwargs):
+        importer = ProductImporter(**kwargs)
+        importer.run(rows)
+        return importer
+
+    def slugs(self):
+        return dict(Product.objects.values_list('slug', 'name'))
+
+    def test_explicit_slug_updates_existing(self):
+        importer = self.run_import([{'name': 'Phone X', 'slug': 'phone', 'category_slug': 'phones', 'price': '450'}])
+        self.assertEqual(importer.stats['imported'], 1)
+        product = Product.objects.get(pk=self.existing.pk)
+        self.assertEqual((product.name, product.price), ('Phone X', Decimal('450.00')))
+
+    def test_generated_slug_never_overwrites(self):
+        Product.objects.filter(pk=self.existing.pk).update(name='Old phone')
+        make_product(self.category, 'Phone 3', slug='phone-3')
+        importer = self.run_import([
+            {'name': 'Phone', 'category_slug': 'phones', 'price': '100'},
+            {'name': 'Phone', 'category_slug': 'phones', 'price': '200'},
+            {'name': 'Explicit', 'slug': 'phone-2', 'category_slug': 'phones', 'price': '300'},
+        ])
+        self.assertEqual(importer.stats, {**importer.stats, 'imported': 3, 'skipped': 0})
+        self.assertEqual(self.slugs(), {
+            'phone': 'Old phone', 'phone-2': 'Explicit', 'phone-3': 'Phone 3', 'phone-4': 'Phone', 'phone-5': 'Phone',
+        })
+
+    def test_every_dropped_row_is_reported(self):
+        importer = self.run_import([
+            {'name': 'First', 'slug': 'dup', 'category': 'Нова', 'price': '1'},
+            {'name': '', 'category': 'Нова', 'price': '1'},
+            {'name': 'Bad price', 'category': 'Нова', 'price': 'abc'},
+            {'name': 'Second', 'slug': 'dup', 'category': 'Нова', 'price': '2'},
+        ], chunk_size=10)
+        self.assertEqual((importer.stats['imported'], importer.stats['skipped']), (1, 3))
+        self.assertEqual([error.split(':')[0] for error in importer.errors], ['Рядок 2', 'Рядок 3', 'Рядок 1'])
+        self.assertEqual(Product.objects.get(slug='dup').name, 'Second')
+        self.assertTrue(Category.objects.filter(slug='nova').exists())
+
+    def test_dry_run_changes_nothing(self):
+        before = self.slugs()
+        importer = self.run_import([{'name': 'New', 'category': 'Інша', 'price': '10'}], dry_run=True)
+        self.assertEqual(importer.stats['imported'], 1)
+        self.assertEqual(self.slugs(), before)
+        self.assertFalse(Category.objects.filter(slug='insha').exists())
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.phones = Category.objects.create(name='Телефони', slug='phones')
+        cls.cases = Category.objects.create(name='Чохли', slug='cases')
+        cls.phone = make_product(cls.phones, 'Phone', featured=True)
+        cls.case = make_product(cls.cases, 'Case', is_available=False)
+        Product.objects.filter(pk=cls.case.pk).update(created_at=timezone.make_aware(datetime(2024, 1, 10)))
+        cls.staff = User.objects.create_user('staff', password='pass', is_staff=True)
+
+    def ids(self, dataset, filters):
+        return [row[0] for row in build_queryset(dataset, filters)]
+
+    def test_admin_style_filters(self):
+        self.assertEqual(self.ids('products', {'category__id__exact': str(self.phones.pk)}), [self.phone.pk])
+        self.assertEqual(self.ids('products', {'is_available__exact': '0'}), [self.case.pk])
+        self.assertEqual(self.ids('products', {'featured__exact': 'true'}), [self.phone.pk])
+        self.assertEqual(self.ids('products', {'created_at__lt': '2024-02-01'}), [self.case.pk])
+        self.assertEqual(
+            self.ids('products', {'created_at__gte': '2024-01-09T00:00:00+00:00'}), [self.phone.pk, self.case.pk],
+        )
+
+    def test_unknown_or_invalid_filters(self):
+        for filters in ({'price__gt': '1'}, {'is_available__exact': 'maybe'}, {'created_at__gte': 'вчора'}):
+            with self.subTest(filters=filters), self.assertRaises(ExportError):
+                build_queryset('products', filters)
+        with self.assertRaises(ExportError):
+            build_queryset('users')
+
+    def test_csv_and_jsonl_rows(self):
+        lines = list(stream_export('products', {'featured__exact': '1'}))
+        self.assertEqual(lines[0].split(',')[:3], ['id', 'name', 'slug'])
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith(f'{self.phone.pk},Phone,phones-phone,Телефони,phones,100.00,'))
+        row = json.loads(list(stream_export('products', {'is_available__exact': '0'}, 'jsonl'))[0])
+        self.assertEqual((row['slug'], row['price'], row['is_available']), ('cases-case', '100.00', False))
+
+    def test_view_requires_staff_and_streams(self):
+        url = reverse('main:export_data', args=['products'])
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.force_login(self.staff)
+        response = self.client.get(url, {'format': 'jsonl', 'category__id__exact': self.cases.pk})
+        self.assertTrue(response.streaming)
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 1)
+        self.assertEqual(self.client.get(url, {'format': 'xml'}).status_code, 400)
+
+
+class CategoryCountsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.phones = Category.objects.create(name='Телефони', slug='phones')
+        cls.cases = Category.objects.create(name='Чохли', slug='cases')
+        cls.phone = make_product(cls.phones, 'Phone')
+        make_product(cls.phones, 'Phone2')
+        make_product(cls.cases, 'Case')
+        make_product(cls.cases, 'Hidden', is_available=False)
+
+    def setUp(self):
+        cache.clear()
+
+    def assertCounts(self, phones, cases):
+        self.assertEqual(
+            (get_products_count(self.phones), get_products_count(self.cases), get_products_count()),
+            (phones, cases, phones + cases),
+        )
+
+    def test_counts_come_from_one_grouped_query(self):
+        with self.assertNumQueries(1):
+            counts = get_category_counts()
+        self.assertEqual(counts['by_category'], {self.phones.pk: 2, self.cases.pk: 1})
+        with self.assertNumQueries(0):
+            self.assertCounts(2, 1)
+
+    def test_save_and_delete_invalidate(self):
+        self.assertCounts(2, 1)
+        product = make_product(self.cases, 'Case2')
+        self.assertCounts(2, 2)
+        product.category = self.phones
+        product.save()
+        self.assertCounts(3, 1)
+        product.is_available = False
+        product.save()
+        self.assertCounts(2, 1)
+        Product.objects.get(pk=self.phone.pk).delete()
+        self.assertCounts(1, 1)
+
+    def test_bulk_changes_invalidate(self):
+        self.assertCounts(2, 1)
+        Product.objects.filter(category=self.cases).update(is_available=True)
+        self.assertCounts(2, 2)
+        Product.objects.filter(pk=self.phone.pk).update(category=self.cases)
+        self.assertCounts(1, 3)
+        Product.objects.bulk_create([
+            Product(category=self.phones, name=f'Bulk{i}', slug=f'bulk-{i}', description='', price=Decimal('1.00'))
+            for i in range(2)
+        ])
+        self.assertCounts(3, 3)
+
+    def test_unrelated_update_keeps_cache(self):
+        self.assertCounts(2, 1)
+        Product.objects.filter(pk=self.phone.pk).update(views=10)
+        with self.assertNumQueries(0):
+            self.assertCounts(2, 1)
+
+
+class PageCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Сторінки кешу', slug='page-cache')
+        cls.product = make_product(cls.category, 'Cached')
+
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        # Перегляди сторінки товару не мають дочекатися atexit після знищення тестової БД
+        view_counter.get_view_buffer().clear()
+
+    def add_discount(self, **dates):
+        now = timezone.now()
+        dates.setdefault('start_date', now - timedelta(days=1))
+        dates.setdefault('end_date', now + timedelta(days=1))
+        return Discount.objects.create(product=self.product, discount_type='fixed', value=Decimal('5'), **dates)
+
+    def test_discount_invalidates_product_and_lists_only(self):
+        tags = ['catalog', LIST_TAG, f'product:{self.product.pk}']
+        before = get_tag_versions(tags)
+        self.add_discount()
+        after = get_tag_versions(tags)
+        self.assertEqual(after['catalog'], before['catalog'])
+        self.assertNotEqual(after[LIST_TAG], before[LIST_TAG])
+        self.assertNotEqual(after[f'product:{self.product.pk}'], before[f'product:{self.product.pk}'])
+
+    def test_list_page_expires_at_discount_boundary(self):
+        url = reverse('main:product_list')
+        self.client.get(url)
+        self.assertIsNotNone(cache.get(page_cache_key(self.client.get(url).wsgi_request)))
+
+        cache.clear()
+        self.add_discount(end_date=timezone.now() + timedelta(seconds=30))
+        version = get_catalog_version()
+        response = self.client.get(url)
+        key = page_cache_key(response.wsgi_request)
+        self.assertIsNotNone(cache.get(key))
+        self.assertEqual(get_catalog_version(), version)
+        # LocMem зберігає момент закінчення запису
+        expires_in = cache._expire_info[cache.make_and_validate_key(key)] - time.time()
+        self.assertLessEqual(expires_in, 31)
+
+    def test_detail_page_not_cached_past_boundary(self):
+        self.add_discount(start_date=timezone.now() + timedelta(milliseconds=500))
+        response = self.client.get(self.product.get_absolute_url())
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(cache.get(page_cache_key(response.wsgi_request)))
+
+
+class StoreVariantsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Зображення', slug='images')
+        cls.product = make_product(cls.category, 'Pictured')
+
+    def variants(self, stem):
+        return {'source': f'products/{stem}.jpg', 'webp': {'320': f'variants/{stem}-320w.webp'},
+                'jpeg': {'320': f'variants/{stem}-320w.jpeg'}}
+
+    def store(self, name, variants):
+        return store_variants(Product, self.product.pk, 'image', 'image_variants', name, variants)
+
+    def test_replaces_old_files_and_invalidates_page(self):
+        old, new = self.variants('old'), self.variants('new')
+        Product.objects.filter(pk=self.product.pk).update(image='products/new.jpg', image_variants=old)
+        tag = f'product:{self.product.pk}'
+        version = get_tag_versions([tag])[tag]
+        with mock.patch('main.images.default_storage') as storage:
+            self.assertEqual(self.store('products/new.jpg', new), 1)
+        deleted = sorted(call.args[0] for call in storage.delete.call_args_list)
+        self.assertEqual(deleted, ['variants/old-320w.jpeg', 'variants/old-320w.webp'])
+        self.assertEqual(Product.objects.get(pk=self.product.pk).image_variants, new)
+        self.assertNotEqual(get_tag_versions([tag])[tag], version)
+
+    def test_outdated_result_is_discarded(self):
+        Product.objects.filter(pk=self.product.pk).update(image='products/newer.jpg')
+        with mock.patch('main.images.default_storage') as storage:
+            self.assertEqual(self.store('products/new.jpg', self.variants('new')), 0)
+        deleted = sorted(call.args[0] for call in storage.delete.call_args_list)
+        self.assertEqual(deleted, ['variants/new-320w.jpeg', 'variants/new-320w.webp'])
+        self.assertEqual(Product.objects.get(pk=self.product.pk).image_variants, {})
+
+
+class CardCacheKeyTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Картки', slug='cards')
+        cls.product = make_product(cls.category, 'Card')
+
+    def test_key_follows_image_variants(self):
+        key = card_cache_key(self.product)
+        self.product.image_variants = {'320': 'products/card-320.webp'}
+        self.assertNotEqual(card_cache_key(self.product), key)
+
+    def test_key_follows_promo_validity(self):
+        now = timezone.now()
+        promo = PromoCode(
+            pk=1, code='CARD', discount_type='percentage', value=Decimal('10'), min_order_amount=0,
+            is_active=True, usage_limit=1, used_count=0,
+            start_date=now - timedelta(days=1), end_date=now + timedelta(days=1),
+        )
+        key = card_cache_key(self.product, promo)
+        promo.used_count = 1
+        self.assertNotEqual(card_cache_key(self.product, promo), key)
+
+
+class AttachPricingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Ціни', slug='prices')
+        cls.first = make_product(cls.category, 'First')
+        cls.second = make_product(cls.category, 'Second', price='50.00')
+        cls.plain = make_product(cls.category, 'Plain')
+        now = timezone.now()
+        cls.ends = now + timedelta(days=2)
+        cls.starts = now + timedelta(hours=3)
+        Discount.objects.create(
+            product=cls.first, discount_type='percentage', value=Decimal('10'),
+            start_date=now - timedelta(days=1), end_date=cls.ends,
+        )
+        Discount.objects.create(
+            product=cls.first, discount_type='fixed', value=Decimal('15'),
+            start_date=now - timedelta(days=1), end_date=now + timedelta(days=5),
+        )
+        Discount.objects.create(
+            product=cls.second, discount_type='percentage', value=Decimal('50'),
+            start_date=cls.starts, end_date=now + timedelta(days=3),
+        )
+        Discount.objects.create(
+            product=cls.second, discount_type='fixed', value=Decimal('5'), is_active=False,
+            start_date=now - timedelta(days=1), end_date=now + timedelta(days=1),
+        )
+
+    def test_one_query_for_whole_page(self):
+        products = list(Product.objects.order_by('pk'))
+        with self.assertNumQueries(1):
+            attach_pricing(products)
+        with self.assertNumQueries(0):
+            prices = [str(product.get_pricing().price) for product in products]
+        self.assertEqual(prices, ['85.00', '50.00', '100.00'])
+
+    def test_best_discount_and_next_boundary(self):
+        first, second, plain = attach_pricing(Product.objects.order_by('pk'))
+        self.assertEqual(first._pricing.discount.discount_type, 'fixed')
+        self.assertEqual(first._pricing.percentage, Decimal('15.00'))
+        # Кінець знижки 10 % теж змінює найкращу ціну, тому береться найближча межа
+        self.assertEqual(first._pricing_expires, self.ends)
+        # Запланована знижка ще не діє, але її початок — межа ціни
+        self.assertIsNone(second._pricing.discount)
+        self.assertEqual(second._pricing_expires, self.starts)
+        self.assertIsNone(plain._pricing_expires)
+
+    def test_refresh_effective_prices_updates_only_changed(self):
+        # Сигнали вже підтримують ціни; скидаємо одну, як після збою
+        Product.objects.filter(pk=self.first.pk).update(
+            effective_price=Decimal('100.00'), discount_percent=0, price_expires_at=None,
+        )
+        self.assertEqual(refresh_effective_prices(), [self.first.pk])
+        first = Product.objects.get(pk=self.first.pk)
+        self.assertEqual(first.effective_price, Decimal('85.00'))
+        self.assertEqual(first.discount_percent, Decimal('15.00'))
+        self.assertEqual(first.price_expires_at, self.ends)
+        self.assertEqual(refresh_effective_prices(), [])
+
+    def stored_prices(self, product):
+        return Product.objects.values_list('effective_price', 'discount_percent').get(pk=product.pk)
+
+    def test_discount_create_change_and_delete(self):
+        now = timezone.now()
+        discount = Discount.objects.create(
+            product=self.plain, discount_type='percentage', value=Decimal('20'),
+            start_date=now - timedelta(days=1), end_date=now + timedelta(days=1),
+        )
+        self.assertEqual(self.stored_prices(self.plain), (Decimal('80.00'), Decimal('20.00')))
+
+        discount.value = Decimal('30')
+        discount.save()
+        self.assertEqual(self.stored_prices(self.plain), (Decimal('70.00'), Decimal('30.00')))
+
+        # Перенесена знижка перестає діяти на попередньому товарі
+        discount.product = self.second
+        discount.save()
+        self.assertEqual(self.stored_prices(self.plain), (Decimal('100.00'), Decimal('0.00')))
+        self.assertEqual(self.stored_prices(self.second), (Decimal('35.00'), Decimal('30.00')))
+
+        discount.delete()
+        self.assertEqual(self.stored_prices(self.second), (Decimal('50.00'), Decimal('0.00')))
+
+    def test_boundaries_are_refreshed(self):
+        # Знижка 10 % закінчилась, а 50 % на другий товар уже почалась
+        later = self.ends + timedelta(seconds=1)
+        self.assertEqual(refresh_effective_prices(now=later), [self.first.pk, self.second.pk])
+        self.assertEqual(self.stored_prices(self.second), (Decimal('25.00'), Decimal('50.00')))
+        first = Product.objects.get(pk=self.first.pk)
+        self.assertEqual(first.effective_price, Decimal('85.00'))
+        self.assertGreater(first.price_expires_at, self.ends)
+        self.assertEqual(refresh_effective_prices(now=later), [])
+
+    def test_bulk_price_update_refreshes_effective_prices(self):
+        Product.objects.filter(price__lt=Decimal('60')).update(price=Decimal('80.00'))
+        self.assertEqual(self.stored_prices(self.second), (Decimal('80.00'), Decimal('0.00')))
+        Product.objects.filter(pk__in=[self.first.pk, self.plain.pk]).update(price=Decimal('40.00'))
+        # Фіксована знижка 15 від нової ціни 40 — це 37,5 %
+        self.assertEqual(self.stored_prices(self.first), (Decimal('25.00'), Decimal('37.50')))
+        self.assertEqual(self.stored_prices(self.plain), (Decimal('40.00'), Decimal('0.00')))
+
+
+class MarkdownRenderingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Описи', slug='descriptions')
+
+    def setUp(self):
+        cache.clear()
+
+    def stored(self, product):
+        return Product.objects.values_list('detailed_description_html', 'detailed_description_hash').get(pk=product.pk)
+
+    def test_save_renders_and_edit_rerenders(self):
+        product = make_product(self.category, 'Described', detailed_description='# Заголовок')
+        html, digest = self.stored(product)
+        self.assertIn(f'class="{rendering.TAG_CLASSES["h1"]}"', html)
+        self.assertEqual(digest, rendering.content_hash('# Заголовок'))
+
+        product.detailed_description = '**жирний**'
+        product.save(update_fields=['detailed_description'])
+        html, digest = self.stored(product)
+        self.assertIn('<strong', html)
+        self.assertEqual(digest, rendering.content_hash('**жирний**'))
+
+    def test_unchanged_description_is_not_rerendered(self):
+        product = make_product(self.category, 'Described', detailed_description='Текст')
+        with mock.patch('main.models.compile_markdown') as compile_markdown:
+            product.name = 'Renamed'
+            product.save()
+            Product.objects.get(pk=product.pk).save()
+        compile_markdown.assert_not_called()
+
+    def test_stale_html_uses_cached_render(self):
+        product = make_product(self.category, 'Described', detailed_description='_курсив_')
+        Product.objects.filter(pk=product.pk).update(detailed_description_html='old', detailed_description_hash='old')
+        product = Product.objects.get(pk=product.pk)
+        with mock.patch.object(rendering, 'compile_markdown', wraps=rendering.compile_markdown) as compile_markdown:
+            first = product.get_detailed_description_html()
+            second = product.get_detailed_description_html()
+        self.assertIn('<em', first)
+        self.assertEqual(first, second)
+        compile_markdown.assert_called_once_with('_курсив_')
+        self.assertIsNotNone(cache.get(f'markdown:{rendering.content_hash("_курсив_")}'))
+
+    def test_command_rerenders_stale_descriptions(self):
+        products = [make_product(self.category, f'Item{i}', detailed_description=f'Опис *{i}*') for i in range(3)]
+        fresh = self.stored(products[0])
+        Product.objects.filter(pk__in=[p.pk for p in products[1:]]).update(
+            detailed_description_html='', detailed_description_hash='stale',
+        )
+
+        out = StringIO()
+        call_command('rerender_markdown', batch_size=1, stdout=out)
+        self.assertIn('Перерендерено описів: 2', out.getvalue())
+        for i, product in enumerate(products):
+            html, digest = self.stored(product)
+            self.assertIn('<em', html)
+            self.assertEqual(digest, rendering.content_hash(f'Опис *{i}*'))
+        self.assertEqual(self.stored(products[0]), fresh)
+
+        out = StringIO()
+        call_command('rerender_markdown', stdout=out)
+        self.assertIn('Перерендерено описів: 0', out.getvalue())
+        call_command('rerender_markdown', '--all', stdout=out)
+        self.assertIn('Перерендерено описів: 3', out.getvalue())
+
+
+class SearchFallbackTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        phones = Category.objects.create(name='Смартфони', slug='phones')
+        cases = Category.objects.create(name='Чохли', slug='cases')
+        cls.phone = make_product(phones, 'Phone', description='Смартфон з великим екраном')
+        cls.case = make_product(cases, 'Case', description='Чохол для phone')
+        cls.other = make_product(cases, 'Strap', description='Ремінець (a+b)')
+
+    def search(self, query):
+        products = Product.objects.all()
+        return list(_search_products_fallback(products, tokenize(query)).order_by('-rank', 'pk'))
+
+    def test_tokenize(self):
+        self.assertEqual(tokenize('  Смартфон, PHONE-2!  '), ['смартфон', 'phone', '2'])
+        self.assertEqual(tokenize(None), [])
+
+    def test_rank_follows_field_weights(self):
+        results = self.search('phone')
+        self.assertEqual(results, [self.phone, self.case])
+        self.assertEqual([product.rank for product in results], [1.0, 0.2])
+
+    def test_all_tokens_required_and_case_insensitive(self):
+        self.assertEqual(self.search('ЧОХЛИ phone'), [self.case])
+        self.assertEqual(self.search('смартфони'), [self.phone])
+        self.assertEqual(self.search('phone екраном чохол'), [])
+
+    def test_regex_characters_are_literal(self):
+        self.assertEqual(self.search('a+b'), [self.other])
+
+    def test_query_without_tokens(self):
+        self.assertEqual(search_products(Product.objects.all(), '!!!').count(), 0)
+        self.assertEqual(search_products(Product.objects.all(), '').count(), 3)
+
+    @unittest.skipUnless(connection.vendor == 'postgresql', 'повнотекстовий пошук лише на PostgreSQL')
+    def test_fulltext_matches_fallback_order(self):
+        for query in ('phone', 'ЧОХЛИ phone', 'смартфон'):
+            with self.subTest(query=query):
+                fulltext = list(search_products(Product.objects.all(), query).order_by('-rank', 'pk'))
+                self.assertEqual(fulltext, self.search(query))
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'Повнотекстовий пошук лише на PostgreSQL')
+class SearchConfigCheckTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Конфігурація', slug='config')
+        make_product(category, 'Running Shoes', description='Shoes for running')
+
+    def check_ids(self):
+        return [message.id for message in check_search_config(None, databases=['default'])]
+
+    def test_vectors_match_setting(self):
+        self.assertEqual(self.check_ids(), [])
+
+    @override_settings(PRODUCT_SEARCH_CONFIG='english')
+    def test_changed_config_needs_rebuild(self):
+        self.assertEqual(self.check_ids(), ['main.W002'])
+        rebuild_search_index(Product.objects.all())
+        self.assertEqual(self.check_ids(), [])
+
+    @override_settings(PRODUCT_SEARCH_CONFIG='missing_config')
+    def test_unknown_config(self):
+        self.assertEqual(self.check_ids(), ['main.E002'])
+
+
+class KeysetPaginatorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Сторінки', slug='pages')
+        # Однакові ціни перевіряють порядок за id всередині групи
+        for i, price in enumerate(['30', '10', '20', '10', '30', '10', '20']):
+            make_product(category, f'P{i}', price=price)
+
+    def walk(self, order_field, per_page=3):
+        paginator = KeysetPaginator(Product.objects.all(), order_field, per_page)
+        pages, cursor = [], None
+        while True:
+            page = paginator.page(cursor)
+            pages.append(page)
+            if not page.has_next():
+                return paginator, pages
+            cursor = page.next_cursor
+
+    def test_forward_covers_all_rows_in_order(self):
+        for order_field in ('effective_price', '-effective_price', '-created_at', 'name'):
+            with self.subTest(order_field=order_field):
+                _, pages = self.walk(order_field)
+                rows = [product.pk for page in pages for product in page]
+                id_order = '-id' if order_field.startswith('-') else 'id'
+                expected = Product.objects.order_by(order_field, id_order).values_list('pk', flat=True)
+                self.assertEqual(rows, list(expected))
+                self.assertEqual([len(page) for page in pages], [3, 3, 1])
+                self.assertFalse(pages[0].has_previous())
+
+    def test_previous_cursor_returns_same_page(self):
+        paginator, pages = self.walk('-effective_price')
+        for page, previous in zip(pages[1:], pages):
+            back = paginator.page(page.previous_cursor)
+            self.assertEqual(list(back), list(previous))
+            self.assertTrue(back.has_next())
+        self.assertFalse(paginator.page(pages[1].previous_cursor).has_previous())
+
+    def test_invalid_or_foreign_cursor_starts_over(self):
+        paginator, pages = self.walk('effective_price')
+        other = KeysetPaginator(Product.objects.all(), 'name', 3)
+        for cursor in ('garbage', pages[0].next_cursor[:-2], pages[0].next_cursor):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(list(other.page(cursor)), list(other.page()))
+
+
+class ViewCounterDrainTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Перегляди', slug='views')
+        cls.product = make_product(category, 'Viewed')
+
+    def setUp(self):
+        cache.delete_many([view_counter.CACHE_PENDING_KEY, view_counter.CACHE_LOCK_KEY])
+
+    def views(self):
+        return Product.objects.values_list('views', flat=True).get(pk=self.product.pk)
+
+    def test_drain_writes_and_clears(self):
+        self.assertTrue(view_counter.spill_to_cache({self.product.pk: 3}))
+        self.assertTrue(view_counter.spill_to_cache({self.product.pk: 2}))
+        self.assertEqual(view_counter.drain_cache(), 5)
+        self.assertEqual(self.views(), 5)
+        self.assertEqual(view_counter.drain_cache(), 0)
+
+    def test_spill_during_write_is_kept(self):
+        write = view_counter.write_view_increments
+
+        def slow_write(pending):
+            # Інший процес переносить перегляди, поки триває запис
+            self.assertTrue(view_counter.spill_to_cache({self.product.pk: 7}))
+            return write(pending)
+
+        view_counter.spill_to_cache({self.product.pk: 1})
+        with mock.patch.object(view_counter, 'write_view_increments', slow_write):
+            self.assertEqual(view_counter.drain_cache(), 1)
+        self.assertEqual(cache.get(view_counter.CACHE_PENDING_KEY), {self.product.pk: 7})
+
+    def test_failed_write_returns_to_cache(self):
+        view_counter.spill_to_cache({self.product.pk: 4})
+        with mock.patch.object(view_counter, 'write_view_increments', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                view_counter.drain_cache()
+        self.assertEqual(cache.get(view_counter.CACHE_PENDING_KEY), {self.product.pk: 4})
+
+    def test_busy_cache_keeps_views_in_buffer(self):
+        buffer = view_counter.ViewCounterBuffer(backend='cache', threshold=100, interval=3600)
+        self.addCleanup(buffer.clear)
+        buffer.record(self.product.pk, 3)
+        cache.add(view_counter.CACHE_LOCK_KEY, 'other', 10)
+        with mock.patch.object(view_counter.time, 'sleep') as sleep:
+            self.assertEqual(buffer.flush(), 0)
+        sleep.assert_not_called()
+        self.assertEqual(buffer._pending, {self.product.pk: 3})
+
+        cache.delete(view_counter.CACHE_LOCK_KEY)
+        self.assertEqual(buffer.flush(), 3)
+        self.assertEqual(cache.get(view_counter.CACHE_PENDING_KEY), {self.product.pk: 3})
+        self.assertEqual(self.views(), 0)
+
+    def test_exit_flush_survives_missing_database(self):
+        buffer = view_counter.ViewCounterBuffer(threshold=100, interval=3600)
+        self.addCleanup(buffer.clear)
+        buffer.record(self.product.pk)
+        error = OperationalError('no such table: main_product')
+        with mock.patch.object(view_counter, 'write_view_increments', side_effect=error), \
+                self.assertLogs('main.view_counter', 'WARNING') as logs:
+            buffer.flush_at_exit()
+        self.assertIn('no such table', logs.output[0])
+
+    def test_idle_buffer_flushes_on_timer(self):
+        buffer = view_counter.ViewCounterBuffer(threshold=100, interval=0.01)
+        with mock.patch.object(buffer, 'flush', side_effect=buffer._take) as flush, \
+                mock.patch.object(view_counter.connections, 'close_all'):
+            buffer.record(self.product.pk)
+            buffer._timer.join()
+        flush.assert_called_once_with()
+        self.assertIsNone(buffer._timer)
+
+
+class FacetCountsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Фасети', slug='facets')
+        cls.cheap = make_product(cls.category, 'Cheap', price='100.00', featured=True)
+        cls.middle = make_product(cls.category, 'Middle', price='700.00', is_available=False)
+        cls.high = make_product(cls.category, 'High', price='2000.00')
+        now = timezone.now()
+        Discount.objects.create(
+            product=cls.high, discount_type='percentage', value=Decimal('50'),
+            start_date=now - timedelta(days=1), end_date=now + timedelta(days=1),
+        )
+        Product.objects.filter(pk=cls.middle.pk).update(rating_avg=Decimal('4.50'))
+        Product.objects.filter(pk=cls.cheap.pk).update(rating_avg=Decimal('3.20'))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_parse_keeps_only_valid_values(self):
+        params = QueryDict('price=500-1000&rating=7&available=1&discount=yes&featured=1&page=2')
+        self.assertEqual(parse_facet_filters(params), {'price': '500-1000', 'available': True, 'featured': True})
+        self.assertEqual(parse_facet_filters(QueryDict('rating=abc&price=1-2')), {})
+
+    def test_each_facet_ignores_its_own_filter(self):
+        filters = {'price': '1000-5000', 'available': True}
+        counts = compute_facet_counts(Product.objects.all(), filters)
+        self.assertEqual(counts['total'], 1)
+        # Ціна рахується лише з фільтром наявності, наявність — лише з ціною
+        self.assertEqual(
+            [(key, n) for key, _, n in counts['price']],
+            [('0-500', 1), ('500-1000', 0), ('1000-5000', 1), ('5000-', 0)],
+        )
+        self.assertEqual(counts['available'], 1)
+        self.assertEqual(counts['discount'], 1)
+        self.assertEqual(counts['featured'], 0)
+        self.assertEqual(counts['rating'], [(4, 0), (3, 0), (2, 0), (1, 0)])
+        self.assertEqual(list(apply_facet_filters(Product.objects.all(), filters)), [self.high])
+
+    def test_counts_match_filtered_queryset(self):
+        products = Product.objects.all()
+        counts = compute_facet_counts(products, {})
+        self.assertEqual(counts['total'], 3)
+        for rating, n in counts['rating']:
+            self.assertEqual(n, apply_facet_filters(products, {'rating': rating}).count())
+        for key, _, n in counts['price']:
+            self.assertEqual(n, apply_facet_filters(products, {'price': key}).count())
+
+    def test_cached_by_scope(self):
+        products = Product.objects.all()
+        with self.assertNumQueries(1):
+            get_facet_counts(products, {}, scope=(None,))
+            get_facet_counts(products, {}, scope=(None,))
+        with self.assertNumQueries(1):
+            featured = products.filter(featured=True)
+            self.assertEqual(get_facet_counts(featured, {}, scope=(None, 'featured'))['total'], 1)
+
+    @override_settings(PAGE_CACHE={'ENABLED': False})
+    def test_search_without_tokens_does_not_reuse_catalog_counts(self):
+        url = reverse('main:product_list')
+        self.assertEqual(self.client.get(url).context['facet_counts']['total'], 3)
+        response = self.client.get(url, {'q': '!!!'})
+        self.assertEqual(len(response.context['products']), 0)
+        self.assertEqual(response.context['facet_counts']['total'], 0)
+
+
+class AutocompleteIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Навушники', slug='headphones')
+        cls.product = make_product(cls.category, 'Navy Headset', views=5)
+        make_product(cls.category, 'Hidden', is_available=False)
+
+    def setUp(self):
+        autocomplete.build_index()
+
+    def names(self, query):
+        return [name for _, _, name, _ in autocomplete.get_index().search(query)]
+
+    def test_prefix_search(self):
+        self.assertEqual(self.names('нав'), ['Навушники'])
+        self.assertEqual(self.names('hea na'), ['Navy Headset'])
+        self.assertEqual(self.names('hid'), [])
+
+    def test_local_change_keeps_index_fresh(self):
+        self.product.name = 'Navy Speaker'
+        autocomplete.index_product(self.product)
+        self.assertFalse(autocomplete._is_stale())
+        self.assertEqual(self.names('spea'), ['Navy Speaker'])
+
+    def test_price_change_does_not_touch_index(self):
+        version = autocomplete.get_index_version()
+        Product.objects.filter(pk=self.product.pk).update(price=Decimal('1.00'))
+        self.assertEqual(autocomplete.get_index_version(), version)
+        Product.objects.filter(pk=self.product.pk).update(is_available=False)
+        self.assertNotEqual(autocomplete.get_index_version(), version)
+
+    def test_stale_index_is_rebuilt_in_background(self):
+        # Інший процес перейменував товар
+        Product.objects.filter(pk=self.product.pk).update(name='Navy Speaker')
+        # Потік не запускається: з власним з'єднанням він не бачить транзакції тесту
+        with mock.patch.object(autocomplete.threading, 'Thread') as thread, \
+                mock.patch.object(autocomplete.connections, 'close_all'):
+            self.assertEqual(self.names('hea'), ['Navy Headset'])
+            self.assertEqual(self.names('hea'), ['Navy Headset'])
+            thread.assert_called_once()
+            self.assertEqual(thread.call_args.kwargs['name'], 'autocomplete-index')
+            thread.call_args.kwargs['target']()
+        self.assertEqual(self.names('spea'), ['Navy Speaker'])
+        self.assertFalse(autocomplete._build_lock.locked())
+
+    def test_short_prefix_uses_precomputed_top(self):
+        for i in range(autocomplete.TOP_PER_PREFIX + 5):
+            make_product(self.category, f'Nav{i}', views=i)
+        autocomplete.build_index()
+        index = autocomplete.get_index()
+        top_views = autocomplete.TOP_PER_PREFIX + 4
+        self.assertEqual(self.names('na')[:2], [f'Nav{top_views}', f'Nav{top_views - 1}'])
+        self.assertEqual(len(index._top['na']), autocomplete.TOP_PER_PREFIX)
+
+        # Зміна товару скидає список префікса, і він перераховується
+        self.product.views = 1000
+        autocomplete.index_product(self.product)
+        self.assertNotIn('na', index._top)
+        self.assertEqual(self.names('na')[:2], ['Navy Headset', f'Nav{top_views}'])
+        self.assertEqual(self.names('na hea'), ['Navy Headset'])
+        self.assertEqual(self.names('nav1'), [f'Nav{i}' for i in range(19, 11, -1)])
+
+
+class PopularProductsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.phones = Category.objects.create(name='Телефони', slug='phones')
+        cls.cases = Category.objects.create(name='Чохли', slug='cases')
+        cls.empty = Category.objects.create(name='Порожня', slug='empty')
+        cls.a = make_product(cls.phones, 'A', views=10)
+        cls.b = make_product(cls.phones, 'B', views=30)
+        cls.c = make_product(cls.cases, 'C', views=20)
+        cls.hidden = make_product(cls.cases, 'Hidden', views=100, is_available=False)
+
+    def setUp(self):
+        popularity._computed = False
+        cache.delete(popularity.COMPUTE_LOCK_KEY)
+
+    def ranking(self, category=None):
+        return list(
+            PopularProduct.objects.filter(category=category).order_by('position').values_list('product_id', 'score')
+        )
+
+    def test_rankings_per_category(self):
+        self.assertEqual(popularity.refresh_popular_products(size=2), 5)
+        self.assertEqual(self.ranking(), [(self.b.pk, 30), (self.c.pk, 20)])
+        self.assertEqual(self.ranking(self.phones), [(self.b.pk, 30), (self.a.pk, 10)])
+        self.assertEqual(self.ranking(self.cases), [(self.c.pk, 20)])
+        self.assertEqual(self.ranking(self.empty), [])
+
+        # Перерахунок замінює рейтинг, а не додає до нього
+        Product.objects.filter(pk=self.a.pk).update(views=50)
+        self.assertEqual(popularity.refresh_popular_products(size=2), 5)
+        self.assertEqual(self.ranking(self.phones), [(self.a.pk, 50), (self.b.pk, 30)])
+
+    def test_decayed_scores(self):
+        popularity.refresh_popular_products(half_life_hours=10)
+        self.assertEqual(self.ranking(self.phones), [(self.b.pk, 30), (self.a.pk, 10)])
+
+        # Минув один період напіврозпаду, A отримав 40 нових переглядів
+        ProductPopularity.objects.update(updated_at=F('updated_at') - timedelta(hours=10))
+        Product.objects.filter(pk=self.a.pk).update(views=50)
+        popularity.refresh_popular_products(half_life_hours=10)
+        scores = dict(ProductPopularity.objects.values_list('product_id', 'score'))
+        self.assertAlmostEqual(scores[self.a.pk], 10 * 0.5 + 40, places=3)
+        self.assertAlmostEqual(scores[self.b.pk], 15, places=3)
+        self.assertEqual([pk for pk, _ in self.ranking(self.phones)], [self.a.pk, self.b.pk])
+
+    def test_decay_counts_from_last_score_update(self):
+        popularity.refresh_popular_products(half_life_hours=10)
+        ProductPopularity.objects.update(updated_at=F('updated_at') - timedelta(hours=20))
+        # Рейтинг без загасання між ними не скидає час загасання
+        popularity.refresh_popular_products()
+        popularity.refresh_popular_products(half_life_hours=10)
+        self.assertAlmostEqual(ProductPopularity.objects.get(pk=self.b.pk).score, 30 * 0.25, places=3)
+
+    def test_first_use_computes_once(self):
+        self.assertEqual(popularity.get_popular_products(2), [self.b, self.c])
+        self.assertTrue(PopularProduct.objects.exists())
+        # Порожня категорія не повертається до сортування всього каталогу
+        with self.assertNumQueries(1):
+            self.assertEqual(popularity.get_popular_products(2, self.empty), [])
+
+    def test_unavailable_products_shorten_list(self):
+        popularity.refresh_popular_products(size=2)
+        Product.objects.filter(pk=self.b.pk).update(is_available=False)
+        with self.assertNumQueries(1):
+            self.assertEqual(popularity.get_popular_products(4, self.phones), [self.a])
+
+
+class RecommendationsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Разом', slug='together')
+        cls.products = [make_product(cls.category, f'Item{i}') for i in range(5)]
+        cls.ids = [product.pk for product in cls.products]
+
+    def setUp(self):
+        self.buffer = recommendations.PairEventBuffer(threshold=1000, interval=3600)
+        patcher = mock.patch.object(recommendations, 'get_pair_buffer', return_value=self.buffer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def events(self):
+        return {
+            (kind, a, b): weight
+            for kind, a, b, weight in ProductPairEvent.objects.values_list('kind', 'product_a', 'product_b', 'weight')
+        }
+
+    def event(self, kind, a, b, weight=1, days_ago=0):
+        event = ProductPairEvent.objects.create(kind=kind, product_a_id=a, product_b_id=b, weight=weight)
+        if days_ago:
+            ProductPairEvent.objects.filter(pk=event.pk).update(created_at=timezone.now() - timedelta(days=days_ago))
+        return event
+
+    def test_co_view_pairs_and_reload(self):
+        request = mock.Mock(session={})
+        first, second, third = self.ids[:3]
+        for product_id in (first, second, third, third, third):
+            recommendations.record_co_view(request, product_id)
+        # Оновлення сторінки не додає пар
+        self.assertEqual(request.session[recommendations.RECENT_VIEWS_SESSION_KEY], [third, second, first])
+        recommendations.record_co_view(request, first)
+
+        self.assertEqual(self.buffer.flush(), 3)
+        self.assertEqual(self.events(), {
+            ('view', first, second): 2, ('view', first, third): 2, ('view', second, third): 1,
+        })
+
+    def test_deleted_product_does_not_drop_batch(self):
+        first, second, third = self.ids[:3]
+        recommendations.record_co_cart(first, [str(second), str(third)])
+        Product.objects.filter(pk=third).delete()
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(self.events(), {('cart', first, second): 1})
+
+    def test_compute_keeps_top_k_by_weight(self):
+        product, *others = self.ids
+        self.event('view', product, others[0], weight=5)
+        self.event('cart', product, others[1])
+        self.event('view', product, others[2], weight=2)
+        self.event('view', product, others[2])
+        self.event('view', product, others[3], weight=10, days_ago=100)
+
+        self.assertEqual(recommendations.compute_related_products(top_k=2, window_days=90, cart_weight=3), 5)
+        links = RelatedProduct.objects.filter(product_id=product).values_list('related_id', 'position', 'score')
+        # Кошик важить утричі більше, перегляди однієї пари сумуються, старі події не враховуються
+        self.assertEqual(list(links), [(others[0], 1, 5), (others[1], 2, 3)])
+        self.assertEqual(
+            list(RelatedProduct.objects.filter(product_id=others[2]).values_list('related_id', 'score')),
+            [(product, 3)],
+        )
+
+    def test_prune_removes_events_outside_window(self):
+        kept = self.event('view', self.ids[0], self.ids[1], days_ago=10)
+        self.event('view', self.ids[0], self.ids[2], days_ago=100)
+        self.assertEqual(recommendations.prune_pair_events(window_days=90), 1)
+        self.assertEqual(list(ProductPairEvent.objects.values_list('pk', flat=True)), [kept.pk])
+
+    def test_related_products_fall_back_to_category(self):
+        product, neighbor, hidden, *rest = self.products
+        Product.objects.filter(pk=hidden.pk).update(is_available=False)
+        RelatedProduct.objects.create(product=product, related=hidden, position=1, score=10)
+        RelatedProduct.objects.create(product=product, related=neighbor, position=2, score=5)
+
+        related = recommendations.get_related_products(product, count=3)
+        self.assertEqual(related[0], neighbor)
+        self.assertEqual(set(related[1:]), set(rest))
+
+
+LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+REDIS = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://localhost'}}
+
+
+class SharedCacheCheckTests(SimpleTestCase):
+    def check_ids(self):
+        return [message.id for message in check_shared_cache(None) + check_shared_cache_deploy(None)]
+
+    @override_settings(CACHES=LOCMEM, PRODUCT_VIEWS_BUFFER={'BACKEND': 'local'})
+    def test_locmem_only_warns_on_deploy(self):
+        self.assertEqual(self.check_ids(), ['main.W001'])
+
+    @override_settings(CACHES=LOCMEM, PRODUCT_VIEWS_BUFFER={'BACKEND': 'cache'})
+    def test_locmem_refuses_shared_view_buffer(self):
+        self.assertEqual(self.check_ids(), ['main.E001', 'main.W001'])
+
+    @override_settings(CACHES=REDIS, PRODUCT_VIEWS_BUFFER={'BACKEND': 'cache'})
+    def test_shared_cache(self):
+        self.assertEqual(self.check_ids(), [])
+
+
+def legacy_item_pricing(unit_price, discounts, promo, quantity=2):
+    """
+    Попередній шлях ціни одного товару: pricing на Decimal, фільтри
+    apply_promo_to_price і currency, Cart.add і рядок Cart.__iter__.
+    """
+    unit = unit_price or Decimal('0.00')
+    total = (unit * 1).quantize(Decimal('0.01'))
+    best, best_amount = None, Decimal('0.00')
+    for d in discounts:
+        try:
+            if not d.is_valid():
+                continue
+            amount = Decimal(d.calculate_discount(unit, 1) or 0)
+        except Exception:
+            continue
+        if amount > best_amount:
+            best, best_amount = d, amount
+    price = total
+    if best is not None:
+        amount = min(max(best_amount, Decimal('0.00')), total)
+        price = max((total - amount).quantize(Decimal('0.01')), Decimal('0.00'))
+
+    shown = Decimal(str(price))
+    shown = shown - shown * (Decimal(str(promo.value)) / Decimal('100'))
+    value = float(shown)
+    f"{value:,.2f}".replace(',', ' ').replace('.', ',')
+
+    price_decimal = Decimal(str(price))
+    if price_decimal >= Decimal(str(promo.min_order_amount)):
+        price_decimal = price_decimal * (Decimal('1') - Decimal(str(promo.value)) / Decimal('100'))
+    price_str = str(Decimal(price_decimal).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP))
+
+    price_rounded = Decimal(str(price_str)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+    float(price_rounded)
+    return float((price_rounded * quantity).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP))
+
+
+def money_item_pricing(unit_price, discounts, promo, quantity=2):
+    price = calculate_pricing(unit_price, discounts).price
+    currency(promo.apply_to_price(price))
+
+    if price >= Money.of(promo.min_order_amount):
+        price = promo.apply_to_price(price)
+    price_str = str(price)
+
+    return Money.of(price_str) * quantity
+
+
+@unittest.skipUnless(RUN_BENCHMARKS, 'SHOP_BENCHMARKS=1 для запуску бенчмарків')
+class PricingBenchmark(SimpleTestCase):
+    def test_per_item_pricing(self):
+        discounts = [make_discount('percentage', '12.5'), make_discount('fixed', '15')]
+        prices = [Decimal(price) for price, *_ in PRICING_GOLDEN]
+        promo = make_promo('percentage', '10')
+
+        for price in prices:
+            self.assertEqual(
+                legacy_item_pricing(price, discounts, promo), float(money_item_pricing(price, discounts, promo)),
+            )
+
+        def run(implementation):
+            return min(timeit.repeat(
+                lambda: [implementation(price, discounts, promo) for price in prices], number=200, repeat=5,
+            ))
+
+        legacy_time = run(legacy_item_pricing)
+        money_time = run(money_item_pricing)
+        per_item = 200 * len(prices)
+        summary = (
+            f'ціна товару: Decimal {legacy_time / per_item * 1e6:.1f} мкс, '
+            f'Money {money_time / per_item * 1e6:.1f} мкс ({legacy_time / money_time:.1f}x)'
+        )
+        benchmark_logger.info(summary)
+        self.assertLess(money_time, legacy_time, summary)
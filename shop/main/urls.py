@@ -5,6 +5,8 @@ app_name = 'main'
 
 urlpatterns = [
 	path('', views.product_list, name='product_list'),
+	path('autocomplete/', views.search_autocomplete, name='autocomplete'),
+	path('export/<slug:dataset>/', views.export_data, name='export_data'),
 	path('category/<slug:category_slug>/', views.product_list, name='product_list_by_category'),
 	path('product/<int:id>/<slug:slug>/', views.product_detail, name='product_detail'),
 ]
\ No newline at end of file
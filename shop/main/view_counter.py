@@ -0,0 +1,239 @@
+import atexit
+import logging
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connections, transaction
+from django.db.models import F
+from .catalog_cache import is_shared_cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'BACKEND': 'local',
+    'THRESHOLD': 100,
+    'INTERVAL': 10,
+}
+
+CACHE_PENDING_KEY = 'product_views:pending'
+CACHE_LOCK_KEY = 'product_views:lock'
+CACHE_LOCK_TIMEOUT = 10
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'PRODUCT_VIEWS_BUFFER', {})}
+
+
+def write_view_increments(pending):
+    """
+    Записує накопичені перегляди в Product.views через F(): кожен UPDATE
+    додає до поточного значення, тому паралельні процеси не затирають
+    приріст один одного. Товари з однаковим приростом оновлюються разом.
+    """
+    from .models import Product
+
+    by_increment = defaultdict(list)
+    for product_id, count in pending.items():
+        if count > 0:
+            by_increment[count].append(product_id)
+
+    with transaction.atomic():
+        # Блокуємо рядки в порядку pk, щоб паралельні скидання не взаємоблокувались
+        list(
+            Product.objects.filter(pk__in=list(pending)).order_by('pk')
+            .select_for_update().values_list('pk', flat=True)
+        )
+        for count, product_ids in by_increment.items():
+            Product.objects.filter(pk__in=product_ids).update(views=F('views') + count)
+    return sum(pending.values())
+
+
+class _CacheLock:
+    def __init__(self, attempts=50, delay=0.01, blocking=True):
+        # Без очікування — одна спроба: потік запиту не чекає на блокування
+        self.attempts = attempts if blocking else 1
+        self.delay = delay
+        self.token = uuid.uuid4().hex
+        self.acquired = False
+
+    def __enter__(self):
+        for attempt in range(self.attempts):
+            if attempt:
+                time.sleep(self.delay)
+            if cache.add(CACHE_LOCK_KEY, self.token, CACHE_LOCK_TIMEOUT):
+                self.acquired = True
+                break
+        return self.acquired
+
+    def __exit__(self, *exc):
+        if self.acquired and cache.get(CACHE_LOCK_KEY) == self.token:
+            cache.delete(CACHE_LOCK_KEY)
+
+
+def spill_to_cache(pending, blocking=True):
+    with _CacheLock(blocking=blocking) as acquired:
+        if not acquired:
+            return False
+        stored = Counter(cache.get(CACHE_PENDING_KEY) or {})
+        stored.update(pending)
+        cache.set(CACHE_PENDING_KEY, dict(stored), None)
+    return True
+
+
+def drain_cache():
+    """
+    Забирає пакет зі спільного кешу і записує його в БД. Під блокуванням
+    пакет лише читається й видаляється, запис у БД іде вже без нього:
+    блокування не може спливти посеред запису, а нові перегляди, перенесені
+    в кеш тим часом, лягають у новий пакет. Якщо запис не вдався, пакет
+    повертається в кеш.
+    """
+    with _CacheLock() as acquired:
+        if not acquired:
+            return None
+        pending = cache.get(CACHE_PENDING_KEY) or {}
+        if pending:
+            cache.delete(CACHE_PENDING_KEY)
+    if not pending:
+        return 0
+    try:
+        return write_view_increments(pending)
+    except Exception:
+        if not spill_to_cache(pending):
+            logger.error("Не вдалося повернути перегляди в кеш, втрачено: %s", pending)
+        raise
+
+
+class ViewCounterBuffer:
+    """
+    Буфер переглядів товарів у пам'яті процесу. Скидається, коли
+    набирається THRESHOLD переглядів або минає INTERVAL секунд (таймером у
+    фоновому потоці, тож і без нових переглядів), а також при завершенні
+    процесу. У режимі 'cache' пакет переноситься в спільний
+    кеш, звідки його записує команда flush_product_views; якщо кеш зайнятий
+    іншим процесом, перегляди лишаються в буфері до наступної спроби.
+    """
+
+    def __init__(self, backend='local', threshold=100, interval=10):
+        self.backend = backend
+        self.threshold = threshold
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._pending = Counter()
+        self._hits = 0
+        self._last_flush = time.monotonic()
+        self._timer = None
+
+    def record(self, product_id, count=1):
+        with self._lock:
+            self._pending[product_id] += count
+            self._hits += count
+            due = self._hits >= self.threshold or time.monotonic() - self._last_flush >= self.interval
+            if not due:
+                self._schedule()
+        if due:
+            self.flush()
+
+    def _schedule(self):
+        # Викликається під self._lock: один таймер на буфер
+        if self._timer is not None or not self.interval:
+            return
+        self._timer = threading.Timer(self.interval, self._flush_on_timer)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _flush_on_timer(self):
+        with self._lock:
+            self._timer = None
+        try:
+            self.flush()
+        finally:
+            # Потік таймера відкриває власне з'єднання з БД
+            connections.close_all()
+        with self._lock:
+            if self._pending:
+                self._schedule()
+
+    def _take(self):
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+            self._hits = 0
+            self._last_flush = time.monotonic()
+        return pending
+
+    def _restore(self, pending):
+        with self._lock:
+            self._pending.update(pending)
+            self._hits += sum(pending.values())
+
+    def clear(self):
+        """Скасовує таймер і відкидає накопичені перегляди (для тестів)."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        self._take()
+
+    def _write(self, pending, blocking=False):
+        # None — кеш зайнятий, пакет лишається в буфері
+        if self.backend == 'cache':
+            if spill_to_cache(pending, blocking=blocking):
+                return sum(pending.values())
+            if not blocking:
+                return None
+        return write_view_increments(pending)
+
+    def flush(self):
+        pending = self._take()
+        if not pending:
+            return 0
+        try:
+            written = self._write(pending)
+        except Exception:
+            logger.exception("Не вдалося записати перегляди товарів, повторимо пізніше")
+            written = None
+        if written is None:
+            self._restore(pending)
+            return 0
+        return written
+
+    def flush_at_exit(self):
+        pending = self._take()
+        if not pending:
+            return
+        try:
+            self._write(pending, blocking=True)
+        except DatabaseError as e:
+            # БД уже недоступна (наприклад, тестову БД знищено): трасування тут нічого не дасть
+            logger.warning("Перегляди товарів не записано при завершенні процесу (%s): %s", e, dict(pending))
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_view_buffer():
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                config = get_config()
+                backend = config['BACKEND']
+                if backend == 'cache' and not is_shared_cache():
+                    # Пакет у кеші процесу не побачить команда flush_product_views
+                    logger.error("PRODUCT_VIEWS_BUFFER 'cache' потребує спільного кешу, перегляди пишуться напряму")
+                    backend = 'local'
+                _buffer = ViewCounterBuffer(
+                    backend=backend,
+                    threshold=config['THRESHOLD'],
+                    interval=config['INTERVAL'],
+                )
+                atexit.register(_buffer.flush_at_exit)
+    return _buffer
+
+
+def record_product_view(product_id):
+    get_view_buffer().record(product_id)
@@ -1,13 +1,26 @@
+import itertools
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import Http404, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
 from django.shortcuts import get_object_or_404, render
+from django.conf import settings
 from .models import Product, Category
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-from django.db.models import Q
-import re
 from cart.forms import CartAddProductForm
+from .autocomplete import autocomplete
+from .exports import EXPORTS, FORMATS, ExportError, stream_export
+from .facets import apply_facet_filters, get_facet_counts, parse_facet_filters
+from .page_cache import LIST_TAG, add_page_cache_tags, anonymous_page_cache, limit_page_cache_expiry
+from .pagination import KeysetPaginator
+from .pricing import attach_pricing
+from .recommendations import get_related_products, record_co_view
+from .search import search_products, tokenize
+from .view_counter import record_product_view
 
+@anonymous_page_cache(tags=lambda request, category_slug=None: ['catalog', LIST_TAG])
 def product_list(request, category_slug=None):
     categories = Category.objects.all()
-    products = Product.objects.all()
+    products = Product.objects.select_related('category')
 
     category = None
     search_query = request.GET.get('q')
@@ -18,40 +31,63 @@ def product_list(request, category_slug=None):
 
     if search_query:
         search_query = search_query.strip()
-        escaped_query = re.escape(search_query)
-        products = products.filter(
-            Q(name__iregex=escaped_query) |
-            Q(description__iregex=escaped_query) |
-            Q(category__name__iregex=escaped_query)
-        )
+        products = search_products(products, search_query)
 
-    current_sort = request.GET.get('sort', 'new')
+    facet_filters = parse_facet_filters(request.GET)
+    # Запит без слів (q=!!!) дає порожню вибірку, тому його ключ не повинен
+    # збігатися з ключем каталогу без пошуку
+    facet_counts = get_facet_counts(
+        products, facet_filters,
+        scope=(category.pk if category else None, bool(search_query), tokenize(search_query)),
+    )
+    products = apply_facet_filters(products, facet_filters)
+
+    current_sort = request.GET.get('sort') or ('relevance' if search_query else 'new')
 
     sort_mapping = {
         'new': '-created_at',
         'old': 'created_at',
         'popular': '-views',
-        'price_low': 'price',
-        'price_high': '-price',
+        'price_low': 'effective_price',
+        'price_high': '-effective_price',
         'name': 'name',
+        'rating': '-rating_avg',
     }
+    if search_query:
+        sort_mapping['relevance'] = '-rank'
 
     order_field = sort_mapping.get(current_sort, sort_mapping['new'])
 
     try:
         products = products.order_by(order_field)
     except Exception:
-        products = products.order_by(sort_mapping['new'])
+        order_field = sort_mapping['new']
+        products = products.order_by(order_field)
         current_sort = 'new'
 
-    paginator = Paginator(products, 8)
-    page = request.GET.get('page')
-    try:
-        products = paginator.page(page)
-    except PageNotAnInteger:
-        products = paginator.page(1)
-    except EmptyPage:
-        products = paginator.page(paginator.num_pages)
+    cursor = request.GET.get('cursor')
+    pagination_mode = getattr(settings, 'CATALOG_PAGINATION', 'offset')
+    keyset_pagination = (cursor is not None or pagination_mode == 'keyset') and current_sort != 'relevance'
+    estimated_count = None
+
+    if keyset_pagination:
+        paginator = KeysetPaginator(products, order_field, 8)
+        products = paginator.page(cursor)
+        estimated_count = paginator.estimated_count()
+        is_first_page = not products.has_previous()
+    else:
+        products = products.order_by(order_field, '-id' if order_field.startswith('-') else 'id')
+        paginator = Paginator(products, 8)
+        page = request.GET.get('page')
+        try:
+            products = paginator.page(page)
+        except PageNotAnInteger:
+            products = paginator.page(1)
+        except EmptyPage:
+            products = paginator.page(paginator.num_pages)
+        is_first_page = products.number == 1
+    products.object_list = attach_pricing(products.object_list)
+    limit_page_cache_expiry(request, *(product._pricing_expires for product in products.object_list))
 
     product_promo_codes_dict = request.session.get('product_promo_codes', {})
 
@@ -62,18 +98,32 @@ def product_list(request, category_slug=None):
         'current_sort': current_sort,
         'search_query': search_query,
         'product_promo_codes': product_promo_codes_dict,
+        'keyset_pagination': keyset_pagination,
+        'estimated_count': estimated_count,
+        'is_first_page': is_first_page,
+        'facet_filters': facet_filters,
+        'facet_counts': facet_counts,
     })
 
 
+def _record_product_visit(request, id, slug=None):
+    record_product_view(id)
+    record_co_view(request, id)
+
+
+@anonymous_page_cache(
+    tags=lambda request, id, slug: ['categories', f'product:{id}'],
+    on_hit=_record_product_visit,
+)
 def product_detail(request, id, slug):
-    product = get_object_or_404(Product, id=id, slug=slug)
+    product = get_object_or_404(Product.objects.select_related('category'), id=id, slug=slug)
     
+    _record_product_visit(request, product.pk)
     product.views += 1
-    product.save(update_fields=['views'])
     
     reviews_qs = product.reviews.filter(is_active=True).select_related('author').order_by('-created_at')
     
-    reviews_count = reviews_qs.count()
+    reviews_count = product.get_reviews_count()
     average_rating = product.get_average_rating()
     rating_distribution = product.get_rating_distribution()
     
@@ -81,7 +131,10 @@ def product_detail(request, id, slug):
     if request.user.is_authenticated:
         user_review = reviews_qs.filter(author=request.user).first()
     
-    related_products = Product.objects.filter(category=product.category).exclude(id=product.id).order_by('-created_at')[:4]
+    related_products = attach_pricing(get_related_products(product, 4))
+    add_page_cache_tags(request, *(f'product:{p.pk}' for p in related_products))
+    product.get_pricing()
+    limit_page_cache_expiry(request, product._pricing_expires, *(p._pricing_expires for p in related_products))
     
     product_promo_codes_dict = request.session.get('product_promo_codes', {})
     cart_product_form = CartAddProductForm()
@@ -96,4 +149,27 @@ def product_detail(request, id, slug):
         'user_review': user_review,
         'product_promo_codes': product_promo_codes_dict,
         'cart_product_form': cart_product_form,
-    })
\ No newline at end of file
+    })
+
+def search_autocomplete(request):
+    query = request.GET.get('q', '').strip()
+    return JsonResponse({'query': query, **autocomplete(query)})
+
+
+@staff_member_required
+def export_data(request, dataset):
+    if dataset not in EXPORTS:
+        raise Http404
+    filters = request.GET.dict()
+    fmt = filters.pop('format', 'csv')
+    try:
+        lines = stream_export(dataset, filters, fmt)
+    except ExportError as e:
+        return HttpResponseBadRequest(str(e))
+    if fmt == 'csv':
+        # BOM, щоб Excel розпізнав UTF-8; import_products його пропускає
+        lines = itertools.chain(['\ufeff'], lines)
+    response = StreamingHttpResponse(lines, content_type=FORMATS[fmt])
+    filename = f"{dataset}-{timezone.localdate():%Y%m%d}.{fmt}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.utils.translation import gettext_lazy as _
 from .models import Review
+from .ratings import set_reviews_active
 
 class ReviewAdmin(admin.ModelAdmin):
     list_display = ('author', 'product', 'rating', 'title_preview', 'created_at', 'is_active', 'helpful_count')
@@ -33,12 +34,12 @@ class ReviewAdmin(admin.ModelAdmin):
     title_preview.short_description = 'Заголовок'
 
     def activate_reviews(self, request, queryset):
-        updated = queryset.update(is_active=True)
+        updated = set_reviews_active(queryset, True)
         self.message_user(request, _("%d відгуків активовано.") % updated)
     activate_reviews.short_description = _("Активувати відгуки")
 
     def deactivate_reviews(self, request, queryset):
-        updated = queryset.update(is_active=False)
+        updated = set_reviews_active(queryset, False)
         self.message_user(request, _("%d відгуків деактивовано.") % updated)
     deactivate_reviews.short_description = _("Деактивувати відгуви")
 
@@ -0,0 +1,56 @@
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from main.models import Product
+from reviews.ratings import RATING_VALUES, compute_rating_aggregates, rating_field
+
+class Command(BaseCommand):
+    help = 'Перераховує збережені агрегати рейтингу товарів за активними відгуками'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Лише показати розбіжності')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+        fields = ['rating_count', 'rating_sum', 'rating_avg'] + [rating_field(r) for r in RATING_VALUES]
+
+        checked = 0
+        fixed = 0
+        last_id = 0
+        while True:
+            # Блокування рядків товарів не дає паралельним змінам відгуків загубитись
+            with transaction.atomic():
+                products = list(
+                    Product.objects.filter(id__gt=last_id).order_by('id')
+                    .select_for_update().only('id', *fields)[:batch_size]
+                )
+                if not products:
+                    break
+                last_id = products[-1].id
+                checked += len(products)
+                drifted = self._find_drifted(products)
+                fixed += len(drifted)
+                if drifted and not dry_run:
+                    Product.objects.bulk_update(drifted, fields)
+
+        action = 'Знайдено розбіжностей' if dry_run else 'Виправлено'
+        self.stdout.write(self.style.SUCCESS(f'{action}: {fixed} з {checked} товарів'))
+
+    def _find_drifted(self, products):
+        aggregates = compute_rating_aggregates([p.id for p in products])
+        drifted = []
+        for product in products:
+            data = aggregates[product.id]
+            count = data['rating_count']
+            data['rating_avg'] = (Decimal(data['rating_sum']) / count).quantize(Decimal('0.01')) if count else Decimal('0.00')
+            if any(getattr(product, field) != value for field, value in data.items()):
+                self.stdout.write(
+                    f'Товар #{product.id}: {product.rating_count} відгуків / {product.rating_sum} '
+                    f'-> {data["rating_count"]} / {data["rating_sum"]}'
+                )
+                for field, value in data.items():
+                    setattr(product, field, value)
+                drifted.append(product)
+        return drifted
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from main.models import Product
 
@@ -27,6 +27,15 @@ class Review(models.Model):
 	def __str__(self):
 		return f'Відгук від {self.author.username} для {self.product.name} - {self.rating} зірок'
 	
+	def save(self, *args, **kwargs):
+		# Агрегати рейтингу товару оновлюються сигналами в тій самій транзакції
+		with transaction.atomic():
+			super().save(*args, **kwargs)
+
+	def delete(self, *args, **kwargs):
+		with transaction.atomic():
+			return super().delete(*args, **kwargs)
+
 	def get_rating_display_stars(self):
 		try:
 			r = int(self.rating)
@@ -0,0 +1,101 @@
+from collections import defaultdict
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, F, FloatField, Value, When
+from django.db.models.functions import Cast
+from main.models import Product
+from main.page_cache import invalidate_product_pages
+
+RATING_VALUES = range(1, 6)
+
+
+def rating_field(rating):
+    return f'rating_{rating}'
+
+
+def _normalize_rating(rating):
+    try:
+        rating = int(rating)
+    except (TypeError, ValueError):
+        return None
+    return rating if rating in RATING_VALUES else None
+
+
+def add_delta(deltas, product_id, rating, change):
+    rating = _normalize_rating(rating)
+    if product_id is None or rating is None or not change:
+        return deltas
+    deltas[product_id][rating] += change
+    return deltas
+
+
+def new_deltas():
+    return defaultdict(lambda: defaultdict(int))
+
+
+def apply_rating_deltas(deltas):
+    """
+    Застосовує зміни {product_id: {оцінка: +-кількість}} до збережених
+    агрегатів рейтингу одним UPDATE з F() на кожен товар.
+    """
+    for product_id, by_rating in deltas.items():
+        count = sum(by_rating.values())
+        total = sum(rating * change for rating, change in by_rating.items())
+        updates = {
+            'rating_count': F('rating_count') + count,
+            'rating_sum': F('rating_sum') + total,
+            'rating_avg': Case(
+                When(
+                    rating_count__gt=-count,
+                    then=Cast(F('rating_sum') + total, FloatField()) / (F('rating_count') + count),
+                ),
+                default=Value(0),
+                output_field=DecimalField(max_digits=3, decimal_places=2),
+            ),
+        }
+        for rating, change in by_rating.items():
+            if change:
+                updates[rating_field(rating)] = F(rating_field(rating)) + change
+        if any(by_rating.values()):
+            Product.objects.filter(pk=product_id).update(**updates)
+
+
+def set_reviews_active(queryset, is_active):
+    with transaction.atomic():
+        ids = list(
+            queryset.exclude(is_active=is_active).select_for_update().values_list('id', flat=True)
+        )
+        if not ids:
+            return 0
+
+        changed = queryset.model.objects.filter(id__in=ids)
+        deltas = new_deltas()
+        sign = 1 if is_active else -1
+        for row in changed.values('product_id', 'rating').annotate(n=Count('id')).order_by():
+            add_delta(deltas, row['product_id'], row['rating'], sign * row['n'])
+
+        updated = changed.update(is_active=is_active)
+        apply_rating_deltas(deltas)
+    invalidate_product_pages(*deltas)
+    return updated
+
+
+def compute_rating_aggregates(product_ids):
+    from .models import Review
+
+    aggregates = {
+        pid: {'rating_count': 0, 'rating_sum': 0, **{rating_field(r): 0 for r in RATING_VALUES}}
+        for pid in product_ids
+    }
+    rows = (
+        Review.objects.filter(product_id__in=product_ids, is_active=True)
+        .values('product_id', 'rating').annotate(n=Count('id')).order_by()
+    )
+    for row in rows:
+        rating = _normalize_rating(row['rating'])
+        if rating is None:
+            continue
+        data = aggregates[row['product_id']]
+        data[rating_field(rating)] += row['n']
+        data['rating_count'] += row['n']
+        data['rating_sum'] += rating * row['n']
+    return aggregates
@@ -0,0 +1,39 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from main.page_cache import invalidate_product_pages
+from .models import Review
+from .ratings import add_delta, apply_rating_deltas, new_deltas
+
+
+@receiver(pre_save, sender=Review)
+def remember_rating_state(sender, instance, raw=False, **kwargs):
+    instance._rating_state = None
+    if instance.pk and not raw:
+        instance._rating_state = (
+            Review.objects.filter(pk=instance.pk)
+            .values_list('product_id', 'rating', 'is_active').first()
+        )
+
+
+@receiver(post_save, sender=Review)
+def update_ratings_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    deltas = new_deltas()
+    previous = getattr(instance, '_rating_state', None)
+    if previous is not None:
+        product_id, rating, is_active = previous
+        if is_active:
+            add_delta(deltas, product_id, rating, -1)
+    if instance.is_active:
+        add_delta(deltas, instance.product_id, instance.rating, 1)
+    apply_rating_deltas(deltas)
+    instance._rating_state = (instance.product_id, instance.rating, instance.is_active)
+    invalidate_product_pages(instance.product_id, previous[0] if previous else None)
+
+
+@receiver(post_delete, sender=Review)
+def update_ratings_on_delete(sender, instance, **kwargs):
+    if instance.is_active:
+        apply_rating_deltas(add_delta(new_deltas(), instance.product_id, instance.rating, -1))
+    invalidate_product_pages(instance.product_id)
@@ -1,3 +1,87 @@
+from decimal import Decimal
+from django.contrib.auth.models import User
 from django.test import TestCase
+from main.models import Category, Product
+from .models import Review
+from .ratings import compute_rating_aggregates, set_reviews_active
 
-# Create your tests here.
+RATING_FIELDS = ['rating_count', 'rating_sum', 'rating_avg', 'rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5']
+
+
+class RatingAggregatesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Відгуки', slug='reviews')
+        cls.product = Product.objects.create(
+            category=category, name='Товар', slug='tovar', description='Опис', price=Decimal('100.00'),
+        )
+        cls.other = Product.objects.create(
+            category=category, name='Інший', slug='inshyi', description='Опис', price=Decimal('100.00'),
+        )
+        cls.users = [User.objects.create_user(f'user{i}') for i in range(3)]
+
+    def review(self, user, rating, product=None, **kwargs):
+        return Review.objects.create(
+            product=product or self.product, author=user, rating=rating, title='Відгук', content='Текст', **kwargs,
+        )
+
+    def stored(self, product=None):
+        values = Product.objects.filter(pk=(product or self.product).pk).values_list(*RATING_FIELDS).get()
+        return dict(zip(RATING_FIELDS, values))
+
+    def assertAggregates(self, count, total, avg, by_rating, product=None):
+        expected = {'rating_count': count, 'rating_sum': total, 'rating_avg': Decimal(avg)}
+        expected.update({f'rating_{rating}': by_rating.get(rating, 0) for rating in range(1, 6)})
+        self.assertEqual(self.stored(product), expected)
+
+    def test_create_update_delete(self):
+        first = self.review(self.users[0], 5)
+        second = self.review(self.users[1], 2)
+        self.assertAggregates(2, 7, '3.50', {5: 1, 2: 1})
+
+        second.rating = 4
+        second.save()
+        self.assertAggregates(2, 9, '4.50', {5: 1, 4: 1})
+
+        first.delete()
+        self.assertAggregates(1, 4, '4.00', {4: 1})
+        second.delete()
+        self.assertAggregates(0, 0, '0.00', {})
+
+    def test_inactive_reviews_do_not_count(self):
+        review = self.review(self.users[0], 3, is_active=False)
+        self.assertAggregates(0, 0, '0.00', {})
+        review.is_active = True
+        review.save()
+        self.assertAggregates(1, 3, '3.00', {3: 1})
+        review.is_active = False
+        review.save()
+        self.assertAggregates(0, 0, '0.00', {})
+
+    def test_moving_review_to_other_product(self):
+        review = self.review(self.users[0], 4)
+        review.product = self.other
+        review.save()
+        self.assertAggregates(0, 0, '0.00', {})
+        self.assertAggregates(1, 4, '4.00', {4: 1}, product=self.other)
+
+    def test_bulk_activation(self):
+        for user, rating in zip(self.users, (1, 2, 5)):
+            self.review(user, rating)
+        self.assertEqual(set_reviews_active(Review.objects.filter(rating__lt=5), False), 2)
+        self.assertAggregates(1, 5, '5.00', {5: 1})
+        # Уже неактивні відгуки вдруге не віднімаються
+        self.assertEqual(set_reviews_active(Review.objects.all(), False), 1)
+        self.assertAggregates(0, 0, '0.00', {})
+        self.assertEqual(set_reviews_active(Review.objects.all(), True), 3)
+        self.assertAggregates(3, 8, '2.67', {1: 1, 2: 1, 5: 1})
+
+    def test_compute_matches_stored(self):
+        for user, rating in zip(self.users, (4, 4, 1)):
+            self.review(user, rating)
+        self.review(self.users[0], 2, product=self.other, is_active=False)
+        aggregates = compute_rating_aggregates([self.product.pk, self.other.pk])
+        for product in (self.product, self.other):
+            stored = self.stored(product)
+            stored.pop('rating_avg')
+            self.assertEqual(aggregates[product.pk], stored)
@@ -63,6 +63,7 @@ TAILWIND_APP_NAME = 'theme'
 NPM_BIN_PATH = r"C:\Program Files\nodejs\npm.cmd"
 
 MIDDLEWARE = [
+    'accounts.views.RequestProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -116,6 +117,30 @@ DATABASES = {
     }
 }
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Версія каталогу, буфер переглядів, блокування і кеш сторінок мають бути
+# спільними для всіх процесів, тому на сервері потрібен Redis (REDIS_URL).
+# Без нього використовується LocMem — окремий кеш у кожному процесі, де
+# інвалідація не доходить до інших воркерів; придатний лише для розробки
+# з одним процесом (перевірки main.checks).
+
+REDIS_URL = config('REDIS_URL', default='')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -202,4 +227,67 @@ MARKDOWNX_MARKDOWN_EXTENSION_CONFIGS = {
 
 # Налаштування сесій
 SESSION_COOKIE_AGE = 86400 # 24 години
-CART_SESSION_ID = 'cart'
\ No newline at end of file
+CART_SESSION_ID = 'cart'
+
+# Конфігурація повнотекстового пошуку товарів (PostgreSQL)
+PRODUCT_SEARCH_CONFIG = 'simple'
+
+# Режим пагінації каталогу: 'offset' (номери сторінок) або 'keyset' (курсори)
+CATALOG_PAGINATION = 'offset'
+
+# Буферизація лічильника переглядів товарів: 'local' пише в БД напряму,
+# 'cache' переносить пакети в спільний кеш для команди flush_product_views
+PRODUCT_VIEWS_BUFFER = {
+    'BACKEND': 'local',
+    'THRESHOLD': 100,
+    'INTERVAL': 10,
+}
+
+# Рейтинг популярних товарів (команда refresh_popular_products);
+# HALF_LIFE_HOURS вмикає оцінку із загасанням замість загальних переглядів
+POPULAR_PRODUCTS = {
+    'SIZE': 12,
+    'HALF_LIFE_HOURS': None,
+}
+
+# Рекомендації "з цим товаром також переглядають" (main.recommendations)
+RECOMMENDATIONS = {
+    'RECENT_VIEWS': 10,      # скільки останніх переглядів пам'ятати в сесії
+    'TOP_K': 8,              # сусідів на товар у таблиці RelatedProduct
+    'CART_WEIGHT': 3,        # вага спільного додавання в кошик відносно перегляду
+    'WINDOW_DAYS': 90,       # які події враховувати при перерахунку
+    'THRESHOLD': 200,        # подій у буфері до запису в БД
+    'INTERVAL': 30,          # або секунд з попереднього запису
+}
+
+# Кеш сторінок каталогу для анонімних відвідувачів (main.page_cache)
+PAGE_CACHE = {
+    'ENABLED': True,
+    'TIMEOUT': 60 * 5,
+}
+
+# Зменшені копії завантажених зображень (main.images)
+IMAGE_VARIANTS = {
+    'WIDTHS': [320, 640, 1024],
+    'QUALITY': 80,
+    'PLACEHOLDER_WIDTH': 16,
+    'WORKERS': 2,
+}
+
+# Профілювання запитів: частка запитів з підрахунком SQL і заголовком
+# Server-Timing (accounts.views.RequestProfilingMiddleware); 0 — вимкнено
+REQUEST_PROFILING = {
+    'SAMPLE_RATE': 1.0 if DEBUG else 0.0,
+    'DUPLICATE_THRESHOLD': 10,
+    'HEADER': True,
+}
+
+if REQUEST_PROFILING['SAMPLE_RATE']:
+    # Час рендеру шаблонів рахує окремий бекенд, щоб без профілювання не було обгорток
+    TEMPLATES[0].update(BACKEND='accounts.views.ProfilingDjangoTemplates', NAME='django')
+
+# Кеш промокодів із сесії в пам'яті процесу (discounts.promo_resolver), секунд;
+# 0 — кожен запит читає промокоди з БД
+PROMO_CACHE = {
+    'TIMEOUT': 30,
+}
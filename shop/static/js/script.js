@@ -65,4 +65,71 @@ document.addEventListener("DOMContentLoaded", function () {
         : "Приховати найпопулярніші товари";
     });
   }
+
+  const searchInput = document.getElementById("q");
+  const suggestions = document.getElementById("searchSuggestions");
+
+  if (searchInput && suggestions && searchInput.dataset.autocompleteUrl) {
+    let timer = null;
+    let lastQuery = "";
+
+    function hideSuggestions() {
+      suggestions.classList.add("hidden");
+      suggestions.innerHTML = "";
+    }
+
+    function renderGroup(title, items) {
+      if (!items.length) return "";
+      const links = items
+        .map(function (item) {
+          const link = document.createElement("a");
+          link.href = item.url;
+          link.className = "block px-4 py-2 text-gray-700 hover:bg-teal-50 hover:text-teal-700";
+          link.textContent = item.name;
+          return link.outerHTML;
+        })
+        .join("");
+      return (
+        '<div class="px-4 pt-3 pb-1 text-xs font-semibold text-gray-400 uppercase">' +
+        title +
+        "</div>" +
+        links
+      );
+    }
+
+    searchInput.addEventListener("input", function () {
+      const query = searchInput.value.trim();
+      clearTimeout(timer);
+      if (query.length < 2) {
+        lastQuery = "";
+        hideSuggestions();
+        return;
+      }
+      timer = setTimeout(function () {
+        lastQuery = query;
+        fetch(searchInput.dataset.autocompleteUrl + "?q=" + encodeURIComponent(query))
+          .then(function (response) {
+            return response.json();
+          })
+          .then(function (data) {
+            if (data.query !== lastQuery) return;
+            const html =
+              renderGroup("Категорії", data.categories) + renderGroup("Товари", data.products);
+            if (!html) {
+              hideSuggestions();
+              return;
+            }
+            suggestions.innerHTML = html;
+            suggestions.classList.remove("hidden");
+          })
+          .catch(hideSuggestions);
+      }, 150);
+    });
+
+    document.addEventListener("click", function (e) {
+      if (!suggestions.contains(e.target) && e.target !== searchInput) {
+        hideSuggestions();
+      }
+    });
+  }
 });
\ No newline at end of file